@@ -2,22 +2,17 @@
 
 source env.sh
 
-pypy scripts/run_index_class_dict.py                                            \
-    --input $DATADIR/yagoLabels.tsv:$DATADIR/yagoLabels.experimental.csv        \
+pypy scripts/run_index_all.py                                                   \
+    --labels $DATADIR/yagoLabels.tsv:$DATADIR/yagoLabels.experimental.csv       \
+    --taxonomy $DATADIR/yagoSimpleTaxonomy.tsv                                  \
+    --types $DATADIR/yagoSimpleTypes.tsv                                        \
     --odir $INDEXDIR                                                            \
     --rels "<isPreferredMeaningOf> <redirectedFrom>"                            \
-    --lang "eng"
+    --lang "eng"                                                                \
+    --bulk 1
 
-pypy scripts/run_index_class_search.py                                            \
-    --input $DATADIR/yagoLabels.tsv:$DATADIR/yagoLabels.experimental.csv        \
-    --odir $INDEXDIR                                                            \
-    --rels "<isPreferredMeaningOf> <redirectedFrom>"             \
-    --lang "eng"
-
-pypy scripts/run_index_taxonomy.py  \
-    $DATADIR/yagoSimpleTaxonomy.tsv \
-    $INDEXDIR
-
-pypy scripts/run_index_types.py  \
-    $DATADIR/yagoSimpleTypes.tsv \
-    $INDEXDIR
\ No newline at end of file
+# LevelDB index can be opened by one process only. Compiled indexes are read
+# instead of LevelDB ones, so run_disambiguate_nouns.py --workers needs them.
+pypy scripts/run_compile_indexes.py                                             \
+    --idir $INDEXDIR                                                            \
+    --backend mmap
@@ -6,5 +6,6 @@ pypy scripts/run_disambiguate_nouns.py      \
     --index $INDEXDIR                 \
     --names $DATADIR/names_$1.txt     \
     --delim 245 \
+    --workers ${WORKERS:-1} \
     < /dev/stdin
     > /dev/stdout
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts compares storage backends on the same index: time to open it, point lookups of
+existing and missing keys, batched lookups and full sorted iteration. Index should be converted
+for every compared backend with run_compile_indexes.py beforehand.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+from wikiref.storage import index_path
+from wikiref.storage import open_backend
+
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+
+
+def timed(function, *args):
+    started = time.time()
+    result = function(*args)
+    return time.time() - started, result
+
+
+def get_all(backend, keys):
+    found = 0
+    for key in keys:
+        try:
+            backend.get(key)
+            found += 1
+        except KeyError:
+            pass
+    return found
+
+
+def iterate_all(backend):
+    return sum(1 for _ in backend.iterate())
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--idir",     default=None,       type=str,
+                        help="Index directory.")
+    parser.add_argument("-x", "--index",    default=INDEX_YAGO_CLASS_SEARCH_DIRNAME, type=str,
+                        help="Name of the index to benchmark.")
+    parser.add_argument("-b", "--backends", default="leveldb mmap sqlite memory", type=str,
+                        help="List of backends to compare separated by spaces.")
+    parser.add_argument("-k", "--keys",     default=100000,     type=int,
+                        help="Number of sampled keys to look up.")
+    parser.add_argument("-s", "--seed",     default=0,          type=int,
+                        help="Random seed for key sampling.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    source = open_backend(index_path(args.idir, args.index, "leveldb"), "leveldb")
+    keys = []
+    for i, key in enumerate(source.iterate(include_value=False)):
+        if len(keys) < args.keys:
+            keys.append(key)
+        else:
+            j = random.randint(0, i)
+            if j < args.keys:
+                keys[j] = key
+    source.close()
+    random.shuffle(keys)
+    missing_keys = [key + chr(0) for key in keys]
+    logging.info("Sampled %d keys from %s." % (len(keys), args.index))
+
+    sys.stdout.write("%-10s %10s %12s %12s %12s %12s\n" % (
+        "backend", "open,s", "get,us", "miss,us", "multi_get,us", "iterate,s"))
+
+    for backend_name in args.backends.split(" "):
+        path = index_path(args.idir, args.index, backend_name)
+        if not os.path.exists(path):
+            logging.warning("Skipping %s backend, %s not found." % (backend_name, path))
+            continue
+        open_time, backend = timed(open_backend, path, backend_name)
+        get_time, found = timed(get_all, backend, keys)
+        miss_time, _ = timed(get_all, backend, missing_keys)
+        multi_get_time, values = timed(backend.multi_get, keys)
+        iterate_time, total = timed(iterate_all, backend)
+        if found != len(keys) or len(values) != len(keys):
+            logging.error("%s backend found %d/%d keys." % (backend_name, found, len(keys)))
+        sys.stdout.write("%-10s %10.3f %12.2f %12.2f %12.2f %12.3f\n" % (
+            backend_name,
+            open_time,
+            get_time / max(len(keys), 1) * 1e6,
+            miss_time / max(len(keys), 1) * 1e6,
+            multi_get_time / max(len(keys), 1) * 1e6,
+            iterate_time,
+        ))
+        backend.close()
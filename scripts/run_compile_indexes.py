@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts converts built LevelDB indexes into compiled read-only index files (see wikiref.mmapindex)
+or into sqlite files. When such file is present in the index directory, it is used instead of the LevelDB one.
+"""
+
+import os
+import shutil
+import logging
+import argparse
+import itertools
+
+from wikiref.storage import index_path
+from wikiref.storage import open_backend
+from wikiref.mmapindex import compile_index
+
+from wikiref.settings import INDEX_YAGO_TYPES_DIRNAME
+from wikiref.settings import INDEX_YAGO_NODES_DIRNAME
+from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
+from wikiref.settings import INDEX_YAGO_ANCESTORS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_KEYS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME
+from wikiref.settings import INDEX_YAGO_TYPED_FILENAME
+from wikiref.settings import INDEX_YAGO_NODE_TYPES_FILENAME
+from wikiref.settings import INDEX_STATS_FILENAME
+
+
+INDEX_DIRNAMES = (
+    INDEX_YAGO_CLASS_DICT_DIRNAME,
+    INDEX_YAGO_CLASS_KEYS_DIRNAME,
+    INDEX_YAGO_CLASS_SEARCH_DIRNAME,
+    INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME,
+    INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME,
+    INDEX_YAGO_TAXONOMY_DIRNAME,
+    INDEX_YAGO_ANCESTORS_DIRNAME,
+    INDEX_YAGO_TYPES_DIRNAME,
+    INDEX_YAGO_NODES_DIRNAME,
+)
+
+
+logging.basicConfig(level=logging.INFO)
+parser = argparse.ArgumentParser()
+parser.add_argument("-i", "--idir", default=None, type=str, help="Directory with LevelDB indexes.")
+parser.add_argument("-o", "--odir", default=None, type=str,
+                    help="Output directory for compiled indexes (default is the input directory).")
+parser.add_argument("-b", "--backend", default="mmap", type=str, choices=("mmap", "sqlite"),
+                    help="Output storage backend.")
+parser.add_argument("-t", "--tmpdir", default=None, type=str, help="Directory for temporary files.")
+args = parser.parse_args()
+
+odir = args.odir if args.odir is not None else args.idir
+
+logging.info("Input: %r" % args.idir)
+logging.info("Output: %r" % odir)
+
+for dirname in INDEX_DIRNAMES:
+    ldb_path = os.path.join(args.idir, dirname)
+    if not os.path.isdir(ldb_path):
+        logging.info("Skipping %s, no such index." % dirname)
+        continue
+    source = open_backend(ldb_path, "leveldb")
+    output_path = index_path(odir, dirname, args.backend)
+    if args.backend == "mmap":
+        compile_index(source.iterate(), output_path, tmp_dir=args.tmpdir)
+    else:
+        output = open_backend(output_path, args.backend)
+        items = source.iterate()
+        for chunk in iter(lambda: list(itertools.islice(items, 100000)), []):
+            output.write(chunk)
+        output.close()
+        logging.info("Converted %s into %s." % (dirname, output_path))
+
+if odir != args.idir:
+    for filename in (INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME,
+                     INDEX_YAGO_TYPED_FILENAME,
+                     INDEX_YAGO_NODE_TYPES_FILENAME,
+                     INDEX_STATS_FILENAME):
+        if os.path.exists(os.path.join(args.idir, filename)):
+            shutil.copyfile(os.path.join(args.idir, filename), os.path.join(odir, filename))
+            logging.info("Copied %s." % filename)
+
+logging.info("[DONE]")
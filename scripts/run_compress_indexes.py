@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts rewrites LevelDB indexes so that their large values (ambiguous labels of class dict and
+common words of class search) are compressed with lz4. Compressed indexes are read transparently by
+every backend user, compiling them with run_compile_indexes.py gives uncompressed mmap/sqlite indexes.
+It should be run after all other indexes are built from the string indexes, using the same index directory.
+"""
+
+import logging
+import argparse
+
+from wikiref.indexing import compress_index
+
+from wikiref.settings import INDEX_COMPRESSION_THRESHOLD
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+
+
+logging.basicConfig(level=logging.INFO)
+parser = argparse.ArgumentParser()
+parser.add_argument("index_dir", type=str, help="Index directory.")
+parser.add_argument("-n", "--names", default="%s:%s" % (INDEX_YAGO_CLASS_DICT_DIRNAME, INDEX_YAGO_CLASS_SEARCH_DIRNAME),
+                    type=str, help="List of indexes to compress, delimited by colons.")
+parser.add_argument("-c", "--threshold", default=INDEX_COMPRESSION_THRESHOLD, type=int,
+                    help="Minimum size of compressed values in bytes.")
+args = parser.parse_args()
+
+
+for dirname in args.names.split(":"):
+    compress_index(args.index_dir, dirname, threshold=args.threshold)
+
+
+logging.info("[DONE]")
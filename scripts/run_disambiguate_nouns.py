@@ -9,15 +9,26 @@
 
 import os
 import sys
+import string
+import hashlib
 import logging
 import argparse
+import collections
+import multiprocessing
 
 
 from wikiref.yago import YagoTypes
+from wikiref.yago import YagoNodeDict
 from wikiref.yago import YagoTaxonomy
 from wikiref.yago import YagoClassDict
 from wikiref.yago import YagoClassSearch
+from wikiref.yago import YagoBitmapSearch
 
+from wikiref.storage import index_path
+from wikiref.storage import detect_backend
+from wikiref.indexing import read_index_stats
+from wikiref.indexing import read_index_version
+from wikiref.results import ResultCache
 from wikiref.formats import TripleStoreReader
 from wikiref.disambig import MinClassDisambigSolver
 
@@ -28,9 +39,157 @@ from wikiref.settings import CSV_NODE_NODE_DELIMITER
 from wikiref.settings import CSV_NODE_SCORE_DELIMITER
 
 from wikiref.settings import INDEX_YAGO_TYPES_DIRNAME
+from wikiref.settings import INDEX_YAGO_NODES_DIRNAME
 from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
+from wikiref.settings import INDEX_YAGO_ANCESTORS_DIRNAME
 from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
 from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_KEYS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME
+from wikiref.settings import INDEX_YAGO_TYPED_FILENAME
+from wikiref.settings import INDEX_YAGO_NODE_TYPES_FILENAME
+from wikiref.settings import INDEX_BACKEND
+from wikiref.settings import INDEX_LOOKUP_CACHE_SIZE
+from wikiref.settings import RESULT_CACHE_SIZE
+from wikiref.settings import DISAMBIGUATION_BATCH_SIZE
+
+
+INDEX_DIRNAMES = (
+    INDEX_YAGO_NODES_DIRNAME,
+    INDEX_YAGO_CLASS_DICT_DIRNAME,
+    INDEX_YAGO_CLASS_KEYS_DIRNAME,
+    INDEX_YAGO_CLASS_SEARCH_DIRNAME,
+    INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME,
+    INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME,
+    INDEX_YAGO_ANCESTORS_DIRNAME,
+    INDEX_YAGO_TAXONOMY_DIRNAME,
+    INDEX_YAGO_TYPES_DIRNAME,
+)
+
+
+def open_solver(args, names_set):
+    """
+    Opens indexes of args.index with args.backend and returns solver using them.
+    """
+    index_dir = args.index
+
+    nodes_dir = index_path(index_dir, INDEX_YAGO_NODES_DIRNAME, args.backend)
+    if os.path.exists(nodes_dir):
+        node_types_path = os.path.join(index_dir, INDEX_YAGO_NODE_TYPES_FILENAME)
+        if not os.path.exists(node_types_path):
+            # Classifying node ids by their names would read a name for every checked node.
+            raise ValueError("Node types file %s not found, convert indexes again with run_index_node_ids.py."
+                             % node_types_path)
+        yago_node_dict = YagoNodeDict(nodes_dir,
+                                      node_types_path=node_types_path,
+                                      cache_size=args.lookup_cache,
+                                      backend=args.backend)
+    else:
+        yago_node_dict = None
+    logging.info("Yago Node Dict: %r" % yago_node_dict)
+
+    bloom_path = os.path.join(index_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME)
+    if os.path.exists(bloom_path):
+        logging.info("Class dict Bloom filter: %r" % read_index_stats(index_dir).get(INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME))
+    else:
+        bloom_path = None
+
+    keys_dir = index_path(index_dir, INDEX_YAGO_CLASS_KEYS_DIRNAME, args.backend)
+    if not os.path.exists(keys_dir):
+        logging.warning("No label keys index found, every permutation of lemmas will be looked up.")
+        keys_dir = None
+
+    yago_class_dict = YagoClassDict(index_path(index_dir, INDEX_YAGO_CLASS_DICT_DIRNAME, args.backend),
+                                    bloom_path=bloom_path,
+                                    keys_root=keys_dir,
+                                    node_dict=yago_node_dict,
+                                    cache_size=args.lookup_cache,
+                                    backend=args.backend)
+    logging.info("Yago Class Dict: %r" % yago_class_dict)
+
+    lengths_dir = index_path(index_dir, INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME, args.backend)
+    if not os.path.exists(lengths_dir):
+        logging.warning("No posting lengths index found, postings will be fetched to order search terms.")
+        lengths_dir = None
+
+    bitmaps_dir = index_path(index_dir, INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME, args.backend)
+    if yago_node_dict is not None and os.path.exists(bitmaps_dir):
+        yago_class_search = YagoBitmapSearch(bitmaps_dir,
+                                             lengths_root=lengths_dir,
+                                             node_dict=yago_node_dict,
+                                             cache_size=args.lookup_cache,
+                                             backend=args.backend)
+    else:
+        yago_class_search = YagoClassSearch(index_path(index_dir, INDEX_YAGO_CLASS_SEARCH_DIRNAME, args.backend),
+                                            lengths_root=lengths_dir,
+                                            node_dict=yago_node_dict,
+                                            cache_size=args.lookup_cache,
+                                            backend=args.backend)
+    logging.info("Yago Class Search: %r" % yago_class_search)
+
+    ancestors_dir = index_path(index_dir, INDEX_YAGO_ANCESTORS_DIRNAME, args.backend)
+    if not os.path.exists(ancestors_dir):
+        logging.warning("No ancestors index found, taxonomy paths will be walked node by node.")
+        ancestors_dir = None
+
+    yago_taxonomy = YagoTaxonomy(index_path(index_dir, INDEX_YAGO_TAXONOMY_DIRNAME, args.backend),
+                                 ancestors_root=ancestors_dir,
+                                 node_dict=yago_node_dict,
+                                 cache_size=args.lookup_cache,
+                                 backend=args.backend)
+    logging.info("Yago Taxonomy: %r" % yago_taxonomy)
+
+    typed_path = os.path.join(index_dir, INDEX_YAGO_TYPED_FILENAME)
+    if yago_node_dict is None or not os.path.exists(typed_path):
+        typed_path = None
+
+    yago_types = YagoTypes(index_path(index_dir, INDEX_YAGO_TYPES_DIRNAME, args.backend),
+                           typed_path=typed_path,
+                           node_dict=yago_node_dict,
+                           cache_size=args.lookup_cache,
+                           backend=args.backend)
+    logging.info("Yago Types: %r" % yago_types)
+
+    return MinClassDisambigSolver(yago_class_dict,
+                                    yago_class_search,
+                                    yago_taxonomy,
+                                    yago_types,
+                                    names_set,
+                                    node_dict=yago_node_dict,
+                                    max_lemmas=args.max_lemmas,
+                                    max_comb_size=args.max_comb_size,
+                                    prune=args.prune == 1)
+
+
+
+def solve_lemma_lists(solver, lemma_lists, debug=False):
+    """
+    Returns results of @lemma_lists in input order, lemma lists without results
+    are solved once more with LCA.
+    """
+    found = solver.disambiguate_many(lemma_lists, return_size=-1, depth=2, debug=debug, try_lca=False)
+    empty = [i for i, nodes in enumerate(found) if nodes is None or len(nodes) == 0]
+    found_lca = solver.disambiguate_many([lemma_lists[i] for i in empty], return_size=-1, depth=2, debug=debug,
+                                         try_lca=True)
+    for i, nodes in zip(empty, found_lca):
+        found[i] = nodes
+    return found
+
+
+# Solver of the worker process, each worker opens its own index handles.
+worker_solver = None
+
+
+def init_worker(args, names_set):
+    global worker_solver
+    logging.getLogger().setLevel(logging.WARNING)
+    worker_solver = open_solver(args, names_set)
+
+
+def solve_in_worker(lemma_lists, debug):
+    return solve_lemma_lists(worker_solver, lemma_lists, debug)
 
 
 if __name__ == "__main__":
@@ -44,12 +203,33 @@ if __name__ == "__main__":
                         help="A path to the result file.")
     parser.add_argument("-n", "--names",    default=None,       type=str,
                         help="A path to the names set file.")
-    parser.add_argument("-n", "--lang",    default=None,       type=str,
+    parser.add_argument("-g", "--lang",    default=None,       type=str,
                         help="Input language.")
     parser.add_argument("-l", "--delim",    default=245,        type=int,
                         help="Triple store CSV delimiter.")
     parser.add_argument("-t", "--test",    default=0,           type=int, choices=(0, 1),
                         help="Run tests.")
+    parser.add_argument("-c", "--lookup-cache", default=INDEX_LOOKUP_CACHE_SIZE, type=int,
+                        help="Number of cached lookups per index (0 disables caching).")
+    parser.add_argument("-b", "--backend", default=INDEX_BACKEND, type=str,
+                        choices=("auto", "leveldb", "sqlite", "mmap", "memory"),
+                        help="Index storage backend, auto detects it by index file extensions.")
+    parser.add_argument("-x", "--max-lemmas", default=None, type=int,
+                        help="Maximum number of lemmas of a term which are combined (default is no limit).")
+    parser.add_argument("-z", "--max-comb-size", default=None, type=int,
+                        help="Maximum number of lemmas in a checked combination (default is no limit).")
+    parser.add_argument("-p", "--prune", default=0, type=int, choices=(0, 1),
+                        help="Skip class search of combinations with lemmas which never occur together.")
+    parser.add_argument("-r", "--result-cache", default=None, type=str,
+                        help="A path to the sqlite file with cached results of lemma keys.")
+    parser.add_argument("-s", "--result-cache-size", default=RESULT_CACHE_SIZE, type=int,
+                        help="Maximum number of cached results, least recently used are evicted.")
+    parser.add_argument("-a", "--import-cache", default=None, type=str,
+                        help="A path to the old TSV results cache to import into the result cache.")
+    parser.add_argument("-m", "--batch-size", default=DISAMBIGUATION_BATCH_SIZE, type=int,
+                        help="Number of triples whose terms are disambiguated in one batch.")
+    parser.add_argument("-w", "--workers", default=1, type=int,
+                        help="Number of worker processes, batches are solved in parallel (needs compiled indexes).")
 
 
     args = parser.parse_args()
@@ -65,26 +245,22 @@ if __name__ == "__main__":
 
     logging.basicConfig(level=logging.INFO)
     logging.info("Index directory: %s" % index_dir)
+    logging.info("Index version: %s" % read_index_version(index_dir))
     logging.info("Input triples file: %r" % ifile)
     logging.info("Output file: %r" % ofile)
 
-    yago_class_dict = YagoClassDict(os.path.join(index_dir, INDEX_YAGO_CLASS_DICT_DIRNAME))
-    logging.info("Yago Class Dict: %r" % yago_class_dict)
-
-    yago_class_search = YagoClassSearch(os.path.join(index_dir, INDEX_YAGO_CLASS_SEARCH_DIRNAME))
-    logging.info("Yago Class Search: %r" % yago_class_search)
-
-    yago_taxonomy = YagoTaxonomy(os.path.join(index_dir, INDEX_YAGO_TAXONOMY_DIRNAME))
-    logging.info("Yago Taxonomy: %r" % yago_taxonomy)
-
-    yago_types = YagoTypes(os.path.join(index_dir, INDEX_YAGO_TYPES_DIRNAME))
-    logging.info("Yago Types: %r" % yago_types)
-
-    solver = MinClassDisambigSolver(yago_class_dict,
-                                    yago_class_search,
-                                    yago_taxonomy,
-                                    yago_types,
-                                    names_set)
+    if args.workers > 1:
+        locked_paths = [path for path in (index_path(index_dir, dirname, args.backend) for dirname in INDEX_DIRNAMES)
+                        if os.path.exists(path) and detect_backend(path) == "leveldb"]
+        if len(locked_paths) > 0:
+            parser.error("LevelDB index can be opened by one process only, compile indexes with "
+                         "run_compile_indexes.py to use workers: %s" % ", ".join(locked_paths))
+        solver = None
+        pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args, names_set))
+        logging.info("Started %d worker processes." % args.workers)
+    else:
+        solver = open_solver(args, names_set)
+        pool = None
 
     delimiter = "," if args.delim is None else chr(args.delim)
 
@@ -98,10 +274,10 @@ if __name__ == "__main__":
 
     def dismabiguate_eng(lemmas):
         long_lemma = " ".join(lemmas)
-        nodes_set = yago_class_dict[long_lemma]
+        nodes_set = solver.class_dict[long_lemma]
 
         if nodes_set is not None and nodes_set.instance_count() == 0 and nodes_set.size() > 0:
-            nodes = nodes_set.nodes
+            nodes = nodes_set.names()
             score = 1.0 / len(nodes)
             logging.info(nodes)
             return [(node, score) for node in nodes]
@@ -110,9 +286,9 @@ if __name__ == "__main__":
             nodes = solver.disambiguate(lemmas, return_size=-1, depth=2, debug=True, try_lca=False)
             return nodes
 
-        nodes_set = yago_class_dict[lemmas[-1]]
+        nodes_set = solver.class_dict[lemmas[-1]]
         if nodes_set is not None and nodes_set.instance_count() == 0 and nodes_set.size() > 0:
-            nodes = nodes_set.nodes
+            nodes = nodes_set.names()
             score = 1.0 / len(nodes)
             return [(node, score) for node in nodes]
 
@@ -122,84 +298,144 @@ if __name__ == "__main__":
         return nodes
 
 
-    def load_cache():
-        cache_fl = open("/Volumes/1TB/wikiref_result/cache.txt", "rb")
-        cache = {}
-        for line in cache_fl:
-            row = line.rstrip("\n").split("\t")
-            lemma = row[1]
-            nodes = [n.split(" ") for n in row[2].split(";") if len(n)]
-            if len(nodes) == 0:
-                continue
-            nodes = [(n, float(s)) for n,s in nodes]
-            if lemma not in cache:
-                cache[lemma] = nodes
-        return cache
-
-    cache = load_cache()
-    logging.info("Loaded %d entries from cache." % len(cache))
-
-    for tr_no, tr in enumerate(reader):
-
-        if tr_no % 10000 == 0:
-            logging.info("Processed %d triples." % tr_no)
-
-        ofile.write(tr.rel_type)
-        error_occured = False
-        for term_pos in tr.arguments:
-            ofile.write(CSV_TRIPLE_ARG_DELIMITER)
-            if term_pos is None:
-                ofile.write("<NONE>")
-            else:
-                term, pos = term_pos
-                if pos != "NN":
-                    ofile.write(term)
-                    ofile.write(CSV_TERM_POS_DELIMITER)
-                    ofile.write(pos)
+    result_cache = None
+    if args.result_cache is not None:
+        cache_version = read_index_version(index_dir)
+        if cache_version is None:
+            logging.warning("Index has no version stamp, result cache is disabled.")
+        else:
+            if args.names is not None:
+                cache_version += "-" + hashlib.md5(open(args.names, "rb").read()).hexdigest()[:8]
+            if args.max_lemmas is not None or args.max_comb_size is not None:
+                # Bounded search gives other results than full search, so they are cached separately.
+                cache_version += "-x%s-z%s" % (args.max_lemmas, args.max_comb_size)
+            result_cache = ResultCache(args.result_cache, cache_version, max_size=args.result_cache_size)
+            if args.import_cache is not None:
+                result_cache.import_tsv(args.import_cache)
+    logging.info("Result cache: %r" % result_cache)
+
+    def term_lemmas(term):
+        lemmas = sorted(term.split("&&"))
+        lemmas = [lemma for lemma in lemmas if has_letter(lemma)]
+        lemmas = [l.replace("_", " ").replace("-", " ") for l in lemmas]
+        return lemmas
+
+    def read_batches(triples, batch_size):
+        batch = []
+        for tr in triples:
+            batch.append(tr)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+
+    def start_batch(batch):
+        """
+        Looks up results of the @batch terms in the result cache and starts
+        solving the missing ones (in a worker process if there are workers).
+        Terms in test mode are solved separately with debug output.
+        """
+        terms = [term_lemmas(term_pos[0]) for tr in batch for term_pos in tr.arguments
+                 if term_pos is not None and term_pos[1] == "NN"]
+        verbose = [args.test == 1 and len(lemmas) > 1 for lemmas in terms]
+        results = dict()
+        jobs = []
+        for debug in (False, True):
+            missing = []
+            for lemmas, is_verbose in zip(terms, verbose):
+                lemma_key = "&".join(lemmas)
+                if is_verbose != debug or lemma_key in results:
+                    continue
+                nodes = result_cache.get(lemma_key) if result_cache is not None else None
+                results[lemma_key] = nodes
+                if nodes is None:
+                    if len(lemmas) > 1 and result_cache is not None:
+                        logging.info("Not found %r" % lemma_key)
+                    missing.append(lemmas)
+            if len(missing) > 0:
+                if pool is None:
+                    jobs.append((missing, solve_lemma_lists(solver, missing, debug)))
                 else:
-                    lemmas = sorted(term.split("&&"))
-                    lemmas = [lemma for lemma in lemmas if has_letter(lemma)]
-                    lemmas = [l.replace("_", " ").replace("-", " ") for l in lemmas]
-
-                    lemma_key = "&".join(lemmas)
-
-                    if len(lemmas) > 1 and args.test == 1:
-                        sys.stderr.write("Lemmas: %s\n" % ", ".join(lemmas))
-
-                        nodes = cache.get(lemma_key)
-                        if nodes is None:
-                            if len(lemmas) > 1:
-                                logging.info("Not found %r" % lemma_key)
-                            nodes = solver.disambiguate(lemmas, return_size=-1, depth=2, debug=True, try_lca=False)
-
-                        if len(nodes) == 0:
-                            nodes = solver.disambiguate(lemmas, return_size=-1, depth=2, debug=True, try_lca=True)
-
-                        sys.stderr.write("FINAL_RESULT: %s" % " ".join(lemmas))
-                        sys.stderr.write(" => ")
-                        sys.stderr.write("[%s]" % ", ".join([n for n, w in nodes]))
-                        sys.stderr.write("\n\n\n\n\n\n")
+                    jobs.append((missing, pool.apply_async(solve_in_worker, (missing, debug))))
+        return batch, terms, verbose, results, jobs
+
+    def finish_batch(batch, terms, verbose, results, jobs):
+        for missing, job in jobs:
+            found = job if pool is None else job.get()
+            for lemmas, nodes in zip(missing, found):
+                results["&".join(lemmas)] = nodes
+                if result_cache is not None:
+                    result_cache.put("&".join(lemmas), nodes)
+        return batch, iter(zip(terms, verbose)), results
+
+    # Batches are written in input order, at most 2 batches per worker are in flight.
+    max_in_flight = 2 * args.workers if pool is not None else 1
+    in_flight = collections.deque()
+    batches = read_batches(reader, args.batch_size)
+    tr_no = 0
+
+    while True:
+
+        for batch in batches:
+            in_flight.append(start_batch(batch))
+            if len(in_flight) >= max_in_flight:
+                break
+        if len(in_flight) == 0:
+            break
+        batch, terms, results = finish_batch(*in_flight.popleft())
+
+        for tr in batch:
+
+            if tr_no % 10000 == 0:
+                logging.info("Processed %d triples." % tr_no)
+            tr_no += 1
+
+            ofile.write(tr.rel_type)
+            error_occured = False
+            for term_pos in tr.arguments:
+                ofile.write(CSV_TRIPLE_ARG_DELIMITER)
+                if term_pos is None:
+                    ofile.write("<NONE>")
+                else:
+                    term, pos = term_pos
+                    if pos != "NN":
+                        ofile.write(term)
+                        ofile.write(CSV_TERM_POS_DELIMITER)
+                        ofile.write(pos)
                     else:
+                        lemmas, is_verbose = next(terms)
+                        nodes = results["&".join(lemmas)]
 
-                        nodes = cache.get(lemma_key)
+                        if is_verbose:
+                            sys.stderr.write("Lemmas: %s\n" % ", ".join(lemmas))
+                            sys.stderr.write("FINAL_RESULT: %s" % " ".join(lemmas))
+                            sys.stderr.write(" => ")
+                            sys.stderr.write("[%s]" % ", ".join([n for n, w in nodes]))
+                            sys.stderr.write("\n\n\n\n\n\n")
 
-                        if nodes is None:
-                            if len(lemmas) > 1:
-                                logging.info("Not found %r" % lemma_key)
-                            nodes = solver.disambiguate(lemmas, return_size=-1, depth=2, debug=False, try_lca=False)
-                        if nodes is None or len(nodes) == 0:
-                            nodes = solver.disambiguate(lemmas, return_size=-1, depth=2, debug=False, try_lca=True)
+                        ofile.write(term)
 
-                    ofile.write(term)
+                        ofile.write(CSV_TERM_POS_DELIMITER)
+                        ofile.write(pos)
+                        ofile.write(CSV_TERM_NODE_DELIMITER)
+                        ofile.write(CSV_NODE_NODE_DELIMITER.join([CSV_NODE_SCORE_DELIMITER.join((n, "%.8f" % s))
+                                                                  for n, s in nodes]))
+            if not error_occured:
 
-                    ofile.write(CSV_TERM_POS_DELIMITER)
-                    ofile.write(pos)
-                    ofile.write(CSV_TERM_NODE_DELIMITER)
-                    ofile.write(CSV_NODE_NODE_DELIMITER.join([CSV_NODE_SCORE_DELIMITER.join((n, "%.8f" % s))
-                                                              for n, s in nodes]))
-        if not error_occured:
+                ofile.write(CSV_TRIPLE_ARG_DELIMITER)
+                ofile.write(str(tr.frequency))
 
-            ofile.write(CSV_TRIPLE_ARG_DELIMITER)
-            ofile.write(str(tr.frequency))
+                ofile.write("\n")
 
-            ofile.write("\n")
\ No newline at end of file
+    if pool is not None:
+        pool.close()
+        pool.join()
+    else:
+        for index in (solver.class_dict, solver.class_search, solver.taxonomy, solver.types):
+            logging.info("%r: %r, large values: %r" % (index, index.cache, index.large_values))
+        logging.info("Search bounds hit: %r, pruned combinations: %d." % (dict(solver.bound_hits),
+                                                                         solver.pruned_combinations))
+    if result_cache is not None:
+        result_cache.close()
+        logging.info("%r" % result_cache)
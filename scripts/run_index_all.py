@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts creates class dict, class search, node labels, taxonomy, ancestors, types, posting lengths and
+label keys indexes (and Bloom filter of class dict labels) in one pass over the Yago dumps. Every input is read
+once and each index is written by its own process.
+For usage examples, please see run_create_disambig_indexes.sh.
+"""
+
+import os
+import logging
+import argparse
+
+from wikiref.storage import open_backend
+from wikiref.util import set_tokenizer
+from wikiref.tokenizer import TOKENIZERS
+from wikiref.indexing import MultiIndexBuilder
+from wikiref.indexing import build_ancestor_index
+from wikiref.indexing import build_posting_lengths
+from wikiref.indexing import build_label_keys
+from wikiref.indexing import open_index_writer
+from wikiref.indexing import build_class_dict_bloom
+from wikiref.indexing import compress_index
+from wikiref.indexing import stamp_index_version
+from wikiref.indexing import IndexUpdater
+
+from wikiref.settings import INDEX_MAX_CACHE_SIZE
+from wikiref.settings import INDEX_BLOOM_ERROR_RATE
+from wikiref.settings import INDEX_COMPRESSION_THRESHOLD
+from wikiref.settings import INDEX_LABEL_TOKENIZER
+from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
+from wikiref.settings import INDEX_YAGO_ANCESTORS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_KEYS_DIRNAME
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+parser = argparse.ArgumentParser()
+parser.add_argument("-i", "--labels", default=None, type=str, help="List of label files, delimited by colons.")
+parser.add_argument("-x", "--taxonomy", default=None, type=str, help="List of taxonomy files, delimited by colons.")
+parser.add_argument("-y", "--types", default=None, type=str, help="List of types files, delimited by colons.")
+parser.add_argument("-o", "--odir", default=None, type=str, help="Index directory.")
+parser.add_argument("-r", "--rels", default="<isPreferredMeaningOf> <redirectedFrom>", type=str,
+                    help="List of relations to index separated by spaces.")
+parser.add_argument("-l", "--lang", default="eng", type=str, help="List of languages to to index.")
+parser.add_argument("-a", "--ancestors", default=1, type=int, choices=(0, 1),
+                    help="Build ancestors index after taxonomy.")
+parser.add_argument("-p", "--lengths", default=1, type=int, choices=(0, 1),
+                    help="Build posting lengths index after class search.")
+parser.add_argument("-g", "--label-keys", default=1, type=int, choices=(0, 1),
+                    help="Build label keys index after class dict.")
+parser.add_argument("-f", "--bloom", default=1, type=int, choices=(0, 1),
+                    help="Build Bloom filter of class dict labels.")
+parser.add_argument("-e", "--bloom-error-rate", default=INDEX_BLOOM_ERROR_RATE, type=float,
+                    help="Target false positive rate of the Bloom filter.")
+parser.add_argument("-z", "--compress", default=0, type=int, choices=(0, 1),
+                    help="Compress large values of class dict and class search indexes with lz4.")
+parser.add_argument("-c", "--compress-threshold", default=INDEX_COMPRESSION_THRESHOLD, type=int,
+                    help="Minimum size of compressed values in bytes.")
+parser.add_argument("-b", "--bulk", default=1, type=int, choices=(0, 1),
+                    help="Build empty index with sorted runs merge instead of read-modify-write flushes.")
+parser.add_argument("-m", "--max-items", default=INDEX_MAX_CACHE_SIZE, type=int,
+                    help="Maximum number of values kept in memory by each index before flushing (or spilling).")
+parser.add_argument("-t", "--tmpdir", default=None, type=str, help="Directory for sorted runs of bulk mode.")
+parser.add_argument("-s", "--shards", default=1, type=int,
+                    help="Number of shards of each index, each is written by its own process.")
+parser.add_argument("-k", "--tokenizer", default=INDEX_LABEL_TOKENIZER, choices=sorted(TOKENIZERS),
+                    help="Label tokenizer, \"punkt\" requires NLTK.")
+parser.add_argument("-u", "--delta", default=None, type=str,
+                    help="List of delta files, delimited by colons. If given, existing indexes are updated "
+                         "with lines \"+<TAB><yago_tsv_line>\" (added) and \"-<TAB><yago_tsv_line>\" (removed).")
+args = parser.parse_args()
+
+logging.info("Labels: %r" % args.labels)
+logging.info("Taxonomy: %r" % args.taxonomy)
+logging.info("Types: %r" % args.types)
+logging.info("Delta: %r" % args.delta)
+logging.info("Output: %r" % args.odir)
+logging.info("Tokenizer: %r" % args.tokenizer)
+
+set_tokenizer(args.tokenizer)
+
+allowed_rels = frozenset(args.rels.split(" "))
+allowed_langs = frozenset(args.lang.split(":"))
+
+logging.info("Allowed relations: %r" % allowed_rels)
+logging.info("Allowed languages: %r" % allowed_langs)
+
+if args.delta is not None:
+    updater = IndexUpdater(args.odir, allowed_rels, allowed_langs)
+    updater.update(args.delta.split(":"))
+else:
+    builder = MultiIndexBuilder(args.odir,
+                                allowed_rels,
+                                allowed_langs,
+                                bulk=args.bulk == 1,
+                                max_items=args.max_items,
+                                tmp_dir=args.tmpdir,
+                                shards=args.shards)
+    builder.build(args.labels.split(":"), args.taxonomy.split(":"), args.types.split(":"))
+
+    if args.ancestors == 1:
+        taxonomy_index = open_backend(os.path.join(args.odir, INDEX_YAGO_TAXONOMY_DIRNAME), "leveldb")
+        ancestors_index = open_backend(os.path.join(args.odir, INDEX_YAGO_ANCESTORS_DIRNAME), "leveldb")
+        build_ancestor_index(taxonomy_index, ancestors_index)
+        taxonomy_index.close()
+        ancestors_index.close()
+
+    if args.lengths == 1:
+        search_index = open_backend(os.path.join(args.odir, INDEX_YAGO_CLASS_SEARCH_DIRNAME), "leveldb")
+        lengths_index = open_backend(os.path.join(args.odir, INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME), "leveldb")
+        build_posting_lengths(search_index, lengths_index)
+        search_index.close()
+        lengths_index.close()
+
+    if args.label_keys == 1:
+        class_dict_index = open_backend(os.path.join(args.odir, INDEX_YAGO_CLASS_DICT_DIRNAME), "leveldb")
+        keys_index = open_backend(os.path.join(args.odir, INDEX_YAGO_CLASS_KEYS_DIRNAME), "leveldb")
+        build_label_keys(class_dict_index,
+                         open_index_writer(keys_index, bulk=True, max_items=args.max_items, tmp_dir=args.tmpdir))
+        class_dict_index.close()
+
+    if args.bloom == 1:
+        build_class_dict_bloom(args.odir, error_rate=args.bloom_error_rate)
+
+    if args.compress == 1:
+        for dirname in (INDEX_YAGO_CLASS_DICT_DIRNAME, INDEX_YAGO_CLASS_SEARCH_DIRNAME):
+            compress_index(args.odir, dirname, threshold=args.compress_threshold)
+
+    stamp_index_version(args.odir, deltas=[])
+
+logging.info("[DONE]")
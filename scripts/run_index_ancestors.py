@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts creates index which maps taxonomy nodes into their depth and full path to the root.
+It should be run after run_index_taxonomy.py, using the same index directory.
+For usage examples, please see examples/creadte_indexes.sh.
+"""
+
+import os
+import sys
+import logging
+
+from wikiref.storage import open_backend
+from wikiref.indexing import build_ancestor_index
+
+from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
+from wikiref.settings import INDEX_YAGO_ANCESTORS_DIRNAME
+
+
+logging.basicConfig(level=logging.INFO)
+
+try:
+    _, output_dir = sys.argv
+except Exception:
+    logging.error("usage: %s <output_dir>" % __file__)
+    exit(1)
+
+
+TAXONOMY_INDEX = open_backend(os.path.join(output_dir, INDEX_YAGO_TAXONOMY_DIRNAME), "leveldb")
+ANCESTORS_INDEX = open_backend(os.path.join(output_dir, INDEX_YAGO_ANCESTORS_DIRNAME), "leveldb")
+
+
+build_ancestor_index(TAXONOMY_INDEX, ANCESTORS_INDEX)
+
+
+logging.info("[DONE]")
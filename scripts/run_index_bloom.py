@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts creates Bloom filter of all class dict labels, which lets run_disambiguate_nouns.py skip
+lookups of labels which are not in the index. Filter size and false positive rate are stored into the
+index stats file. It should be run after run_index_class_dict.py, using the same index directory.
+"""
+
+import logging
+import argparse
+
+from wikiref.indexing import build_class_dict_bloom
+
+from wikiref.settings import INDEX_BLOOM_ERROR_RATE
+
+
+logging.basicConfig(level=logging.INFO)
+parser = argparse.ArgumentParser()
+parser.add_argument("index_dir", type=str, help="Index directory.")
+parser.add_argument("-e", "--error-rate", default=INDEX_BLOOM_ERROR_RATE, type=float,
+                    help="Target false positive rate.")
+args = parser.parse_args()
+
+
+build_class_dict_bloom(args.index_dir, error_rate=args.error_rate)
+
+
+logging.info("[DONE]")
@@ -12,18 +12,16 @@ This scripts creates inverted index which maps yago labels to yago classes or in
 For usage examples, please see examples/creadte_indexes.sh.
 """
 
-import gc
 import os
 import sys
-import leveldb
 import logging
 import fileinput
 import argparse
 
 from wikiref.util import extract_label
-from wikiref.util import flush_dict_to_ldb
+from wikiref.indexing import create_index_writer
 
-from wikiref.settings import LDB_ARRAY_DELIM
+from wikiref.settings import INDEX_MAX_CACHE_SIZE
 from wikiref.settings import INDEX_YAGO_TSV_DELIM
 from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
 
@@ -35,6 +33,13 @@ parser.add_argument("-o", "--odir", default=None, type=str, help="List of input
 parser.add_argument("-r", "--rels", default="<isPreferredMeaningOf> <redirectedFrom>", type=str,
                     help="List of relations to index separated by spaces.")
 parser.add_argument("-l", "--lang", default="eng", type=str, help="List of languages to to index.")
+parser.add_argument("-b", "--bulk", default=0, type=int, choices=(0, 1),
+                    help="Build empty index with sorted runs merge instead of read-modify-write flushes.")
+parser.add_argument("-m", "--max-items", default=INDEX_MAX_CACHE_SIZE, type=int,
+                    help="Maximum number of values kept in memory before flushing (or spilling).")
+parser.add_argument("-t", "--tmpdir", default=None, type=str, help="Directory for sorted runs of bulk mode.")
+parser.add_argument("-s", "--shards", default=1, type=int,
+                    help="Number of index shards, each is written by its own process.")
 args = parser.parse_args()
 
 if args.input is None:
@@ -46,11 +51,12 @@ logging.info("Input: %r" % args.input)
 logging.info("Output: %r" % args.odir)
 
 
-CUR_SIZE = 0
-MAX_SIZE = 100000 * 128
-LDB = leveldb.LevelDB(os.path.join(args.odir, INDEX_YAGO_CLASS_DICT_DIRNAME))
+WRITER = create_index_writer(os.path.join(args.odir, INDEX_YAGO_CLASS_DICT_DIRNAME),
+                             bulk=args.bulk == 1,
+                             max_items=args.max_items,
+                             tmp_dir=args.tmpdir,
+                             shards=args.shards)
 
-index_cache = dict()
 allowed_rels = frozenset(args.rels.split(" "))
 allowed_langs = frozenset(args.lang.split(":"))
 
@@ -80,19 +86,9 @@ for line in i_file:
 
     label = label.lower()
 
-    if label in index_cache:
-        index_cache[label].append(node)
-    else:
-        index_cache[label] = [node]
-    CUR_SIZE += 1
+    WRITER.add(label, node)
 
-    if CUR_SIZE > MAX_SIZE:
-        flush_dict_to_ldb(LDB, index_cache)
-        index_cache = dict()
-        CUR_SIZE = 0
-        gc.collect()
 
-
-flush_dict_to_ldb(LDB, index_cache)
+WRITER.close()
 i_file.close()
 logging.info("[DONE]")
\ No newline at end of file
@@ -12,19 +12,20 @@ This scripts creates inverted index which maps from label words into yago classe
 For usage examples, please see examples/creadte_indexes.sh.
 """
 
-import gc
 import os
 import sys
-import leveldb
 import logging
 import fileinput
 import argparse
 
 from wikiref.util import extract_parts
+from wikiref.util import set_tokenizer
 from wikiref.util import extract_label
-from wikiref.util import flush_dict_to_ldb
+from wikiref.indexing import create_index_writer
+from wikiref.tokenizer import TOKENIZERS
 
-from wikiref.settings import LDB_ARRAY_DELIM
+from wikiref.settings import INDEX_MAX_CACHE_SIZE
+from wikiref.settings import INDEX_LABEL_TOKENIZER
 from wikiref.settings import INDEX_YAGO_TSV_DELIM
 from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
 
@@ -36,6 +37,15 @@ parser.add_argument("-o", "--odir", default=None, type=str, help="List of input
 parser.add_argument("-r", "--rels", default="<isPreferredMeaningOf> <redirectedFrom>", type=str,
                     help="List of relations to index separated by spaces.")
 parser.add_argument("-l", "--lang", default="eng", type=str, help="List of languages to to index.")
+parser.add_argument("-b", "--bulk", default=0, type=int, choices=(0, 1),
+                    help="Build empty index with sorted runs merge instead of read-modify-write flushes.")
+parser.add_argument("-m", "--max-items", default=INDEX_MAX_CACHE_SIZE, type=int,
+                    help="Maximum number of values kept in memory before flushing (or spilling).")
+parser.add_argument("-t", "--tmpdir", default=None, type=str, help="Directory for sorted runs of bulk mode.")
+parser.add_argument("-s", "--shards", default=1, type=int,
+                    help="Number of index shards, each is written by its own process.")
+parser.add_argument("-k", "--tokenizer", default=INDEX_LABEL_TOKENIZER, choices=sorted(TOKENIZERS),
+                    help="Label tokenizer, \"punkt\" requires NLTK.")
 args = parser.parse_args()
 
 if args.input is None:
@@ -45,13 +55,17 @@ else:
 
 logging.info("Input: %r" % args.input)
 logging.info("Output: %r" % args.odir)
+logging.info("Tokenizer: %r" % args.tokenizer)
 
-CUR_SIZE = 0
-MAX_SIZE = 100000 * 128
-LDB = leveldb.LevelDB(os.path.join(args.odir, INDEX_YAGO_CLASS_SEARCH_DIRNAME))
+set_tokenizer(args.tokenizer)
+
+WRITER = create_index_writer(os.path.join(args.odir, INDEX_YAGO_CLASS_SEARCH_DIRNAME),
+                             bulk=args.bulk == 1,
+                             max_items=args.max_items,
+                             tmp_dir=args.tmpdir,
+                             shards=args.shards)
 
 
-index_cache = dict()
 allowed_rels = frozenset(args.rels.split(" "))
 allowed_langs = frozenset(args.lang.split(":"))
 
@@ -79,18 +93,9 @@ for line in i_file:
     parts = extract_parts(label)
 
     for part in parts:
-        if part in index_cache:
-            index_cache[part].append(node)
-        else:
-            index_cache[part] = [node]
-        CUR_SIZE += 1
-
-    if CUR_SIZE > MAX_SIZE:
-        flush_dict_to_ldb(LDB, index_cache)
-        index_cache = dict()
-        CUR_SIZE = 0
+        WRITER.add(part, node)
 
 
-flush_dict_to_ldb(LDB, index_cache)
+WRITER.close()
 i_file.close()
 logging.info("[DONE]")
\ No newline at end of file
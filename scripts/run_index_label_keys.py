@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts creates index which maps sorted words of class dict labels into the labels, so that labels
+which are permutations of lemmas are found with a single lookup.
+It should be run after run_index_class_dict.py, using the same index directory.
+For usage examples, please see examples/creadte_indexes.sh.
+"""
+
+import os
+import sys
+import logging
+
+from wikiref.storage import open_backend
+from wikiref.indexing import open_index_writer
+from wikiref.indexing import build_label_keys
+
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_KEYS_DIRNAME
+
+
+logging.basicConfig(level=logging.INFO)
+
+try:
+    _, output_dir = sys.argv
+except Exception:
+    logging.error("usage: %s <output_dir>" % __file__)
+    exit(1)
+
+
+CLASS_DICT_INDEX = open_backend(os.path.join(output_dir, INDEX_YAGO_CLASS_DICT_DIRNAME), "leveldb")
+KEYS_WRITER = open_index_writer(open_backend(os.path.join(output_dir, INDEX_YAGO_CLASS_KEYS_DIRNAME), "leveldb"),
+                                bulk=True)
+
+
+build_label_keys(CLASS_DICT_INDEX, KEYS_WRITER)
+
+
+logging.info("[DONE]")
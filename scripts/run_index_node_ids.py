@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts converts built indexes into the node id format: yago nodes are interned into
+dense integer ids and posting lists are stored as varint encoded deltas of these ids. With --bitmaps
+class search postings are stored as compressed bitmaps instead.
+The output directory can be used as --index of run_disambiguate_nouns.py.
+"""
+
+import logging
+import argparse
+
+from wikiref.indexing import build_node_id_index
+
+
+logging.basicConfig(level=logging.INFO)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("input_dir", type=str, help="Directory with string indexes.")
+parser.add_argument("output_dir", type=str, help="Output directory for node id indexes.")
+parser.add_argument("-b", "--bitmaps", default=0, type=int, choices=(0, 1),
+                    help="Store class search postings as compressed bitmaps.")
+args = parser.parse_args()
+
+
+build_node_id_index(args.input_dir, args.output_dir, bitmaps=args.bitmaps == 1)
+
+
+logging.info("[DONE]")
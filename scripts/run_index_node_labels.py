@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts creates index which maps yago classes or instances to their label triples of all languages. It is
+needed to apply delta files to class dict and class search indexes (see run_index_all.py --delta).
+For usage examples, please see examples/creadte_indexes.sh.
+"""
+
+import os
+import sys
+import logging
+import fileinput
+import argparse
+
+from wikiref.util import extract_label
+from wikiref.indexing import node_label_row
+from wikiref.indexing import create_index_writer
+
+from wikiref.settings import INDEX_MAX_CACHE_SIZE
+from wikiref.settings import INDEX_YAGO_TSV_DELIM
+from wikiref.settings import INDEX_YAGO_NODE_LABELS_DIRNAME
+
+
+logging.basicConfig(level=logging.INFO)
+parser = argparse.ArgumentParser()
+parser.add_argument("-i", "--input", default=None, type=str, help="List of input files, delimited by colons.")
+parser.add_argument("-o", "--odir", default=None, type=str, help="Index directory.")
+parser.add_argument("-r", "--rels", default="<isPreferredMeaningOf> <redirectedFrom>", type=str,
+                    help="List of relations to index separated by spaces.")
+parser.add_argument("-b", "--bulk", default=0, type=int, choices=(0, 1),
+                    help="Build empty index with sorted runs merge instead of read-modify-write flushes.")
+parser.add_argument("-m", "--max-items", default=INDEX_MAX_CACHE_SIZE, type=int,
+                    help="Maximum number of values kept in memory before flushing (or spilling).")
+parser.add_argument("-t", "--tmpdir", default=None, type=str, help="Directory for sorted runs of bulk mode.")
+parser.add_argument("-s", "--shards", default=1, type=int,
+                    help="Number of index shards, each is written by its own process.")
+args = parser.parse_args()
+
+if args.input is None:
+    i_file = sys.stdin
+else:
+    i_file = fileinput.input(args.input.split(":"))
+
+logging.info("Input: %r" % args.input)
+logging.info("Output: %r" % args.odir)
+
+
+WRITER = create_index_writer(os.path.join(args.odir, INDEX_YAGO_NODE_LABELS_DIRNAME),
+                             bulk=args.bulk == 1,
+                             max_items=args.max_items,
+                             tmp_dir=args.tmpdir,
+                             shards=args.shards)
+
+allowed_rels = frozenset(args.rels.split(" "))
+
+logging.info("Allowed relations: %r" % allowed_rels)
+
+
+for line in i_file:
+
+    row = line.split(INDEX_YAGO_TSV_DELIM)
+    rel = row[2]
+
+    if rel not in allowed_rels:
+        continue
+
+    node = row[1]
+    label_lang = row[3]
+
+    try:
+        label, lang = extract_label(label_lang)
+    except ValueError:
+        logging.error("Unable to extract label from '%r'." % label_lang)
+        continue
+
+    if label is None:
+        continue
+
+    WRITER.add(node, node_label_row(rel, label, lang))
+
+
+WRITER.close()
+i_file.close()
+logging.info("[DONE]")
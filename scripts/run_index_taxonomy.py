@@ -14,38 +14,46 @@ For usage examples, please see examples/creadte_indexes.sh.
 
 import os
 import sys
-import leveldb
 import logging
+import argparse
 import fileinput
 
-from wikiref.util import flush_dict_to_ldb
+from wikiref.indexing import create_index_writer
 
-from wikiref.settings import LDB_ARRAY_DELIM
+from wikiref.settings import INDEX_MAX_CACHE_SIZE
 from wikiref.settings import INDEX_TAXONOMY_REL
 from wikiref.settings import INDEX_YAGO_TSV_DELIM
 from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
 
 
 logging.basicConfig(level=logging.INFO)
+parser = argparse.ArgumentParser()
+parser.add_argument("yago_taxonomy_file", type=str, help="Input Yago TSV file.")
+parser.add_argument("output_dir", type=str, help="Index directory.")
+parser.add_argument("-b", "--bulk", default=0, type=int, choices=(0, 1),
+                    help="Build empty index with sorted runs merge instead of read-modify-write flushes.")
+parser.add_argument("-m", "--max-items", default=INDEX_MAX_CACHE_SIZE, type=int,
+                    help="Maximum number of values kept in memory before flushing (or spilling).")
+parser.add_argument("-t", "--tmpdir", default=None, type=str, help="Directory for sorted runs of bulk mode.")
+parser.add_argument("-s", "--shards", default=1, type=int,
+                    help="Number of index shards, each is written by its own process.")
+args = parser.parse_args()
 
-try:
-    _, yago_taxonomy_file, output_dir = sys.argv
-except Exception:
-    logging.error("usage: %s <yago_taxonomy_file> <output_dir>" % __file__)
-    exit(1)
+yago_taxonomy_file = args.yago_taxonomy_file
+output_dir = args.output_dir
 
 
-CUR_SIZE = 0
-MAX_SIZE = 100000 * 128
-LDB = leveldb.LevelDB(os.path.join(output_dir, INDEX_YAGO_TAXONOMY_DIRNAME))
+WRITER = create_index_writer(os.path.join(output_dir, INDEX_YAGO_TAXONOMY_DIRNAME),
+                             bulk=args.bulk == 1,
+                             max_items=args.max_items,
+                             tmp_dir=args.tmpdir,
+                             shards=args.shards)
 
 
 input_fl = fileinput.input((
     yago_taxonomy_file,
 ))
 
-index_cache = dict()
-
 
 for line in input_fl:
 
@@ -62,19 +70,10 @@ for line in input_fl:
     if len(child_class) == 0 or len(parent_class) == 0:
         continue
 
-    if child_class in index_cache:
-        index_cache[child_class].add(parent_class)
-    else:
-        index_cache[child_class] = {parent_class}
-    CUR_SIZE += 1
-
-    if CUR_SIZE > MAX_SIZE:
-        flush_dict_to_ldb(LDB, index_cache)
-        index_cache = dict()
-        CUR_SIZE = 0
+    WRITER.add(child_class, parent_class)
 
 
-flush_dict_to_ldb(LDB, index_cache)
+WRITER.close()
 
 
 input_fl.close()
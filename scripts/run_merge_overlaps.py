@@ -14,6 +14,7 @@ from wikiref.settings import CSV_TERM_POS_DELIMITER
 from wikiref.settings import CSV_TERM_NODE_DELIMITER
 from wikiref.settings import CSV_NODE_NODE_DELIMITER
 from wikiref.settings import CSV_NODE_SCORE_DELIMITER
+from wikiref.settings import INDEX_BACKEND
 
 
 
@@ -26,9 +27,11 @@ if __name__ == "__main__":
                         help="A path to the input csv file with the triples.")
     parser.add_argument("-d", "--debug",    default=0,          type=int,
                         choices=(0, 1),     help="Dump debug information.")
+    parser.add_argument("-b", "--backend",  default=INDEX_BACKEND,  type=str,
+                        choices=("auto", "leveldb", "sqlite"), help="Merge index storage backend.")
     args = parser.parse_args()
 
-    triple_index = MergeIndex(args.idir)
+    triple_index = MergeIndex(args.idir, backend=args.backend)
 
     reader = DisambiguatedTripletReader(None,
                                         CSV_TRIPLE_ARG_DELIMITER,
@@ -14,6 +14,7 @@ from wikiref.settings import CSV_TERM_POS_DELIMITER
 from wikiref.settings import CSV_TERM_NODE_DELIMITER
 from wikiref.settings import CSV_NODE_NODE_DELIMITER
 from wikiref.settings import CSV_NODE_SCORE_DELIMITER
+from wikiref.settings import INDEX_BACKEND
 
 from wikiref.merger import MergeIndex
 from wikiref.merger import get_pattern
@@ -30,6 +31,8 @@ if __name__ == "__main__":
                         help="Output directory with indexes.")
     parser.add_argument("-d", "--debug",    default=0,          type=int,
                         choices=(0, 1),     help="Dump debug information.")
+    parser.add_argument("-b", "--backend",  default=INDEX_BACKEND,  type=str,
+                        choices=("auto", "leveldb", "sqlite"), help="Merge index storage backend.")
     args = parser.parse_args()
 
     i_file = file(args.ifile, "rb") if args.ifile is not None else sys.stdin
@@ -46,7 +49,7 @@ if __name__ == "__main__":
     wnode_dict = {}
     wnode_stat = collections.Counter()
     triple_bins = dict()
-    triple_index = MergeIndex(args.odir)
+    triple_index = MergeIndex(args.odir, backend=args.backend)
 
     for triple_id, (triple, triple_line) in enumerate(reader):
 
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+This scripts checks that label tokenizer used for class search index gives the same parts as NLTK
+Punkt tokenizer on every label of the Yago label files. Exits with status 1 if any label differs.
+Requires NLTK.
+"""
+
+import sys
+import time
+import logging
+import fileinput
+import argparse
+
+from wikiref.util import extract_label
+from wikiref.tokenizer import TOKENIZERS
+from wikiref.tokenizer import LabelTokenizer
+
+from wikiref.settings import INDEX_YAGO_TSV_DELIM
+from wikiref.settings import INDEX_LABEL_TOKENIZER
+
+
+logging.basicConfig(level=logging.INFO)
+parser = argparse.ArgumentParser()
+parser.add_argument("-i", "--input", default=None, type=str, help="List of input files, delimited by colons.")
+parser.add_argument("-r", "--rels", default="<isPreferredMeaningOf> <redirectedFrom>", type=str,
+                    help="List of relations to check separated by spaces.")
+parser.add_argument("-k", "--tokenizer", default=INDEX_LABEL_TOKENIZER, choices=sorted(TOKENIZERS),
+                    help="Tokenizer to check.")
+parser.add_argument("-n", "--max-errors", default=20, type=int, help="Maximum number of differences to print.")
+args = parser.parse_args()
+
+if args.input is None:
+    i_file = sys.stdin
+else:
+    i_file = fileinput.input(args.input.split(":"))
+
+allowed_rels = frozenset(args.rels.split(" "))
+
+tokenizer = LabelTokenizer(args.tokenizer)
+reference = LabelTokenizer("punkt")
+
+labels = 0
+errors = 0
+tokenizer_time = 0.0
+reference_time = 0.0
+
+for line in i_file:
+
+    row = line.split(INDEX_YAGO_TSV_DELIM)
+    if len(row) < 4 or row[2] not in allowed_rels:
+        continue
+
+    try:
+        label, _ = extract_label(row[3])
+    except ValueError:
+        continue
+    label = label.lower()
+    labels += 1
+
+    start = time.time()
+    parts = tokenizer.tokenize(label)
+    tokenizer_time += time.time() - start
+
+    start = time.time()
+    expected = reference.tokenize(label)
+    reference_time += time.time() - start
+
+    if parts != expected:
+        errors += 1
+        if errors <= args.max_errors:
+            logging.error("Label %r: %r, expected %r." % (label, parts, expected))
+
+i_file.close()
+
+logging.info("Checked %d labels, %d differ." % (labels, errors))
+logging.info("Time: %s %.3fs, punkt %.3fs." % (args.tokenizer, tokenizer_time, reference_time))
+logging.info("[DONE]")
+
+exit(1 if errors > 0 else 0)
@@ -0,0 +1,78 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Round trips and intersections of RoaringBitmap with sparse (array) and dense (bit set) chunks.
+"""
+
+import random
+import unittest
+
+from wikiref.bitmap import ARRAY_MAX_SIZE
+from wikiref.bitmap import CHUNK_BITS
+from wikiref.bitmap import RoaringBitmap
+
+
+def random_ids(rnd, chunks, size):
+    """
+    Returns sorted ids in @chunks, @size random ids per chunk.
+    """
+    ids = set()
+    for chunk in chunks:
+        ids.update((chunk << CHUNK_BITS) | low for low in rnd.sample(xrange(1 << CHUNK_BITS), size))
+    return sorted(ids)
+
+
+class RoaringBitmapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rnd = random.Random(5)
+        self.sparse = random_ids(self.rnd, [0, 1, 7], 100)
+        self.dense = random_ids(self.rnd, [0, 1, 3], ARRAY_MAX_SIZE * 3)
+        self.full = range(3 << CHUNK_BITS, 4 << CHUNK_BITS)
+
+    def test_round_trip(self):
+        for ids in ([], [0], [(1 << 32) - 1], self.sparse, self.dense, self.full):
+            bitmap = RoaringBitmap.from_sorted(ids)
+            self.assertEqual(list(bitmap), ids)
+            self.assertEqual(len(bitmap), len(ids))
+            self.assertEqual(bool(bitmap), len(ids) > 0)
+            loaded = RoaringBitmap.loads(bitmap.dumps())
+            self.assertEqual(list(loaded), ids)
+            self.assertEqual(len(loaded), len(ids))
+            self.assertEqual(loaded.dumps(), bitmap.dumps())
+
+    def test_chunk_kinds(self):
+        bitmap = RoaringBitmap.from_sorted(self.dense + [(5 << CHUNK_BITS) | 1])
+        self.assertEqual(bitmap.sizes, [ARRAY_MAX_SIZE * 3] * 3 + [1])
+        self.assertTrue(isinstance(bitmap.chunks[0], (int, long)))
+        self.assertEqual(bitmap.chunks[3], [1])
+
+    def test_contains(self):
+        bitmap = RoaringBitmap.from_sorted(self.sparse + self.dense[-10:])
+        for node_id in self.sparse[::10] + self.dense[-10:]:
+            self.assertTrue(node_id in bitmap)
+        absent = sorted(set(range(1 << CHUNK_BITS)) - set(self.sparse + self.dense[-10:]))
+        for node_id in absent[::100] + [2 << CHUNK_BITS, 8 << CHUNK_BITS]:
+            self.assertFalse(node_id in bitmap)
+
+    def test_and(self):
+        id_lists = [self.sparse, self.dense, self.full, [], random_ids(self.rnd, [0, 3], ARRAY_MAX_SIZE + 1)]
+        for ids_1 in id_lists:
+            for ids_2 in id_lists:
+                expected = sorted(set(ids_1) & set(ids_2))
+                conjunction = RoaringBitmap.from_sorted(ids_1) & RoaringBitmap.from_sorted(ids_2)
+                self.assertEqual(list(conjunction), expected)
+                self.assertEqual(len(conjunction), len(expected))
+                bitmap_1, bitmap_2 = RoaringBitmap.from_sorted(ids_1), RoaringBitmap.from_sorted(ids_2)
+                self.assertEqual(bitmap_1.and_cardinality(bitmap_2), len(expected))
+                self.assertEqual(list(RoaringBitmap.loads(conjunction.dumps())), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
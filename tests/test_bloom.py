@@ -0,0 +1,71 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Checks that BloomFilter has no false negatives, keeps its error rate and survives dump/load.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from wikiref.bloom import BloomFilter
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.keys = ["label %d" % i for i in xrange(5000)] + ["", "caf\xc3\xa9", "\x00"]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter.for_capacity(len(self.keys), 0.01)
+        for key in self.keys:
+            bloom.add(key)
+        self.assertEqual(len(bloom), len(self.keys))
+        for key in self.keys:
+            self.assertTrue(key in bloom, key)
+
+    def test_error_rate(self):
+        bloom = BloomFilter.for_capacity(len(self.keys), 0.01)
+        for key in self.keys:
+            bloom.add(key)
+        false_positives = sum(1 for i in xrange(20000) if "absent %d" % i in bloom)
+        self.assertTrue(false_positives < 20000 * 0.02, false_positives)
+        self.assertTrue(bloom.error_rate() < 0.02, bloom.error_rate())
+        self.assertTrue(0.0 < bloom.fill_ratio() < 1.0)
+
+    def test_empty(self):
+        bloom = BloomFilter.for_capacity(0, 0.01)
+        self.assertFalse("label" in bloom)
+        self.assertEqual(bloom.fill_ratio(), 0.0)
+
+    def test_dump_load(self):
+        bloom = BloomFilter.for_capacity(len(self.keys), 0.001)
+        for key in self.keys[::2]:
+            bloom.add(key)
+        path = os.path.join(self.tmp_dir, "labels.bloom")
+        bloom.dump(path)
+        loaded = BloomFilter.load(path)
+        self.assertEqual((loaded.bits, loaded.hashes, loaded.count), (bloom.bits, bloom.hashes, bloom.count))
+        self.assertEqual(loaded.data, bloom.data)
+        for key in self.keys[::2]:
+            self.assertTrue(key in loaded, key)
+        # Keys added after loading are found as well, as done by IndexUpdater.update_bloom().
+        for key in self.keys[1::2]:
+            loaded.add(key)
+        for key in self.keys:
+            self.assertTrue(key in loaded, key)
+
+
+if __name__ == "__main__":
+    unittest.main()
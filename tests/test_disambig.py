@@ -0,0 +1,68 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Checks which lemma lists MinClassDisambigSolver.disambiguate_many() solves and
+how it maps their results back to the input lists, and that prefetch() reads
+nothing when lookup caches are disabled.
+"""
+
+import unittest
+
+from wikiref.cache import LookupCache
+from wikiref.disambig import MinClassDisambigSolver
+
+
+class UncachedClassDict(object):
+
+    def __init__(self):
+        self.cache = LookupCache(0)
+
+    def permutation_labels_many(self, combinations):
+        raise AssertionError("Index is read with disabled lookup caches.")
+
+
+class RecordingSolver(MinClassDisambigSolver):
+
+    def __init__(self, max_lemmas=None):
+        super(RecordingSolver, self).__init__(None, None, None, None, max_lemmas=max_lemmas)
+        self.solved = []
+
+    def prefetch(self, combinations, try_lca=False, memo=None):
+        pass
+
+    def disambiguate(self, lemmas, depth=1, return_size=1, debug=False, try_lca=False, memo=None):
+        self.solved.append(lemmas)
+        return [("+".join(lemmas), 1.0)]
+
+
+class DisambiguateManyTest(unittest.TestCase):
+
+    def test_reordered_lists_solved_once(self):
+        solver = RecordingSolver()
+        found = solver.disambiguate_many([["b", "a"], ["a", "b"], ["c"], ["b", "a"]])
+        self.assertEqual(solver.solved, [["a", "b"], ["c"]])
+        self.assertEqual(found, [[("a+b", 1.0)], [("a+b", 1.0)], [("c", 1.0)], [("a+b", 1.0)]])
+
+    def test_bounded_lists_keep_order(self):
+        # Lemma order decides which lemmas of lists longer than max_lemmas are kept.
+        solver = RecordingSolver(max_lemmas=2)
+        found = solver.disambiguate_many([["c", "b", "a"], ["a", "b", "c"], ["b", "a"], ["a", "b"]])
+        self.assertEqual(solver.solved, [["c", "b", "a"], ["a", "b", "c"], ["a", "b"]])
+        self.assertEqual(found, [[("c+b+a", 1.0)], [("a+b+c", 1.0)], [("a+b", 1.0)], [("a+b", 1.0)]])
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def test_disabled_caches(self):
+        solver = MinClassDisambigSolver(UncachedClassDict(), None, None, None)
+        solver.prefetch([("a",), ("a", "b")], try_lca=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
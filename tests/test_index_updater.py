@@ -0,0 +1,115 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Applies label deltas with IndexUpdater and compares the result with indexes
+built from scratch. Requires LevelDB.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import leveldb
+except ImportError:
+    leveldb = None
+
+if leveldb is not None:
+    from wikiref.storage import open_backend
+    from wikiref.indexing import IndexUpdater
+    from wikiref.indexing import MultiIndexBuilder
+
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+from wikiref.settings import INDEX_YAGO_NODE_LABELS_DIRNAME
+
+
+RELS = frozenset(["<isPreferredMeaningOf>", "<redirectedFrom>"])
+LANGS = frozenset(["eng"])
+
+LABELS = [
+    ("<wordnet_city_108524735>", "<isPreferredMeaningOf>", "\"City\"@eng"),
+    ("<wordnet_city_108524735>", "<isPreferredMeaningOf>", "\"city\"@eng"),
+    ("<wordnet_apple_107739125>", "<isPreferredMeaningOf>", "\"apple\"@eng"),
+    ("<wordnet_apple_107739125>", "<redirectedFrom>", "\"apple\"@eng"),
+    ("<New_York_City>", "<isPreferredMeaningOf>", "\"big apple\"@eng"),
+    ("<New_York_City>", "<isPreferredMeaningOf>", "\"new york\"@eng"),
+    ("<New_York_City>", "<isPreferredMeaningOf>", "\"new york\"@deu"),
+]
+
+# Every removed triple leaves another triple which supports the same class dict label or class search word.
+REMOVED = [
+    ("<wordnet_city_108524735>", "<isPreferredMeaningOf>", "\"City\"@eng"),
+    ("<wordnet_apple_107739125>", "<redirectedFrom>", "\"apple\"@eng"),
+    ("<New_York_City>", "<isPreferredMeaningOf>", "\"new york\"@eng"),
+]
+
+ADDED = [
+    ("<wordnet_apple_107739125>", "<isPreferredMeaningOf>", "\"pome\"@eng"),
+]
+
+
+def write_labels(path, rows, op=None):
+    with open(path, "wb") as fl:
+        for i, (subject, rel, obj) in enumerate(rows):
+            fl.write("%s<id_%d>\t%s\t%s\t%s\n" % (op + "\t" if op else "", i, subject, rel, obj))
+
+
+@unittest.skipIf(leveldb is None, "LevelDB is not installed.")
+class IndexUpdaterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.empty_path = os.path.join(self.tmp_dir, "empty.tsv")
+        write_labels(self.empty_path, [])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def build(self, name, rows):
+        index_dir = os.path.join(self.tmp_dir, name)
+        os.mkdir(index_dir)
+        labels_path = os.path.join(self.tmp_dir, name + ".tsv")
+        write_labels(labels_path, rows)
+        MultiIndexBuilder(index_dir, RELS, LANGS).build([labels_path], [self.empty_path], [self.empty_path])
+        return index_dir
+
+    @staticmethod
+    def dump(index_dir, dirname):
+        index = open_backend(os.path.join(index_dir, dirname), "leveldb")
+        records = list(index.iterate())
+        index.close()
+        return records
+
+    def test_removed_labels_keep_supported_records(self):
+        updated_dir = self.build("updated", LABELS)
+        delta_path = os.path.join(self.tmp_dir, "delta.tsv")
+        write_labels(delta_path, REMOVED, "-")
+        with open(delta_path, "ab") as fl:
+            for subject, rel, obj in ADDED:
+                fl.write("+\t<id_added>\t%s\t%s\t%s\n" % (subject, rel, obj))
+        IndexUpdater(updated_dir, RELS, LANGS).update([delta_path])
+
+        full_dir = self.build("full", [row for row in LABELS if row not in REMOVED] + ADDED)
+        for dirname in (INDEX_YAGO_CLASS_DICT_DIRNAME,
+                        INDEX_YAGO_CLASS_SEARCH_DIRNAME,
+                        INDEX_YAGO_NODE_LABELS_DIRNAME):
+            self.assertEqual(self.dump(updated_dir, dirname), self.dump(full_dir, dirname), dirname)
+
+    def test_missing_node_labels_index(self):
+        index_dir = self.build("updated", LABELS)
+        shutil.rmtree(os.path.join(index_dir, INDEX_YAGO_NODE_LABELS_DIRNAME))
+        delta_path = os.path.join(self.tmp_dir, "delta.tsv")
+        write_labels(delta_path, REMOVED, "-")
+        self.assertRaises(ValueError, IndexUpdater(index_dir, RELS, LANGS).update, [delta_path])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Checks that flush and bulk index writers give the same records and that bulk
+writer does not overwrite existing indexes. Requires LevelDB.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import leveldb
+except ImportError:
+    leveldb = None
+
+if leveldb is not None:
+    from wikiref.storage import open_backend
+    from wikiref.indexing import create_index_writer
+
+from wikiref.settings import LDB_ARRAY_DELIM
+
+
+PAIRS = [("key %d" % (i % 7), "value %d" % i) for i in xrange(100)]
+
+
+@unittest.skipIf(leveldb is None, "LevelDB is not installed.")
+class IndexWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, pairs, bulk):
+        path = os.path.join(self.tmp_dir, name)
+        writer = create_index_writer(path, bulk=bulk, max_items=10, tmp_dir=self.tmp_dir)
+        for key, value in pairs:
+            writer.add(key, value)
+        writer.close()
+        return path
+
+    @staticmethod
+    def read(path):
+        index = open_backend(path, "leveldb")
+        records = list(index.iterate())
+        index.close()
+        return records
+
+    def test_bulk_and_flush(self):
+        expected = dict()
+        for key, value in PAIRS:
+            expected.setdefault(key, set()).add(value)
+        expected = [(key, LDB_ARRAY_DELIM.join(sorted(values))) for key, values in sorted(expected.iteritems())]
+        self.assertEqual(self.read(self.write("bulk.ldb", PAIRS, True)), expected)
+        self.assertEqual(self.read(self.write("flush.ldb", PAIRS, False)), expected)
+        self.write("appended.ldb", PAIRS[:50], False)
+        self.assertEqual(self.read(self.write("appended.ldb", PAIRS[50:], False)), expected)
+
+    def test_bulk_refuses_existing_index(self):
+        path = self.write("bulk.ldb", PAIRS[:50], True)
+        records = self.read(path)
+        self.assertRaises(ValueError, self.write, "bulk.ldb", PAIRS[50:], True)
+        # Index is closed and kept as it was.
+        self.assertEqual(self.read(path), records)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Compares LcaEngine.subtree_counts() with the taxonomy tree which apply_lca()
+used to build for every query. Nodes of the tree are kept in insertion order,
+as dicts are ordered under PyPy, so that ties in counts are sorted the same way.
+"""
+
+import random
+import unittest
+import collections
+
+from wikiref.lca import LcaEngine
+
+
+class PathTaxonomy(object):
+
+    def __init__(self, parents):
+        self.parents = parents
+
+    def path(self, node):
+        path = []
+        while node in self.parents:
+            node = self.parents[node]
+            path.append(node)
+        return path
+
+    def ancestors_many(self, nodes):
+        return dict((node, tuple(self.path(node))) for node in nodes)
+
+
+def tree_counts(classes, taxonomy):
+    """
+    Returns [(node, count)] of the taxonomy tree built as in the old apply_lca().
+    """
+    classes_with_parents = []
+    for cl in classes:
+        classes_with_parents.append((cl, taxonomy.path(cl)))
+    tree = collections.OrderedDict()
+    for cl in classes:
+        tree[cl] = [cl, dict(), 1]
+    for cl, parents in classes_with_parents:
+        child = cl
+        for p in parents:
+            child_node = tree[child]
+            if p not in tree:
+                tree[p] = [p, {child: child_node[2]}, child_node[2]]
+            else:
+                children = tree[p][1]
+                total_children = tree[p][2]
+                if child in children:
+                    total_children -= children[child]
+                total_children += child_node[2]
+                children[child] = child_node[2]
+                tree[p][2] = total_children
+            child = p
+    return [(node[0], node[2]) for node in tree.itervalues()]
+
+
+def zipf_slice(counts):
+    """
+    Returns nodes selected by apply_lca() from [(node, count)].
+    """
+    sorted_tree = sorted(counts, key=lambda node: -node[1])
+    bottom_thr = int(len(sorted_tree) / 5.0)
+    if bottom_thr == 0:
+        bottom_thr = 1
+    top_thr = int(len(sorted_tree) / 5.0 * 2) + 1
+    return [node[0] for node in sorted_tree[bottom_thr:top_thr]]
+
+
+class LcaEngineTest(unittest.TestCase):
+
+    def check(self, classes, taxonomy):
+        expected = tree_counts(classes, taxonomy)
+        counts = LcaEngine(taxonomy).subtree_counts(classes)
+        self.assertEqual(counts, expected)
+        self.assertEqual(zipf_slice(counts), zipf_slice(expected))
+
+    def test_ancestor_class_with_ties(self):
+        # B is both a class of the query and an ancestor of A, most other nodes have count 1.
+        taxonomy = PathTaxonomy({"A": "B", "B": "C", "C": "R", "D": "C", "E": "F", "F": "R", "G": "R", "H": "F"})
+        classes = ["A", "B", "D", "A", "E", "G", "H"]
+        self.assertEqual(LcaEngine(taxonomy).subtree_counts(classes), [
+            ("A", 1), ("B", 2), ("D", 1), ("E", 1), ("G", 1), ("H", 1), ("C", 3), ("R", 6), ("F", 2),
+        ])
+        self.assertEqual(zipf_slice(LcaEngine(taxonomy).subtree_counts(classes)), ["C", "B", "F"])
+        self.check(classes, taxonomy)
+
+    def test_random_taxonomies(self):
+        rnd = random.Random(7)
+        for _ in xrange(300):
+            size = rnd.randint(2, 30)
+            nodes = ["n%02d" % i for i in xrange(size)]
+            # Parent of a node goes before it, so there are no cycles.
+            parents = dict((node, nodes[rnd.randrange(i)]) for i, node in enumerate(nodes)
+                           if i > 0 and rnd.random() < 0.9)
+            classes = [rnd.choice(nodes) for _ in xrange(rnd.randint(1, size))]
+            self.check(classes, PathTaxonomy(parents))
+
+
+if __name__ == "__main__":
+    unittest.main()
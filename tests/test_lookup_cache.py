@@ -0,0 +1,100 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Eviction order and negative caching of LookupCache.
+"""
+
+import unittest
+
+from wikiref.cache import LookupCache
+
+
+class CountingStorage(object):
+
+    def __init__(self, records):
+        self.records = records
+        self.loaded = []
+
+    def load(self, key):
+        self.loaded.append(key)
+        return self.records[key]
+
+    def load_many(self, keys):
+        self.loaded.extend(sorted(keys))
+        return dict((key, self.records[key]) for key in keys if key in self.records)
+
+
+class LookupCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = CountingStorage({"a": 1, "b": 2, "c": 3, "d": 4})
+
+    def test_lru_eviction(self):
+        cache = LookupCache(2)
+        self.assertEqual(cache.lookup("a", self.storage.load), 1)
+        self.assertEqual(cache.lookup("b", self.storage.load), 2)
+        # Hit on "a" makes "b" the least recently used key.
+        self.assertEqual(cache.lookup("a", self.storage.load), 1)
+        self.assertEqual(cache.lookup("c", self.storage.load), 3)
+        self.assertEqual(list(cache.items), ["a", "c"])
+        self.assertEqual(cache.lookup("b", self.storage.load), 2)
+        self.assertEqual(list(cache.items), ["c", "b"])
+        self.assertEqual(self.storage.loaded, ["a", "b", "c", "b"])
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+    def test_negative_caching(self):
+        cache = LookupCache(2)
+        for _ in xrange(3):
+            self.assertRaises(KeyError, cache.lookup, "x", self.storage.load)
+        self.assertEqual(self.storage.loaded, ["x"])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        # A cached miss is evicted like any other key.
+        cache.lookup("a", self.storage.load)
+        cache.lookup("b", self.storage.load)
+        self.assertRaises(KeyError, cache.lookup, "x", self.storage.load)
+        self.assertEqual(self.storage.loaded, ["x", "a", "b", "x"])
+
+    def test_lookup_many(self):
+        cache = LookupCache(3)
+        self.assertEqual(cache.lookup_many(["a", "x", "a"], self.storage.load_many), {"a": 1})
+        self.assertEqual(cache.lookup_many(["a", "x", "b"], self.storage.load_many), {"a": 1, "b": 2})
+        self.assertEqual(self.storage.loaded, ["a", "x", "b"])
+        self.assertEqual(list(cache.items), ["a", "x", "b"])
+        self.assertEqual(cache.lookup_many(["c"], self.storage.load_many), {"c": 3})
+        self.assertEqual(list(cache.items), ["x", "b", "c"])
+        self.assertRaises(KeyError, cache.lookup, "x", self.storage.load)
+        self.assertEqual(self.storage.loaded, ["a", "x", "b", "c"])
+
+    def test_disabled(self):
+        cache = LookupCache(0)
+        for _ in xrange(2):
+            self.assertEqual(cache.lookup("a", self.storage.load), 1)
+            self.assertRaises(KeyError, cache.lookup, "x", self.storage.load)
+            self.assertEqual(cache.lookup_many(["b", "y"], self.storage.load_many), {"b": 2})
+        cache.put("c", 3)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(self.storage.loaded, ["a", "x", "b", "y"] * 2)
+
+    def test_get_put(self):
+        cache = LookupCache(2)
+        self.assertEqual(cache.get("a", "-"), "-")
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("a", 10)
+        cache.put("c", 3)
+        self.assertEqual(list(cache.items), ["a", "c"])
+        self.assertEqual(cache.get("a"), 10)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Builds string format indexes of a small Yago sample and converts them into
+node id format with build_node_id_index(). Requires LevelDB.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import leveldb
+except ImportError:
+    leveldb = None
+
+if leveldb is not None:
+    from wikiref.yago import YagoTypes
+    from wikiref.yago import YagoNodeDict
+    from wikiref.yago import YagoTaxonomy
+    from wikiref.yago import YagoClassDict
+    from wikiref.yago import YagoClassSearch
+    from wikiref.yago import YagoBitmapSearch
+    from wikiref.storage import open_backend
+    from wikiref.indexing import MultiIndexBuilder
+    from wikiref.indexing import build_ancestor_index
+    from wikiref.indexing import build_posting_lengths
+    from wikiref.indexing import build_label_keys
+    from wikiref.indexing import build_class_dict_bloom
+    from wikiref.indexing import build_node_id_index
+    from wikiref.indexing import open_index_writer
+    from wikiref.indexing import read_index_stats
+    from wikiref.indexing import read_index_version
+    from wikiref.indexing import stamp_index_version
+
+from wikiref.settings import INDEX_YAGO_TYPES_DIRNAME
+from wikiref.settings import INDEX_YAGO_NODES_DIRNAME
+from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
+from wikiref.settings import INDEX_YAGO_ANCESTORS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_KEYS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME
+from wikiref.settings import INDEX_YAGO_TYPED_FILENAME
+from wikiref.settings import INDEX_YAGO_NODE_TYPES_FILENAME
+
+
+LABELS = [
+    ("<wordnet_location_100027167>", "\"location\"@eng"),
+    ("<wordnet_city_108524735>", "\"city\"@eng"),
+    ("<wordnet_city_108524735>", "\"metropolis\"@eng"),
+    ("<wordnet_apple_107739125>", "\"apple\"@eng"),
+    ("<wikicategory_Cities_in_New_York>", "\"cities in new york\"@eng"),
+    ("<New_York_City>", "\"new york city\"@eng"),
+    ("<New_York_City>", "\"big apple\"@eng"),
+    ("<New_York_City>", "\"new york\"@deu"),
+]
+
+TAXONOMY = [
+    ("<wordnet_city_108524735>", "<wordnet_location_100027167>"),
+    ("<wikicategory_Cities_in_New_York>", "<wordnet_city_108524735>"),
+]
+
+TYPES = [
+    ("<New_York_City>", "<wikicategory_Cities_in_New_York>"),
+]
+
+
+def write_tsv(path, rel, rows, trailing_tab):
+    with open(path, "wb") as fl:
+        for i, (subject, obj) in enumerate(rows):
+            fl.write("<id_%d>\t%s\t%s\t%s%s\n" % (i, subject, rel, obj, "\t" if trailing_tab else ""))
+
+
+@unittest.skipIf(leveldb is None, "LevelDB is not installed.")
+class NodeIdIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src_dir = os.path.join(self.tmp_dir, "string")
+        os.mkdir(self.src_dir)
+
+        labels_path = os.path.join(self.tmp_dir, "labels.tsv")
+        taxonomy_path = os.path.join(self.tmp_dir, "taxonomy.tsv")
+        types_path = os.path.join(self.tmp_dir, "types.tsv")
+        write_tsv(labels_path, "rdfs:label", LABELS, False)
+        write_tsv(taxonomy_path, "rdfs:subClassOf", TAXONOMY, True)
+        write_tsv(types_path, "rdf:type", TYPES, True)
+
+        builder = MultiIndexBuilder(self.src_dir, frozenset(["rdfs:label"]), frozenset(["eng"]))
+        builder.build([labels_path], [taxonomy_path], [types_path])
+        build_ancestor_index(open_backend(self.src_path(INDEX_YAGO_TAXONOMY_DIRNAME), "leveldb"),
+                             open_backend(self.src_path(INDEX_YAGO_ANCESTORS_DIRNAME), "leveldb"))
+        build_posting_lengths(open_backend(self.src_path(INDEX_YAGO_CLASS_SEARCH_DIRNAME), "leveldb"),
+                              open_backend(self.src_path(INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME), "leveldb"))
+        build_label_keys(open_backend(self.src_path(INDEX_YAGO_CLASS_DICT_DIRNAME), "leveldb"),
+                         open_index_writer(open_backend(self.src_path(INDEX_YAGO_CLASS_KEYS_DIRNAME), "leveldb")))
+        build_class_dict_bloom(self.src_dir)
+        stamp_index_version(self.src_dir, deltas=[])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def src_path(self, dirname):
+        return os.path.join(self.src_dir, dirname)
+
+    def convert(self, bitmaps):
+        dst_dir = os.path.join(self.tmp_dir, "ids_bitmaps" if bitmaps else "ids")
+        os.mkdir(dst_dir)
+        build_node_id_index(self.src_dir, dst_dir, bitmaps=bitmaps)
+        return dst_dir
+
+    def check_outputs(self, dst_dir, bitmaps):
+        search_dirname = INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME if bitmaps else INDEX_YAGO_CLASS_SEARCH_DIRNAME
+        for name in (INDEX_YAGO_NODES_DIRNAME,
+                     INDEX_YAGO_CLASS_DICT_DIRNAME,
+                     search_dirname,
+                     INDEX_YAGO_TAXONOMY_DIRNAME,
+                     INDEX_YAGO_TYPES_DIRNAME,
+                     INDEX_YAGO_ANCESTORS_DIRNAME,
+                     INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME,
+                     INDEX_YAGO_CLASS_KEYS_DIRNAME,
+                     INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME,
+                     INDEX_YAGO_TYPED_FILENAME,
+                     INDEX_YAGO_NODE_TYPES_FILENAME):
+            self.assertTrue(os.path.exists(os.path.join(dst_dir, name)), name)
+        self.assertEqual(read_index_version(dst_dir), read_index_version(self.src_dir))
+        self.assertEqual(read_index_stats(dst_dir)[INDEX_YAGO_TYPED_FILENAME]["typed_nodes"], len(TYPES))
+
+    def check_lookups(self, dst_dir, bitmaps):
+        node_dict = YagoNodeDict(os.path.join(dst_dir, INDEX_YAGO_NODES_DIRNAME),
+                                 node_types_path=os.path.join(dst_dir, INDEX_YAGO_NODE_TYPES_FILENAME))
+
+        class_dict = YagoClassDict(self.src_path(INDEX_YAGO_CLASS_DICT_DIRNAME))
+        id_class_dict = YagoClassDict(os.path.join(dst_dir, INDEX_YAGO_CLASS_DICT_DIRNAME), node_dict=node_dict)
+        for label in ("city", "big apple", "new york city", "cities in new york", "new york"):
+            self.assertEqual(sorted(id_class_dict.get(label).names()) if id_class_dict.get(label) else None,
+                             sorted(class_dict.get(label).names()) if class_dict.get(label) else None)
+
+        class_search = YagoClassSearch(self.src_path(INDEX_YAGO_CLASS_SEARCH_DIRNAME))
+        if bitmaps:
+            id_class_search = YagoBitmapSearch(os.path.join(dst_dir, INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME),
+                                               node_dict=node_dict)
+        else:
+            id_class_search = YagoClassSearch(os.path.join(dst_dir, INDEX_YAGO_CLASS_SEARCH_DIRNAME),
+                                              node_dict=node_dict)
+        for lemmas in (["new"], ["new", "york"], ["apple"], ["york", "cities"]):
+            self.assertEqual(sorted(id_class_search.search(lemmas).names()),
+                             sorted(class_search.search(lemmas).names()))
+
+        # Node ids are classified by the node types table, without reading their names.
+        node_set, id_node_set = class_search.search(["new", "york"]), id_class_search.search(["new", "york"])
+        lookups = node_dict.cache.hits + node_dict.cache.misses
+        self.assertEqual((id_node_set.instance_count(), id_node_set.class_count()), (1, 1))
+        self.assertEqual((node_set.instance_count(), node_set.class_count()), (1, 1))
+        self.assertEqual(node_dict.cache.hits + node_dict.cache.misses, lookups)
+
+        taxonomy = YagoTaxonomy(self.src_path(INDEX_YAGO_TAXONOMY_DIRNAME),
+                                ancestors_root=self.src_path(INDEX_YAGO_ANCESTORS_DIRNAME))
+        id_taxonomy = YagoTaxonomy(os.path.join(dst_dir, INDEX_YAGO_TAXONOMY_DIRNAME),
+                                   ancestors_root=os.path.join(dst_dir, INDEX_YAGO_ANCESTORS_DIRNAME),
+                                   node_dict=node_dict)
+        node = "<wikicategory_Cities_in_New_York>"
+        self.assertEqual(node_dict.get_names(id_taxonomy.ancestors(node_dict.get_id(node))),
+                         list(taxonomy.ancestors(node)))
+
+        id_types = YagoTypes(os.path.join(dst_dir, INDEX_YAGO_TYPES_DIRNAME),
+                             typed_path=os.path.join(dst_dir, INDEX_YAGO_TYPED_FILENAME),
+                             node_dict=node_dict)
+        self.assertTrue(id_types.has_types(node_dict.get_id("<New_York_City>")))
+        self.assertFalse(id_types.has_types(node_dict.get_id("<wordnet_apple_107739125>")))
+
+    def test_postings(self):
+        dst_dir = self.convert(bitmaps=False)
+        self.check_outputs(dst_dir, bitmaps=False)
+        self.check_lookups(dst_dir, bitmaps=False)
+
+    def test_bitmaps(self):
+        dst_dir = self.convert(bitmaps=True)
+        self.check_outputs(dst_dir, bitmaps=True)
+        self.check_lookups(dst_dir, bitmaps=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Round trips of varint posting lists and packed node ids.
+"""
+
+import random
+import unittest
+
+from wikiref.postings import pack_id
+from wikiref.postings import unpack_id
+from wikiref.postings import encode_varints
+from wikiref.postings import decode_varints
+from wikiref.postings import encode_postings
+from wikiref.postings import decode_postings
+from wikiref.postings import intersect_sorted
+
+
+class PostingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rnd = random.Random(3)
+
+    def test_varints(self):
+        numbers = [0, 1, 0x7F, 0x80, 0x3FFF, 0x4000, (1 << 32) - 1, 1 << 40]
+        self.assertEqual(decode_varints(encode_varints(numbers)), numbers)
+        self.assertEqual(encode_varints([0x7F, 0x80]), "\x7f\x80\x01")
+        self.assertEqual(encode_varints([]), "")
+        self.assertEqual(decode_varints(""), [])
+
+    def test_postings(self):
+        for ids in ([], [0], [5], [(1 << 32) - 1], [0, 1, 2, 3], [3, 1000, 1001, 70000, (1 << 32) - 1]):
+            self.assertEqual(decode_postings(encode_postings(ids)), ids)
+        for _ in xrange(100):
+            ids = sorted(self.rnd.sample(xrange(1 << 32), self.rnd.randint(1, 200)))
+            self.assertEqual(decode_postings(encode_postings(ids)), ids)
+
+    def test_pack_id(self):
+        ids = sorted(self.rnd.sample(xrange(1 << 32), 1000))
+        packed = [pack_id(node_id) for node_id in ids]
+        self.assertEqual(sorted(packed), packed)
+        self.assertEqual([unpack_id(data) for data in packed], ids)
+        self.assertEqual(pack_id(1), "\x00\x00\x00\x01")
+
+    def test_intersect_sorted(self):
+        self.assertEqual(intersect_sorted([], [1, 2]), [])
+        self.assertEqual(intersect_sorted([2], [1, 2, 3]), [2])
+        for _ in xrange(200):
+            ids_1 = sorted(self.rnd.sample(xrange(500), self.rnd.randint(0, 50)))
+            ids_2 = sorted(self.rnd.sample(xrange(500), self.rnd.randint(0, 300)))
+            self.assertEqual(intersect_sorted(ids_1, ids_2), sorted(set(ids_1) & set(ids_2)))
+            self.assertEqual(intersect_sorted(ids_2, ids_1), sorted(set(ids_1) & set(ids_2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Writes sharded indexes with ShardedIndexWriter and checks that existing indexes
+of other layout are refused. Requires LevelDB.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import leveldb
+except ImportError:
+    leveldb = None
+
+if leveldb is not None:
+    from wikiref.storage import open_backend
+    from wikiref.indexing import create_index_writer
+    from wikiref.indexing import ShardedIndexWriter
+
+
+@unittest.skipIf(leveldb is None, "LevelDB is not installed.")
+class ShardedIndexWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "index.ldb")
+        self.items = [("key %d" % i, "value %d" % i) for i in xrange(1000)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, shards, items):
+        writer = create_index_writer(self.path, shards=shards)
+        for key, value in items:
+            writer.add(key, value)
+        writer.close()
+
+    def read(self):
+        index = open_backend(self.path, "leveldb")
+        records = sorted(index.iterate())
+        index.close()
+        return records
+
+    def test_sharded_round_trip(self):
+        self.write(3, self.items[:500])
+        self.write(3, self.items[500:])
+        self.assertEqual(self.read(), sorted(self.items))
+
+    def test_plain_index_refused(self):
+        self.write(1, self.items)
+        self.assertRaises(ValueError, ShardedIndexWriter, self.path, 3)
+        self.assertEqual(self.read(), sorted(self.items))
+
+    def test_shard_count_mismatch_refused(self):
+        self.write(3, self.items)
+        self.assertRaises(ValueError, ShardedIndexWriter, self.path, 2)
+        self.assertEqual(self.read(), sorted(self.items))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Checks label tokenizers against parts which NLTK 2 PunktWordTokenizer gives for typical labels.
+"""
+
+import unittest
+
+from wikiref.tokenizer import FastTokenizer
+from wikiref.tokenizer import LabelTokenizer
+from wikiref.tokenizer import RE_SIMPLE_ASCII_LABEL
+
+
+# Utf-8 label -> parts of the lowercased label produced by PunktWordTokenizer.
+PUNKT_PARTS = [
+    ("new york city", ["new", "york", "city"]),
+    ("New York City", ["new", "york", "city"]),
+    ("under_score 1990s music", ["under_score", "1990s", "music"]),
+    ("  leading  and trailing spaces ", ["leading", "and", "trailing", "spaces"]),
+    ("", []),
+    ("o'neil old city", ["o", "'neil", "old", "city"]),
+    ("dr. dr. who", ["dr.", "dr.", "who"]),
+    ("a.b.c.", ["a.b.c."]),
+    ("rock -- roll", ["rock", "--", "roll"]),
+    ("what--ever", ["what", "--", "ever"]),
+    ("wait... what", ["wait", "...", "what"]),
+    ("x . . . y", ["x", ". . .", "y"]),
+    ("apples, oranges,", ["apples", ",", "oranges", ","]),
+    ("foo,bar", ["foo,bar"]),
+    ("(band) river (band)", ["(", "band", ")", "river", "(", "band", ")"]),
+    ("\"quoted\" name", ["\"", "quoted", "\"", "name"]),
+    ("question? mark!", ["question", "?", "mark", "!"]),
+    ("smith & wesson", ["smith", "&", "wesson"]),
+    ("c++ language", ["c++", "language"]),
+    ("caf\xc3\xa9 society", ["caf\xc3\xa9", "society"]),
+    ("\xc3\x9cBER STRA\xc3\x9fE", ["\xc3\xbcber", "stra\xc3\x9fe"]),
+    ("ma\xc3\xb1ana,", ["ma\xc3\xb1ana", ","]),
+    ("na\xc3\xafve \xe2\x80\x93 dash", ["na\xc3\xafve", "\xe2\x80\x93", "dash"]),
+    ("\xc3\x86r\xc3\xb8 island...", ["\xc3\xa6r\xc3\xb8", "island", "..."]),
+]
+
+
+class FastTokenizerTest(unittest.TestCase):
+
+    def test_label_tokenizer(self):
+        tokenizer = LabelTokenizer("fast")
+        for label, parts in PUNKT_PARTS:
+            self.assertEqual(tokenizer.tokenize(label), parts, label)
+
+    def test_unicode_path(self):
+        # Labels matched by RE_SIMPLE_ASCII_LABEL are split without decoding, here all labels are decoded.
+        tokenizer = FastTokenizer()
+        for label, parts in PUNKT_PARTS:
+            tokens = tokenizer.tokenize(label.decode("utf-8").lower())
+            self.assertEqual([token.encode("utf-8") for token in tokens if len(token)], parts, label)
+
+    def test_ascii_path(self):
+        simple = [label for label, _ in PUNKT_PARTS if RE_SIMPLE_ASCII_LABEL.match(label) is not None]
+        self.assertEqual(simple, ["new york city", "New York City", "under_score 1990s music",
+                                  "  leading  and trailing spaces ", ""])
+
+    def test_memo(self):
+        tokenizer = LabelTokenizer("fast", memo_size=2)
+        for _ in xrange(2):
+            for label, parts in PUNKT_PARTS:
+                self.assertEqual(tokenizer.extract_parts(label), parts, label)
+        self.assertEqual(len(tokenizer.memo), 2)
+        self.assertEqual(tokenizer.extract_parts("\xc3\x86r\xc3\xb8 island..."), ["\xc3\xa6r\xc3\xb8", "island", "..."])
+        self.assertEqual(tokenizer.memo.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Compressed bitmaps of integer node ids in the spirit of Roaring bitmaps.
+
+Ids are split into chunks by their high 16 bits. Each chunk stores its low 16
+bits either as a sorted array (sparse chunks) or as a 2^16 bit set kept in a
+Python long (dense chunks), so intersections of dense chunks are a single &.
+"""
+
+import struct
+import binascii
+
+from wikiref.postings import intersect_sorted
+
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+CHUNK_BYTES = (1 << CHUNK_BITS) / 8
+
+# Chunks with more values than this are stored as bit sets.
+ARRAY_MAX_SIZE = 4096
+
+HEADER_STRUCT = struct.Struct(">I")
+CHUNK_STRUCT = struct.Struct(">HI")
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+def bits_to_array(bits):
+    values = []
+    digits = bin(bits)[:1:-1]
+    i = digits.find("1")
+    while i >= 0:
+        values.append(i)
+        i = digits.find("1", i + 1)
+    return values
+
+
+def array_to_bits(values):
+    buf = bytearray(CHUNK_BYTES)
+    for value in values:
+        buf[CHUNK_BYTES - 1 - (value >> 3)] |= 1 << (value & 7)
+    return int(binascii.hexlify(buf), 16)
+
+
+class RoaringBitmap(object):
+    """
+    Immutable set of non-negative integers below 2^32. Supports &, len(),
+    iteration in ascending order and serialization with dumps() and loads().
+    """
+    __slots__ = ("keys", "chunks", "sizes")
+
+    def __init__(self, keys=(), chunks=(), sizes=()):
+        self.keys = list(keys)
+        self.chunks = list(chunks)
+        self.sizes = list(sizes)
+
+    @staticmethod
+    def from_sorted(node_ids):
+        bitmap = RoaringBitmap()
+        key = None
+        values = []
+        for node_id in node_ids:
+            high = node_id >> CHUNK_BITS
+            if high != key:
+                if values:
+                    bitmap.append_chunk(key, values)
+                key = high
+                values = []
+            values.append(node_id & CHUNK_MASK)
+        if values:
+            bitmap.append_chunk(key, values)
+        return bitmap
+
+    def append_chunk(self, key, values):
+        self.keys.append(key)
+        self.sizes.append(len(values))
+        if len(values) > ARRAY_MAX_SIZE:
+            self.chunks.append(array_to_bits(values))
+        else:
+            self.chunks.append(values)
+
+    def __and__(self, other):
+        result = RoaringBitmap()
+        i, j = 0, 0
+        while i < len(self.keys) and j < len(other.keys):
+            key_1, key_2 = self.keys[i], other.keys[j]
+            if key_1 < key_2:
+                i += 1
+            elif key_1 > key_2:
+                j += 1
+            else:
+                chunk = intersect_chunks(self.chunks[i], self.sizes[i], other.chunks[j], other.sizes[j])
+                if chunk is not None:
+                    result.keys.append(key_1)
+                    result.chunks.append(chunk[0])
+                    result.sizes.append(chunk[1])
+                i += 1
+                j += 1
+        return result
+
+    def and_cardinality(self, other):
+        return len(self & other)
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def __nonzero__(self):
+        return len(self.keys) > 0
+
+    def __iter__(self):
+        for key, chunk, size in zip(self.keys, self.chunks, self.sizes):
+            high = key << CHUNK_BITS
+            if size > ARRAY_MAX_SIZE:
+                chunk = bits_to_array(chunk)
+            for low in chunk:
+                yield high | low
+
+    def __contains__(self, node_id):
+        high = node_id >> CHUNK_BITS
+        low = node_id & CHUNK_MASK
+        for key, chunk, size in zip(self.keys, self.chunks, self.sizes):
+            if key == high:
+                if size > ARRAY_MAX_SIZE:
+                    return (chunk >> low) & 1 == 1
+                return low in chunk
+        return False
+
+    def dumps(self):
+        """
+        Serializes bitmap as: <number of chunks>, then for every chunk: <key>,
+        <size> and either 2-byte values or CHUNK_BYTES of bit set.
+        """
+        parts = [HEADER_STRUCT.pack(len(self.keys))]
+        for key, chunk, size in zip(self.keys, self.chunks, self.sizes):
+            parts.append(CHUNK_STRUCT.pack(key, size))
+            if size > ARRAY_MAX_SIZE:
+                parts.append(binascii.unhexlify("%0*x" % (CHUNK_BYTES * 2, chunk)))
+            else:
+                parts.append(struct.pack(">%dH" % size, *chunk))
+        return "".join(parts)
+
+    @staticmethod
+    def loads(data):
+        bitmap = RoaringBitmap()
+        chunks_number = HEADER_STRUCT.unpack_from(data, 0)[0]
+        offset = HEADER_STRUCT.size
+        for _ in xrange(chunks_number):
+            key, size = CHUNK_STRUCT.unpack_from(data, offset)
+            offset += CHUNK_STRUCT.size
+            if size > ARRAY_MAX_SIZE:
+                chunk = int(binascii.hexlify(data[offset:offset + CHUNK_BYTES]), 16)
+                offset += CHUNK_BYTES
+            else:
+                chunk = list(struct.unpack_from(">%dH" % size, data, offset))
+                offset += size * 2
+            bitmap.keys.append(key)
+            bitmap.chunks.append(chunk)
+            bitmap.sizes.append(size)
+        return bitmap
+
+    def __repr__(self):
+        return "<RoaringBitmap(size=%d, chunks=%d)>" % (len(self), len(self.keys))
+
+
+def intersect_chunks(chunk_1, size_1, chunk_2, size_2):
+    """
+    Returns (chunk, size) of intersection of two chunks or None if it is empty.
+    """
+    if size_1 > ARRAY_MAX_SIZE and size_2 > ARRAY_MAX_SIZE:
+        bits = chunk_1 & chunk_2
+        size = popcount(bits)
+        if size > ARRAY_MAX_SIZE:
+            return bits, size
+        chunk = bits_to_array(bits)
+    elif size_1 > ARRAY_MAX_SIZE:
+        chunk = bits_to_array(chunk_1 & array_to_bits(chunk_2))
+    elif size_2 > ARRAY_MAX_SIZE:
+        chunk = bits_to_array(array_to_bits(chunk_1) & chunk_2)
+    else:
+        chunk = intersect_sorted(chunk_1, chunk_2)
+    if len(chunk) == 0:
+        return None
+    return chunk, len(chunk)
@@ -0,0 +1,98 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Bloom filter used to answer definite misses of index lookups without reading the index.
+"""
+
+import math
+import struct
+import hashlib
+import binascii
+
+
+class BloomFilter(object):
+    """
+    Bit array of @bits bits with @hashes probe positions per key, derived from
+    the two halves of the key MD5 digest (double hashing).
+    """
+    HEADER_STRUCT = struct.Struct(">QIQ")
+    HASH_STRUCT = struct.Struct(">QQ")
+
+    def __init__(self, bits, hashes, data=None, count=0):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = data if data is not None else bytearray((bits + 7) // 8)
+        self.count = count
+
+    @staticmethod
+    def for_capacity(capacity, error_rate):
+        """
+        Creates empty filter of optimal size for @capacity keys and expected @error_rate.
+        """
+        capacity = max(capacity, 1)
+        bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        hashes = max(1, int(round(float(bits) / capacity * math.log(2))))
+        return BloomFilter(bits, hashes)
+
+    def positions(self, key):
+        hash_1, hash_2 = self.HASH_STRUCT.unpack(hashlib.md5(key).digest())
+        return [(hash_1 + i * hash_2) % self.bits for i in xrange(self.hashes)]
+
+    def add(self, key):
+        data = self.data
+        for position in self.positions(key):
+            data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        data = self.data
+        for position in self.positions(key):
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def size_bytes(self):
+        return len(self.data)
+
+    def fill_ratio(self):
+        return float(bin(int(binascii.hexlify(self.data) or "0", 16)).count("1")) / self.bits
+
+    def error_rate(self):
+        """
+        Returns expected false positive rate given the current number of set bits.
+        """
+        return self.fill_ratio() ** self.hashes
+
+    def stats(self):
+        return {
+            "keys": self.count,
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "size_bytes": self.size_bytes(),
+            "fill_ratio": self.fill_ratio(),
+            "expected_error_rate": self.error_rate(),
+        }
+
+    def dump(self, path):
+        with open(path, "wb") as fl:
+            fl.write(self.HEADER_STRUCT.pack(self.bits, self.hashes, self.count))
+            fl.write(self.data)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as fl:
+            bits, hashes, count = BloomFilter.HEADER_STRUCT.unpack(fl.read(BloomFilter.HEADER_STRUCT.size))
+            data = bytearray(fl.read())
+        return BloomFilter(bits, hashes, data=data, count=count)
+
+    def __repr__(self):
+        return "<BloomFilter(keys=%d, bits=%d, hashes=%d)>" % (self.count, self.bits, self.hashes)
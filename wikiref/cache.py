@@ -0,0 +1,126 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Bounded LRU cache used by the index lookups and the label tokenizer.
+"""
+
+import collections
+
+from wikiref.settings import INDEX_LOOKUP_CACHE_SIZE
+
+
+class LookupCache(object):
+    """
+    Bounded LRU cache for index lookups. Misses (KeyError) are cached as well,
+    so repeatedly probing absent keys does not go to the storage either.
+    """
+    MISSING = object()
+
+    def __init__(self, size=INDEX_LOOKUP_CACHE_SIZE):
+        self.size = size
+        self.items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, load):
+        """
+        Returns cached value for @key or calls @load(key) and caches its result.
+        Raises KeyError if @load raised it for this key.
+        """
+        try:
+            value = self.items.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            try:
+                value = load(key)
+            except KeyError:
+                value = self.MISSING
+            if self.size <= 0:
+                if value is self.MISSING:
+                    raise KeyError(key)
+                return value
+            if len(self.items) >= self.size:
+                self.items.popitem(last=False)
+        self.items[key] = value
+        if value is self.MISSING:
+            raise KeyError(key)
+        return value
+
+    def lookup_many(self, keys, load_many):
+        """
+        Returns dict: key -> value for all found @keys. Keys missing in the cache
+        are loaded with a single @load_many(keys) call, which should return dict
+        of found keys, the rest are cached as misses.
+        """
+        values = dict()
+        missing_keys = []
+        for key in keys:
+            if key in values:
+                continue
+            try:
+                value = self.items.pop(key)
+                self.items[key] = value
+                self.hits += 1
+                if value is not self.MISSING:
+                    values[key] = value
+            except KeyError:
+                missing_keys.append(key)
+        if len(missing_keys) == 0:
+            return values
+        missing_keys = list(set(missing_keys))
+        self.misses += len(missing_keys)
+        loaded = load_many(missing_keys)
+        values.update(loaded)
+        if self.size > 0:
+            for key in missing_keys:
+                if len(self.items) >= self.size:
+                    self.items.popitem(last=False)
+                self.items[key] = loaded.get(key, self.MISSING)
+        return values
+
+    def get(self, key, default=None):
+        """
+        Returns cached value of @key or @default, does not cache misses.
+        """
+        try:
+            value = self.items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.items[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        self.items.pop(key, None)
+        if len(self.items) >= self.size:
+            self.items.popitem(last=False)
+        self.items[key] = value
+
+    def clear(self):
+        self.items.clear()
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total > 0 else 0.0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return "<LookupCache(size=%d/%d, hits=%d, misses=%d, hit_ratio=%.3f)>" % (
+            len(self.items),
+            self.size,
+            self.hits,
+            self.misses,
+            self.hit_ratio(),
+        )
@@ -16,11 +16,21 @@ except ImportError:
     import numpypy as np
 
 
+from wikiref.lca import LcaEngine
+from wikiref.semadata import NAME_CLASSIFIER
 from wikiref.semadata import SemanticNodeSet
 
 CLASS_SCORE_AWARD = 0.1
 
 class MinClassDisambigSolver(object):
+    """
+    Search over lemma combinations can be bounded: only @max_lemmas lemmas are
+    combined (lemmas which are labels of class dict are kept first) and only
+    combinations of at most @max_comb_size lemmas are checked. Number of calls
+    which hit each bound is counted in bound_hits. If @prune is set, class
+    search is skipped for combinations with a pair of lemmas whose postings do
+    not intersect, such combinations can not be found by search anyway.
+    """
     EMPTY_SET = SemanticNodeSet([], [])
     PERSON_NODE = [("<wordnet_person_100007846>", 1.0)]
 
@@ -29,12 +39,103 @@ class MinClassDisambigSolver(object):
                  class_search,
                  taxonomy,
                  types,
-                 names=set()):
+                 names=set(),
+                 node_dict=None,
+                 max_lemmas=None,
+                 max_comb_size=None,
+                 prune=False):
         self.class_dict = class_dict
         self.class_search = class_search
         self.taxonomy = taxonomy
         self.types = types
+        self.lca = LcaEngine(taxonomy)
         self.names = names
+        self.node_dict = node_dict
+        self.classifier = node_dict.classifier if node_dict is not None else NAME_CLASSIFIER
+        self.max_lemmas = max_lemmas
+        self.max_comb_size = max_comb_size
+        self.prune = prune
+        self.bound_hits = collections.Counter()
+        self.pruned_combinations = 0
+
+    def node_names(self, nodes):
+        if self.node_dict is None:
+            return list(nodes)
+        return self.node_dict.get_names(nodes)
+
+    def bound_lemmas(self, lemmas, debug=False):
+        """
+        Returns at most max_lemmas of @lemmas, lemmas which are labels of class
+        dict go first, otherwise input order is kept.
+        """
+        if self.max_lemmas is None or len(lemmas) <= self.max_lemmas:
+            return lemmas
+        self.bound_hits["max_lemmas"] += 1
+        labels = self.class_dict.lookup_many(lemmas)
+        bounded = [lemma for lemma in lemmas if lemma in labels] + [lemma for lemma in lemmas if lemma not in labels]
+        bounded = bounded[:self.max_lemmas]
+        if debug:
+            sys.stderr.write("\tbound hit: max_lemmas=%d, using [%s]\n" % (self.max_lemmas, ",".join(bounded)))
+        return bounded
+
+    def may_cooccur(self, lemm_combination, memo):
+        """
+        Returns False if @prune is set and postings of some pair of lemmas of
+        @lemm_combination do not intersect. Pairs are intersected on demand, only
+        for checked combinations, and kept in search @memo.
+        """
+        if not self.prune or len(lemm_combination) < 2:
+            return True
+        self.class_search.memo_fetch(lemm_combination, memo)
+        for pair in itertools.combinations(lemm_combination, 2):
+            if len(self.class_search.memo_conjunction(pair, memo)) == 0:
+                return False
+        return True
+
+    def prefetch(self, combinations, try_lca=False, memo=None):
+        """
+        Reads all index records needed to check lemma @combinations in a few
+        batches, so that disambiguate() finds them in the lookup caches (and
+        search @memo) instead of doing point lookups one by one. Combinations
+        which can not be found by search (see may_cooccur()) are not searched.
+        Nothing is read if lookup caches are disabled, read records would not be
+        kept for disambiguate() anyway.
+        """
+        if self.class_dict.cache.size <= 0:
+            return
+        if memo is None:
+            memo = dict()
+        labels = self.class_dict.permutation_labels_many([c for c in combinations if len(c) > 1])
+        terms = []
+        for lemm_combination in combinations:
+            if len(lemm_combination) > 1:
+                terms.extend(labels[lemm_combination])
+            else:
+                terms.append(lemm_combination[0])
+        found = self.class_dict.get_many(terms, self.EMPTY_SET)
+        self.prefetch_node_sets(found.itervalues())
+
+        # Search is done for combinations without exact matches only.
+        search_combinations = []
+        for lemm_combination in combinations:
+            if len(lemm_combination) > 1:
+                if all(found[label].isempty(self.types) for label in labels[lemm_combination]):
+                    search_combinations.append(lemm_combination)
+            elif try_lca and found[lemm_combination[0]].isempty(self.types):
+                search_combinations.append(lemm_combination)
+        if self.prune:
+            # Postings needed by may_cooccur() are read in one batch.
+            self.class_search.memo_fetch(itertools.chain.from_iterable(search_combinations), memo)
+            search_combinations = [c for c in search_combinations if self.may_cooccur(c, memo)]
+        if len(search_combinations) > 0:
+            found = self.class_search.search_many(search_combinations, self.EMPTY_SET, memo=memo)
+            self.prefetch_node_sets(found.itervalues())
+
+    def prefetch_node_sets(self, node_sets):
+        nodes = set()
+        for node_set in node_sets:
+            nodes.update(node_set.nodes)
+        self.types.filter_typed(filter(self.classifier.is_instance, nodes))
 
     def bin_sets(self, node_sets, debug=False):
         sets = []
@@ -49,66 +150,57 @@ class MinClassDisambigSolver(object):
         if debug:
             for i, lemmas, classes, inst_classes in sets:
                 sys.stderr.write("\t\t\t bin(%d) %s\n" % (i, " ".join(lemmas)))
-                for cl in classes:
+                for cl in self.node_names(classes):
                     sys.stderr.write("\t\t\t\t c %s\n" % cl)
-                for cl in inst_classes:
+                for cl in self.node_names(inst_classes):
                     sys.stderr.write("\t\t\t\t i %s\n" % cl)
         return sets
 
     @staticmethod
     def sort_sets(binned_node_sets, debug=False):
+
+        # Inverted index: class -> positions of bins which have it in instance classes (in bin order).
+        class_bins = collections.defaultdict(list)
+        for position, (_, _, _, instance_classes) in enumerate(binned_node_sets):
+            for cl in instance_classes:
+                class_bins[cl].append(position)
+
+        sorted_nodes = collections.Counter()
         sorted_sets = []
 
         for class_bin_index, lemmas, classes, self_instance_classes in binned_node_sets:
             bin_weighted_nodes = dict()
-            all_classes = self_instance_classes | classes
-            for cl in all_classes:
-
-                if cl not in bin_weighted_nodes:
-                    if cl in classes:
-                        bin_weighted_nodes[cl] = [1.0 / len(classes) + CLASS_SCORE_AWARD, []]
-                    if cl in self_instance_classes:
-                        bin_weighted_nodes[cl] = [1.0 / len(self_instance_classes), []]
-
-                for instance_bin_index, instance_lemmas, _, instance_classes in binned_node_sets:
-                    if class_bin_index != instance_bin_index and cl in instance_classes:
-
-                        bin_weighted_nodes[cl][0] += 1
-                        bin_weighted_nodes[cl][1].append(" ".join(instance_lemmas))
-
-            # if debug:
-            #     print "W", bin_weighted_nodes
-            #     exit()
-            sorted_sets.append((class_bin_index, lemmas, bin_weighted_nodes))
+            for cl in self_instance_classes | classes:
+                if cl in self_instance_classes:
+                    cl_weight = 1.0 / len(self_instance_classes)
+                else:
+                    cl_weight = 1.0 / len(classes) + CLASS_SCORE_AWARD
+                # Each supporting bin adds one, in bin order, so that weights are summed as before.
+                for position in class_bins.get(cl, ()):
+                    if binned_node_sets[position][0] != class_bin_index:
+                        cl_weight += 1
+                bin_weighted_nodes[cl] = cl_weight
+            for cl, cl_weight in bin_weighted_nodes.iteritems():
+                sorted_nodes[cl] += cl_weight
+            if debug:
+                sorted_sets.append((class_bin_index, lemmas, bin_weighted_nodes))
 
         if debug:
             sys.stderr.write("\t\t----------\n")
             for class_bin_index, lemmas, bin_weighted_nodes in sorted_sets:
                 sys.stderr.write("\t\t\t sorted_bin(%d) %s\n" % (class_bin_index, " ".join(lemmas)))
-                for cl, (cl_weight, cl_lemmas) in bin_weighted_nodes.iteritems():
-                    cl_lemmas = ";".join(cl_lemmas)
+                for cl, cl_weight in bin_weighted_nodes.iteritems():
+                    cl_lemmas = ";".join([" ".join(binned_node_sets[position][1])
+                                          for position in class_bins.get(cl, ())
+                                          if binned_node_sets[position][0] != class_bin_index])
                     sys.stderr.write("\t\t\t\t c %.3f %s in  %s\n" % (cl_weight, cl, cl_lemmas))
 
-        sorted_nodes = collections.Counter()
-        for _, _, bin_weighted_nodes in sorted_sets:
-            for cl, (cl_weight, _) in bin_weighted_nodes.iteritems():
-                sorted_nodes[cl] += cl_weight
-
         return sorted_nodes
 
     def transitive(self, w_class):
         if w_class is None:
             return []
-        last_parent = w_class
-        path = []
-        while True:
-            parent = self.taxonomy[last_parent]
-            if parent is None:
-                return path
-            path.append(parent)
-            last_parent = parent
-            # print last_parent
-        return path
+        return list(self.taxonomy.ancestors(w_class))
 
     def apply_lca(self, node_set, depth=1, debug=False):
         """
@@ -123,52 +215,21 @@ class MinClassDisambigSolver(object):
             all_classes = node_set.generalize(self.types, self.taxonomy, levels=depth).nodes
 
         if debug:
-            sys.stderr.write("\t\tinstance_classes={%s}\n" % ", ".join(all_classes))
-
-        # For each class, get list of all its parenrs (transitive).
-        classes_with_parents = []
-        for cl in all_classes:
-            trans = self.transitive(cl)
-            classes_with_parents.append((cl, trans))
-            # print cl, "=>", len(trans), trans
-
-
-        # Create taxonomy tree and count total numbers of leaves for each node.
-        tree = dict()
-        for cl in all_classes:
-            tree[cl] = [cl, dict(), 1]
-        for cl, parents in classes_with_parents:
-            child = cl
-            for p in parents:
-                child_node = tree[child]
-                if p not in tree:
-                    children = {child: child_node[2]}
-                    total_children = child_node[2]
-                    tree[p] = [p, children, total_children]
-                else:
-                    children = tree[p][1]
-                    total_children = tree[p][2]
-                    if child in children:
-                        # print children[child], "=>", child_node[2]
-                        total_children -= children[child]
-                        total_children += child_node[2]
-                        children[child] = child_node[2]
-                    else:
-                        total_children += child_node[2]
-                        children[child] = child_node[2]
-                    tree[p][2] = total_children
-                child = p
-
-        if len(tree) <= 1:
+            sys.stderr.write("\t\tinstance_classes={%s}\n" % ", ".join(self.node_names(all_classes)))
+
+        # Count number of classes in subtree of each class and its ancestors.
+        subtree_counts = self.lca.subtree_counts(all_classes)
+
+        if len(subtree_counts) <= 1:
             return SemanticNodeSet(lemmas=[], nodes=[])
 
         # Sort all nodes by total number of leaves.
-        sorted_tree = sorted(tree.itervalues(), key=lambda node: -node[2])
+        sorted_tree = sorted(subtree_counts, key=lambda node: -node[1])
 
         if debug:
             sys.stderr.write("\t\t\tsorted_node_subtree[%s]:" % ", ".join(node_set.lemmas))
             for node in sorted_tree:
-                sys.stderr.write("\t\t\t\tnode=%s (%d)" % (node[0], node[2]))
+                sys.stderr.write("\t\t\t\tnode=%s (%d)" % (self.node_names([node[0]])[0], node[1]))
 
         # Cross fingers and return nodes, selected by Ziph magic rule.
         total = len(sorted_tree)
@@ -177,9 +238,52 @@ class MinClassDisambigSolver(object):
             bottom_thr = 1
         top_thr = int(len(sorted_tree) / 5.0 * 2) + 1
         nodes = [node[0] for node in sorted_tree[bottom_thr:top_thr]]
-        return SemanticNodeSet(lemmas=node_set.lemmas, nodes=nodes)
+        return SemanticNodeSet(lemmas=node_set.lemmas, nodes=nodes, node_dict=node_set.node_dict,
+                               classifier=node_set.classifier)
+
+    def disambiguate_many(self, lemma_lists, depth=1, return_size=1, debug=False, try_lca=False):
+        """
+        Returns list of disambiguate() results of @lemma_lists, in input order.
+        Lists of the same lemmas in any order are solved once, in sorted order,
+        unless they are longer than max_lemmas: then order decides which lemmas
+        are kept, so only equal lists are solved once. Exact matches of all single lemmas and of all unbounded
+        full combinations are read in shared batches, search intersections are
+        shared by all calls.
+        """
+        distinct = []
+        results = dict()
+        for lemmas in lemma_lists:
+            key = self.lemmas_key(lemmas)
+            if key not in results:
+                results[key] = None
+                distinct.append(key)
+
+        combinations = set()
+        for lemmas in distinct:
+            lemma_set = set(lemmas)
+            combinations.update((lemma,) for lemma in lemma_set)
+            if len(lemma_set) > 1 and (self.max_lemmas is None or len(lemmas) <= self.max_lemmas) \
+               and (self.max_comb_size is None or len(lemmas) <= self.max_comb_size):
+                combinations.add(tuple(sorted(lemma_set)))
+
+        # Intersections of class search postings of lemma subsets, shared by all calls of this batch.
+        memo = dict()
+        self.prefetch(sorted(combinations), try_lca=try_lca, memo=memo)
+
+        for lemmas in distinct:
+            results[lemmas] = self.disambiguate(list(lemmas), depth=depth, return_size=return_size,
+                                                debug=debug, try_lca=try_lca, memo=memo)
+        return [results[self.lemmas_key(lemmas)] for lemmas in lemma_lists]
+
+    def lemmas_key(self, lemmas):
+        """
+        Returns tuple of @lemmas which disambiguate_many() solves for them.
+        """
+        if self.max_lemmas is None or len(lemmas) <= self.max_lemmas:
+            return tuple(sorted(lemmas))
+        return tuple(lemmas)
 
-    def disambiguate(self, lemmas, depth=1, return_size=1, debug=False, try_lca=False):
+    def disambiguate(self, lemmas, depth=1, return_size=1, debug=False, try_lca=False, memo=None):
 
         if len(lemmas) == 0:
             return []
@@ -187,23 +291,35 @@ class MinClassDisambigSolver(object):
         best_set = None
         best_len = np.inf
 
-        # Initially, use all lemmas to find best node set.
-        active_lemmas = set(lemmas)
+        # Initially, use all lemmas (within the bound) to find best node set.
+        search_lemmas = self.bound_lemmas(lemmas, debug)
+        active_lemmas = set(search_lemmas)
 
         # Try all possible combination of lemmas starting from the longest (the less ambiguate).
         #if try_lca:
-        comb_sizes = range(len(lemmas), 0, -1)
+        max_comb_size = len(search_lemmas)
+        if self.max_comb_size is not None and self.max_comb_size < max_comb_size:
+            self.bound_hits["max_comb_size"] += 1
+            max_comb_size = self.max_comb_size
+            if debug:
+                sys.stderr.write("\tbound hit: max_comb_size=%d\n" % max_comb_size)
+        comb_sizes = range(max_comb_size, 0, -1)
         #else:
         #    comb_sizes = [1]
 
+        # Intersections of class search postings of lemma subsets, shared by all searches
+        # of this call (and of the batch, see disambiguate_many()).
+        if memo is None:
+            memo = dict()
+
         # Store found results in this list.
         found_node_sets = []
 
         for comb_size in comb_sizes:
 
             # Checking all combibations of lemmas starting from the longest.
-            combinations = itertools.combinations(active_lemmas, comb_size)
-
+            combinations = list(itertools.combinations(active_lemmas, comb_size))
+            self.prefetch(combinations, try_lca=try_lca, memo=memo)
 
             for lemm_combination in combinations:
 
@@ -213,17 +329,21 @@ class MinClassDisambigSolver(object):
                 # If number of lemmas in combination is more than one, just do partial search.
                 if comb_size > 1:
 
-                    # try all to concatinate all permutations
+                    # try all to concatinate all permutations (which are labels of class dict)
                     # else use search
 
-                    for permutation in itertools.permutations(lemm_combination):
-                        perm_str = " ".join(permutation)
+                    node_set = self.EMPTY_SET
+                    for perm_str in self.class_dict.permutation_labels(lemm_combination):
                         node_set = self.class_dict.get(perm_str, self.EMPTY_SET)
                         if not node_set.isempty(self.types):
                             break
 
                     if node_set.isempty(self.types):
-                        node_set = self.class_search.search(lemm_combination, self.EMPTY_SET)
+                        if self.may_cooccur(lemm_combination, memo):
+                            node_set = self.class_search.search(lemm_combination, self.EMPTY_SET, memo=memo)
+                        else:
+                            self.pruned_combinations += 1
+                            node_set = self.EMPTY_SET
 
                 # Othewise, first try to find exact lemma = label match.
                 else:
@@ -234,7 +354,7 @@ class MinClassDisambigSolver(object):
 
                     # If result is empty, try to do partial search.
                     if node_set.isempty(self.types) and try_lca:
-                        node_set = self.class_search.search(lemm_combination, self.EMPTY_SET)
+                        node_set = self.class_search.search(lemm_combination, self.EMPTY_SET, memo=memo)
 
                         # Use (L)east (C)ommon (A)ncestor to find better instance nodes.
                         node_set = self.apply_lca(node_set, debug)
@@ -263,15 +383,22 @@ class MinClassDisambigSolver(object):
 
         binned_sets = self.bin_sets(found_node_sets, debug=debug)
         sorted_nodes = self.sort_sets(binned_sets, debug=debug)
-        total_score = sum(sorted_nodes.itervalues())
 
-        for k in sorted_nodes.iterkeys():
-            sorted_nodes[k] /= total_score
+        # Node ids are resolved into names before scores are summed, nodes are
+        # taken in name order, so that every index format gives the same scores.
+        if self.node_dict is not None:
+            scored_nodes = zip(self.node_dict.get_names(sorted_nodes.keys()), sorted_nodes.values())
+        else:
+            scored_nodes = sorted_nodes.items()
+        scored_nodes.sort()
+        total_score = sum(score for _, score in scored_nodes)
+
+        scored_nodes = [(node, score / total_score) for node, score in scored_nodes]
 
-        if len(sorted_nodes) > 0:
+        if len(scored_nodes) > 0:
 
-            max_score = max(sorted_nodes.itervalues())
-            selected_nodes = list(filter(lambda node_score: node_score[1] == max_score, sorted_nodes.iteritems()))
+            max_score = max(score for _, score in scored_nodes)
+            selected_nodes = [(node, score) for node, score in scored_nodes if score == max_score]
 
             # if debug:
             #     print selected_nodes
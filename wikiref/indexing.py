@@ -0,0 +1,1039 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+import gc
+import os
+import json
+import Queue
+import time
+import heapq
+import marshal
+import shutil
+import logging
+import tempfile
+import itertools
+import collections
+import fileinput
+import functools
+import multiprocessing
+
+from wikiref.bloom import BloomFilter
+from wikiref.bitmap import RoaringBitmap
+from wikiref.postings import pack_id
+from wikiref.postings import encode_varints
+from wikiref.postings import encode_postings
+from wikiref.util import extract_parts
+from wikiref.util import extract_label
+from wikiref.util import label_key
+from wikiref.storage import shard_index
+from wikiref.storage import index_path
+from wikiref.storage import open_backend
+from wikiref.storage import LevelDBBackend
+from wikiref.storage import VALUE_LZ4
+from wikiref.storage import pack_value
+from wikiref.storage import read_compression
+from wikiref.semadata import NodeType
+
+from wikiref.settings import LDB_ARRAY_DELIM
+from wikiref.settings import INDEX_NODE_ID_PREFIX
+from wikiref.settings import INDEX_NODE_NAME_PREFIX
+from wikiref.settings import INDEX_MAX_CACHE_SIZE
+from wikiref.settings import INDEX_STATS_FILENAME
+from wikiref.settings import INDEX_SHARDS_FILENAME
+from wikiref.settings import INDEX_SHARD_DIRNAME
+from wikiref.settings import INDEX_COMPRESSION_FILENAME
+from wikiref.settings import INDEX_COMPRESSION_THRESHOLD
+from wikiref.settings import INDEX_BLOOM_ERROR_RATE
+from wikiref.settings import INDEX_TYPE_REL
+from wikiref.settings import INDEX_TAXONOMY_REL
+from wikiref.settings import INDEX_YAGO_TSV_DELIM
+from wikiref.settings import INDEX_YAGO_TYPES_DIRNAME
+from wikiref.settings import INDEX_YAGO_NODES_DIRNAME
+from wikiref.settings import INDEX_YAGO_TAXONOMY_DIRNAME
+from wikiref.settings import INDEX_YAGO_ANCESTORS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_KEYS_DIRNAME
+from wikiref.settings import INDEX_YAGO_NODE_LABELS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME
+from wikiref.settings import INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME
+from wikiref.settings import INDEX_YAGO_TYPED_FILENAME
+from wikiref.settings import INDEX_YAGO_NODE_TYPES_FILENAME
+
+
+WRITE_BATCH_SIZE = 100000
+
+# Section of index stats with the snapshot version stamp.
+INDEX_VERSION_SECTION = "version"
+
+# Index directory name and whether its keys are nodes (rather than labels or words).
+NODE_ID_INDEXES = (
+    (INDEX_YAGO_CLASS_DICT_DIRNAME, False),
+    (INDEX_YAGO_CLASS_SEARCH_DIRNAME, False),
+    (INDEX_YAGO_TAXONOMY_DIRNAME, True),
+    (INDEX_YAGO_TYPES_DIRNAME, True),
+)
+
+
+def write_items(index, items):
+    """
+    Writes iterable of (key, value) pairs into storage backend @index using batches of WRITE_BATCH_SIZE.
+    """
+    items = iter(items)
+    total = 0
+    for batch in iter(lambda: list(itertools.islice(items, WRITE_BATCH_SIZE)), []):
+        index.write(batch)
+        total += len(batch)
+    return total
+
+
+def node_label_row(rel, label, lang):
+    """
+    Returns record of node labels index for label triple of @rel with @label (as in Yago, not lowercased) and @lang.
+    """
+    return INDEX_YAGO_TSV_DELIM.join((rel, label, lang))
+
+
+def read_index_stats(index_dir):
+    """
+    Returns dict: section -> stats stored in INDEX_STATS_FILENAME of @index_dir.
+    """
+    stats_path = os.path.join(index_dir, INDEX_STATS_FILENAME)
+    if not os.path.exists(stats_path):
+        return dict()
+    with open(stats_path, "rb") as fl:
+        return json.load(fl)
+
+
+def update_index_stats(index_dir, section, stats):
+    index_stats = read_index_stats(index_dir)
+    index_stats[section] = stats
+    with open(os.path.join(index_dir, INDEX_STATS_FILENAME), "wb") as fl:
+        json.dump(index_stats, fl, indent=2, sort_keys=True)
+
+
+def read_index_version(index_dir):
+    """
+    Returns version stamp of the index snapshot in @index_dir or None if it was never stamped.
+    """
+    version = read_index_stats(index_dir).get(INDEX_VERSION_SECTION)
+    if version is None:
+        return None
+    return str(version["stamp"])
+
+
+def stamp_index_version(index_dir, **info):
+    """
+    Writes new version stamp (build time and sequence number) of the index
+    snapshot in @index_dir together with @info. Returns the stamp.
+    """
+    version = read_index_stats(index_dir).get(INDEX_VERSION_SECTION, dict())
+    sequence = version.get("sequence", 0) + 1
+    stamp = "%s-%d" % (time.strftime("%Y%m%dT%H%M%S", time.gmtime()), sequence)
+    info.update(sequence=sequence, stamp=stamp)
+    update_index_stats(index_dir, INDEX_VERSION_SECTION, info)
+    logging.info("Stamped index version %s." % stamp)
+    return stamp
+
+
+class FlushIndexWriter(object):
+    """
+    Accumulates key -> {values} in memory and merges it into existing records
+    of storage backend @index every time @max_items values are collected.
+    Index is closed by close().
+    """
+
+    def __init__(self, index, max_items=INDEX_MAX_CACHE_SIZE):
+        self.index = index
+        self.max_items = max_items
+        self.cache = dict()
+        self.size = 0
+
+    def add(self, key, value):
+        if key in self.cache:
+            self.cache[key].add(value)
+        else:
+            self.cache[key] = {value}
+        self.size += 1
+        if self.size > self.max_items:
+            self.flush()
+
+    def flush(self):
+        for key, value in self.index.multi_get(self.cache.iterkeys()).iteritems():
+            self.cache[key].update(value.split(LDB_ARRAY_DELIM))
+        write_items(self.index, ((key, LDB_ARRAY_DELIM.join(sorted(values))) for key, values in self.cache.iteritems()))
+        logging.info("Flushed %d items." % len(self.cache))
+        self.cache = dict()
+        self.size = 0
+        gc.collect()
+
+    def close(self):
+        self.flush()
+        self.index.close()
+
+
+class BulkIndexWriter(object):
+    """
+    Builds index into empty storage backend @index writing every key exactly
+    once. Values are accumulated in memory up to @max_items, then spilled to
+    @tmp_dir as a run sorted by key. On close() all runs are k-way merged, keys
+    are written in sorted order and index is closed, so index is never read
+    during the build. Raises ValueError if @index is not empty, since its
+    records would be overwritten, FlushIndexWriter merges into them instead.
+    """
+
+    def __init__(self, index, max_items=INDEX_MAX_CACHE_SIZE, tmp_dir=None):
+        self.index = index
+        self.max_items = max_items
+        self.tmp_dir = tmp_dir
+        self.cache = dict()
+        self.size = 0
+        self.runs = []
+        for _ in index.iterate(include_value=False):
+            index.close()
+            raise ValueError("Bulk writer output %r is not empty, use flush mode (--bulk 0) to add "
+                             "records to existing index." % index)
+
+    def add(self, key, value):
+        if key in self.cache:
+            self.cache[key].add(value)
+        else:
+            self.cache[key] = {value}
+        self.size += 1
+        if self.size > self.max_items:
+            self.spill()
+
+    def spill(self):
+        run = tempfile.TemporaryFile(prefix="wikiref_run_", dir=self.tmp_dir)
+        for key in sorted(self.cache.iterkeys()):
+            marshal.dump((key, sorted(self.cache[key])), run)
+        run.seek(0)
+        self.runs.append(run)
+        logging.info("Spilled run #%d with %d keys." % (len(self.runs), len(self.cache)))
+        self.cache = dict()
+        self.size = 0
+        gc.collect()
+
+    @staticmethod
+    def read_run(run):
+        while True:
+            try:
+                yield marshal.load(run)
+            except EOFError:
+                run.close()
+                return
+
+    def merge_runs(self):
+        """
+        Yields (key, [values]) pairs sorted by key, merging values of the same key from all runs.
+        """
+        runs = [self.read_run(run) for run in self.runs]
+        runs.append((key, sorted(values)) for key, values in sorted(self.cache.iteritems()))
+        for key, key_runs in itertools.groupby(heapq.merge(*runs), key=lambda key_values: key_values[0]):
+            values = set()
+            for _, run_values in key_runs:
+                values.update(run_values)
+            yield key, sorted(values)
+
+    def close(self):
+        total = write_items(self.index, ((key, LDB_ARRAY_DELIM.join(values)) for key, values in self.merge_runs()))
+        logging.info("Merged %d runs, wrote %d keys." % (len(self.runs) + 1, total))
+        self.cache = dict()
+        self.size = 0
+        self.runs = []
+        self.index.close()
+
+
+def open_index_writer(index, bulk=False, max_items=INDEX_MAX_CACHE_SIZE, tmp_dir=None):
+    if bulk:
+        return BulkIndexWriter(index, max_items=max_items, tmp_dir=tmp_dir)
+    return FlushIndexWriter(index, max_items=max_items)
+
+
+class IndexWorker(multiprocessing.Process):
+    """
+    Process which owns one index and fills it with rows received in chunks
+    from @queue. Every row is passed to @handler(writer, row), which adds its
+    records to the index writer (see add_pair() and the label handlers below).
+    None chunk tells worker that input is over. If @shards is more than one,
+    index is written with ShardedIndexWriter.
+    """
+
+    def __init__(self, ldb_path, queue, handler, bulk=False, max_items=INDEX_MAX_CACHE_SIZE, tmp_dir=None,
+                 shards=1):
+        super(IndexWorker, self).__init__(name=os.path.basename(ldb_path))
+        self.ldb_path = ldb_path
+        self.queue = queue
+        self.handler = handler
+        self.bulk = bulk
+        self.max_items = max_items
+        self.tmp_dir = tmp_dir
+        self.shards = shards
+
+    # Seconds to wait for free space in the queue before checking that worker is still running.
+    PUT_TIMEOUT = 1.0
+
+    def send(self, chunk):
+        """
+        Puts @chunk into the worker queue. Raises RuntimeError if the worker
+        exits while its queue is full, instead of waiting for it forever.
+        """
+        while True:
+            try:
+                self.queue.put(chunk, timeout=self.PUT_TIMEOUT)
+                return
+            except Queue.Full:
+                if not self.is_alive():
+                    self.queue.cancel_join_thread()
+                    raise RuntimeError("%s exited with code %r." % (self.name, self.exitcode))
+
+    def stop(self):
+        """
+        Tells the worker that input is over, unless it has already exited.
+        """
+        try:
+            self.send(None)
+        except RuntimeError:
+            pass
+
+    def run(self):
+        writer = create_index_writer(self.ldb_path, bulk=self.bulk, max_items=self.max_items, tmp_dir=self.tmp_dir,
+                                     shards=self.shards)
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            for row in chunk:
+                self.handler(writer, row)
+        writer.close()
+        logging.info("%s is complete." % self.name)
+
+
+def join_workers(workers):
+    """
+    Waits for stopped @workers and returns names of the failed ones. Chunks
+    which failed workers did not read are dropped, so that this process can exit.
+    """
+    failed = []
+    for worker in workers:
+        worker.join()
+        if worker.exitcode != 0:
+            worker.queue.cancel_join_thread()
+            failed.append(worker.name)
+    return failed
+
+
+def add_class_dict_label(allowed_langs, writer, row):
+    """
+    Handles (node, rel, label, lang) rows, see run_index_class_dict.py. Bind
+    @allowed_langs with functools.partial() to get handler of IndexWorker.
+    """
+    node, _, label, lang = row
+    if lang in allowed_langs:
+        writer.add(label.lower(), node)
+
+
+def add_class_search_words(writer, row):
+    """
+    Handles (node, rel, label, lang) rows, see run_index_class_search.py.
+    """
+    node, _, label, _ = row
+    for part in extract_parts(label.lower()):
+        writer.add(part, node)
+
+
+def add_node_label(writer, row):
+    """
+    Handles (node, rel, label, lang) rows, see run_index_node_labels.py.
+    """
+    node, rel, label, lang = row
+    writer.add(node, node_label_row(rel, label, lang))
+
+
+def add_pair(writer, row):
+    """
+    Handles (key, value) rows, see run_index_taxonomy.py and run_index_types.py.
+    """
+    writer.add(row[0], row[1])
+
+
+class ShardedIndexWriter(object):
+    """
+    Writes index into @shards LevelDB shards in @path directory (see
+    wikiref.storage.ShardedBackend). Pairs are routed by key hash in chunks to
+    IndexWorker processes, one per shard, so shards are built in parallel. Each
+    key goes to exactly one shard, so shards together hold the same records as
+    an index built serially.
+    """
+    CHUNK_SIZE = 10000
+    QUEUE_SIZE = 64
+
+    def __init__(self, path, shards, bulk=False, max_items=INDEX_MAX_CACHE_SIZE, tmp_dir=None):
+        if read_compression(path) is not None:
+            raise ValueError("Index %s is compressed, it can not be written by shard workers." % path)
+        if os.path.exists(os.path.join(path, "CURRENT")):
+            raise ValueError("Index %s is not sharded, it can not be written into %d shards." % (path, shards))
+        shards_path = os.path.join(path, INDEX_SHARDS_FILENAME)
+        if os.path.exists(shards_path):
+            with open(shards_path, "rb") as fl:
+                existing_shards = int(fl.read())
+            if existing_shards != shards:
+                raise ValueError("Index %s has %d shards, it can not be written into %d shards." % (
+                    path,
+                    existing_shards,
+                    shards,
+                ))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        with open(shards_path, "wb") as fl:
+            fl.write("%d\n" % shards)
+        self.path = path
+        self.shards = shards
+        self.chunks = [[] for _ in xrange(shards)]
+        self.workers = []
+        for shard in xrange(shards):
+            queue = multiprocessing.Queue(self.QUEUE_SIZE)
+            worker = IndexWorker(os.path.join(path, INDEX_SHARD_DIRNAME % shard),
+                                 queue,
+                                 add_pair,
+                                 bulk=bulk,
+                                 max_items=max(max_items // shards, 1),
+                                 tmp_dir=tmp_dir)
+            worker.start()
+            self.workers.append(worker)
+
+    def add(self, key, value):
+        shard = shard_index(key, self.shards)
+        chunk = self.chunks[shard]
+        chunk.append((key, value))
+        if len(chunk) >= self.CHUNK_SIZE:
+            self.workers[shard].send(chunk)
+            self.chunks[shard] = []
+
+    def close(self):
+        try:
+            for worker, chunk in zip(self.workers, self.chunks):
+                if len(chunk) > 0:
+                    worker.send(chunk)
+        finally:
+            for worker in self.workers:
+                worker.stop()
+            failed = join_workers(self.workers)
+        self.chunks = [[] for _ in xrange(self.shards)]
+        if len(failed) > 0:
+            raise RuntimeError("Shard workers of %s failed: %s." % (self.path, ", ".join(failed)))
+        logging.info("Built %d shards of %s." % (self.shards, self.path))
+
+
+def create_index_writer(path, bulk=False, max_items=INDEX_MAX_CACHE_SIZE, tmp_dir=None, shards=1):
+    """
+    Returns writer of index at @path, sharded if @shards is more than one.
+    Existing index is opened with open_backend(), so values written into
+    sharded or compressed index are routed and packed the same way as on read.
+    """
+    if shards > 1:
+        return ShardedIndexWriter(path, shards, bulk=bulk, max_items=max_items, tmp_dir=tmp_dir)
+    return open_index_writer(open_backend(path, "leveldb"), bulk=bulk, max_items=max_items, tmp_dir=tmp_dir)
+
+
+class MultiIndexBuilder(object):
+    """
+    Builds class dict, class search, node labels, taxonomy and types indexes
+    streaming each input file once. Rows are filtered by relation before the rest of the line
+    is parsed and are sent in chunks to the index workers, which run in
+    separate processes. If @shards is more than one, every index is written
+    into that many shards, each by its own process.
+    """
+    CHUNK_SIZE = 10000
+    QUEUE_SIZE = 64
+
+    def __init__(self, odir, allowed_rels, allowed_langs, bulk=False, max_items=INDEX_MAX_CACHE_SIZE,
+                 tmp_dir=None, shards=1):
+        self.odir = odir
+        self.allowed_rels = allowed_rels
+        self.allowed_langs = allowed_langs
+        self.worker_args = {
+            "bulk": bulk,
+            "max_items": max_items,
+            "tmp_dir": tmp_dir,
+            "shards": shards,
+        }
+
+    def start_worker(self, handler, dirname):
+        queue = multiprocessing.Queue(self.QUEUE_SIZE)
+        worker = IndexWorker(os.path.join(self.odir, dirname), queue, handler, **self.worker_args)
+        worker.start()
+        return worker
+
+    @staticmethod
+    def read_rows(file_names, rels):
+        """
+        Yields (subject, relation, object) of the lines with relation in @rels.
+        """
+        input_fl = fileinput.input(file_names)
+        for line in input_fl:
+            row = line.split(INDEX_YAGO_TSV_DELIM, 4)
+            if row[2] in rels:
+                yield row[1], row[2], row[3]
+        input_fl.close()
+
+    def dispatch(self, rows, workers):
+        for chunk in iter(lambda: list(itertools.islice(rows, self.CHUNK_SIZE)), []):
+            for worker in workers:
+                worker.send(chunk)
+
+    def label_rows(self, file_names):
+        for node, rel, label_lang in self.read_rows(file_names, self.allowed_rels):
+            try:
+                label, lang = extract_label(label_lang)
+            except ValueError:
+                logging.error("Unable to extract label from '%r'." % label_lang)
+                continue
+            if label is None:
+                continue
+            yield node, rel, label, lang
+
+    def pair_rows(self, file_names, rel):
+        for key, _, value in self.read_rows(file_names, {rel}):
+            if len(key) == 0 or len(value) == 0:
+                continue
+            yield key, value
+
+    def build(self, label_files, taxonomy_files, types_files):
+        add_class_dict_label_of_langs = functools.partial(add_class_dict_label, self.allowed_langs)
+        label_workers = [
+            self.start_worker(add_class_dict_label_of_langs, INDEX_YAGO_CLASS_DICT_DIRNAME),
+            self.start_worker(add_class_search_words, INDEX_YAGO_CLASS_SEARCH_DIRNAME),
+            self.start_worker(add_node_label, INDEX_YAGO_NODE_LABELS_DIRNAME),
+        ]
+        taxonomy_worker = self.start_worker(add_pair, INDEX_YAGO_TAXONOMY_DIRNAME)
+        types_worker = self.start_worker(add_pair, INDEX_YAGO_TYPES_DIRNAME)
+        workers = label_workers + [taxonomy_worker, types_worker]
+
+        try:
+            logging.info("Reading labels: %r" % label_files)
+            self.dispatch(self.label_rows(label_files), label_workers)
+            logging.info("Reading taxonomy: %r" % taxonomy_files)
+            self.dispatch(self.pair_rows(taxonomy_files, INDEX_TAXONOMY_REL), [taxonomy_worker])
+            logging.info("Reading types: %r" % types_files)
+            self.dispatch(self.pair_rows(types_files, INDEX_TYPE_REL), [types_worker])
+        finally:
+            for worker in workers:
+                worker.stop()
+            failed = join_workers(workers)
+
+        if len(failed) > 0:
+            raise RuntimeError("Index workers failed: %s." % ", ".join(failed))
+
+
+def load_first_parents(taxonomy_index):
+    """
+    Returns dict: node -> first parent for all child nodes of the taxonomy index.
+    """
+    parents = dict()
+    for child, value in taxonomy_index.iterate():
+        parents[child] = value.split(LDB_ARRAY_DELIM, 1)[0]
+    return parents
+
+
+def ancestor_path(node, parents):
+    """
+    Returns list of @node ancestors following @parents (node -> first parent) up to the root.
+    """
+    path = []
+    visited = {node}
+    parent = parents.get(node)
+    while parent is not None:
+        if parent in visited:
+            logging.warning("Cycle in taxonomy at %r, path truncated." % parent)
+            break
+        visited.add(parent)
+        path.append(parent)
+        parent = parents.get(parent)
+    return path
+
+
+def build_ancestor_index(taxonomy_index, ancestors_index):
+    """
+    Stores for every child node of the taxonomy index its depth and full path
+    to the root: <node> -> <depth>, [<parent>, <grand_parent>, ..., <root>].
+    The path follows the first parent of each node, the same way as
+    YagoTaxonomy.get_parent() does.
+    """
+    parents = load_first_parents(taxonomy_index)
+    logging.info("Loaded %d taxonomy nodes." % len(parents))
+    stats = {"max_depth": 0}
+
+    def ancestors():
+        for node in sorted(parents.iterkeys()):
+            path = ancestor_path(node, parents)
+            stats["max_depth"] = max(stats["max_depth"], len(path))
+            yield node, LDB_ARRAY_DELIM.join([str(len(path))] + path)
+
+    logging.info("Stored ancestors of %d nodes (max depth %d)." % (write_items(ancestors_index, ancestors()),
+                                                                    stats["max_depth"]))
+
+
+def build_posting_lengths(search_index, lengths_index):
+    """
+    Stores length of every posting list of the class search index:
+    <word> -> <number of nodes>. Used to intersect postings of rare words first.
+    """
+    def lengths():
+        for word, value in search_index.iterate():
+            yield word, str(value.count(LDB_ARRAY_DELIM) + 1)
+
+    logging.info("Stored posting lengths of %d words." % write_items(lengths_index, lengths()))
+
+
+def build_label_keys(class_dict_index, writer):
+    """
+    Stores every class dict label of more than one word under its order-insensitive
+    key (see wikiref.util.label_key()): <sorted words> -> [<yago_label>]. Used to find
+    labels which are permutations of lemmas with a single lookup.
+    """
+    labels = 0
+    for label in class_dict_index.iterate(include_value=False):
+        if " " in label:
+            writer.add(label_key(label), label)
+            labels += 1
+    writer.close()
+    logging.info("Stored keys of %d labels." % labels)
+
+
+def build_class_dict_bloom(index_dir, error_rate=INDEX_BLOOM_ERROR_RATE, probes=100000):
+    """
+    Stores Bloom filter of all class dict labels into INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME
+    of @index_dir. False positive rate is measured with @probes keys which can
+    not be labels and is stored into index stats together with filter size.
+    """
+    class_dict = open_backend(os.path.join(index_dir, INDEX_YAGO_CLASS_DICT_DIRNAME), "leveldb")
+    capacity = sum(1 for _ in class_dict.iterate(include_value=False))
+    bloom = BloomFilter.for_capacity(capacity, error_rate)
+    for label in class_dict.iterate(include_value=False):
+        bloom.add(label)
+    bloom.dump(os.path.join(index_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME))
+
+    false_positives = sum(1 for i in xrange(probes) if "\x00%d" % i in bloom)
+    stats = bloom.stats()
+    stats["target_error_rate"] = error_rate
+    stats["measured_error_rate"] = float(false_positives) / probes if probes > 0 else None
+    update_index_stats(index_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME, stats)
+    logging.info("Stored Bloom filter of %d labels (%d bytes, measured error rate %r)." % (
+        capacity,
+        bloom.size_bytes(),
+        stats["measured_error_rate"],
+    ))
+    return stats
+
+
+def compress_index(index_dir, dirname, threshold=INDEX_COMPRESSION_THRESHOLD):
+    """
+    Rewrites LevelDB index @dirname of @index_dir (sharded or not) so that
+    values of at least @threshold bytes are compressed with lz4 (see
+    wikiref.storage.CompressedBackend). Sizes of values before and after are
+    stored into index stats. Indexes which are already compressed are skipped.
+    """
+    path = os.path.join(index_dir, dirname)
+    if read_compression(path) is not None:
+        logging.info("Index %s is already compressed." % dirname)
+        return None
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    shards_path = os.path.join(path, INDEX_SHARDS_FILENAME)
+    if os.path.exists(shards_path):
+        with open(shards_path, "rb") as fl:
+            shards = int(fl.read())
+        os.makedirs(tmp_path)
+        shutil.copy(shards_path, tmp_path)
+        pairs = [(os.path.join(path, INDEX_SHARD_DIRNAME % shard), os.path.join(tmp_path, INDEX_SHARD_DIRNAME % shard))
+                 for shard in xrange(shards)]
+    else:
+        pairs = [(path, tmp_path)]
+    stats = {"codec": "lz4", "threshold": threshold, "values": 0, "compressed": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def packed_items(src_path):
+        for key, value in open_backend(src_path, "leveldb").iterate():
+            packed = pack_value(value, threshold)
+            stats["values"] += 1
+            stats["compressed"] += 1 if packed[0] == VALUE_LZ4 else 0
+            stats["raw_bytes"] += len(value)
+            stats["stored_bytes"] += len(packed)
+            yield key, packed
+
+    for src_path, dst_path in pairs:
+        # Values are packed already, so shards are written without CompressedBackend.
+        dst_index = LevelDBBackend(dst_path)
+        write_items(dst_index, packed_items(src_path))
+        dst_index.close()
+    with open(os.path.join(tmp_path, INDEX_COMPRESSION_FILENAME), "wb") as fl:
+        fl.write("%s %d" % (stats["codec"], threshold))
+    shutil.rmtree(path)
+    os.rename(tmp_path, path)
+    update_index_stats(index_dir, dirname, stats)
+    logging.info("Compressed %d of %d values of %s (%d -> %d bytes)." % (
+        stats["compressed"],
+        stats["values"],
+        dirname,
+        stats["raw_bytes"],
+        stats["stored_bytes"],
+    ))
+    return stats
+
+
+def build_node_id_index(src_dir, dst_dir, bitmaps=False):
+    """
+    Converts string indexes from @src_dir into the node id format in @dst_dir.
+    Nodes are interned to dense integer ids assigned in the sorted order of node
+    names, so sorted posting lists and "first parent" semantics are preserved.
+    Node keys are stored as packed ids and values as varint encoded deltas.
+    The node dictionary is stored in INDEX_YAGO_NODES_DIRNAME and NodeType of
+    every node in INDEX_YAGO_NODE_TYPES_FILENAME (one byte per id). If @bitmaps is
+    set, class search postings are stored as compressed bitmaps in
+    INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME instead. Set of nodes which have
+    types is stored as a bitset in INDEX_YAGO_TYPED_FILENAME.
+    """
+    nodes = set()
+    for dirname, node_keys in NODE_ID_INDEXES:
+        src_index = open_backend(os.path.join(src_dir, dirname), "leveldb")
+        for key, value in src_index.iterate():
+            if node_keys:
+                nodes.add(key)
+            nodes.update(value.split(LDB_ARRAY_DELIM))
+        src_index.close()
+        logging.info("Collected %d nodes after %s." % (len(nodes), dirname))
+    node_ids = {node: node_id for node_id, node in enumerate(sorted(nodes))}
+    del nodes
+
+    nodes_index = open_backend(os.path.join(dst_dir, INDEX_YAGO_NODES_DIRNAME), "leveldb")
+    write_items(nodes_index, ((INDEX_NODE_NAME_PREFIX + pack_id(node_id), node)
+                              for node, node_id in node_ids.iteritems()))
+    write_items(nodes_index, ((INDEX_NODE_ID_PREFIX + node, pack_id(node_id))
+                              for node, node_id in node_ids.iteritems()))
+    nodes_index.close()
+    logging.info("Stored %d nodes." % len(node_ids))
+
+    node_types = bytearray(len(node_ids))
+    type_counts = collections.Counter()
+    for node, node_id in node_ids.iteritems():
+        node_type = NodeType.of(node)
+        node_types[node_id] = node_type
+        type_counts[node_type] += 1
+    with open(os.path.join(dst_dir, INDEX_YAGO_NODE_TYPES_FILENAME), "wb") as fl:
+        fl.write(node_types)
+    update_index_stats(dst_dir, INDEX_YAGO_NODE_TYPES_FILENAME, {
+        "wordnet": type_counts[NodeType.WORDNET],
+        "owl": type_counts[NodeType.OWL],
+        "wiki_instance": type_counts[NodeType.WIKI_INSTANCE],
+        "wiki_category": type_counts[NodeType.WIKI_CATEGORY],
+        "yago": type_counts[NodeType.YAGO],
+    })
+    logging.info("Stored types of %d nodes." % len(node_types))
+
+    def convert(src_index, node_keys, encode):
+        for key, value in src_index.iterate():
+            if node_keys:
+                key = pack_id(node_ids[key])
+            yield key, encode(sorted([node_ids[node] for node in value.split(LDB_ARRAY_DELIM)]))
+
+    def encode_bitmap(postings):
+        return RoaringBitmap.from_sorted(postings).dumps()
+
+    for dirname, node_keys in NODE_ID_INDEXES:
+        src_index = open_backend(os.path.join(src_dir, dirname), "leveldb")
+        if bitmaps and dirname == INDEX_YAGO_CLASS_SEARCH_DIRNAME:
+            dst_dirname, encode = INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME, encode_bitmap
+        else:
+            dst_dirname, encode = dirname, encode_postings
+        dst_index = open_backend(os.path.join(dst_dir, dst_dirname), "leveldb")
+        logging.info("Converted %d records of %s." % (write_items(dst_index, convert(src_index, node_keys, encode)),
+                                                      dst_dirname))
+        src_index.close()
+        dst_index.close()
+
+    # Bit i is set if node with id i has types.
+    typed = bytearray((len(node_ids) + 7) // 8)
+    typed_count = 0
+    types_index = open_backend(os.path.join(src_dir, INDEX_YAGO_TYPES_DIRNAME), "leveldb")
+    for node in types_index.iterate(include_value=False):
+        node_id = node_ids[node]
+        typed[node_id >> 3] |= 1 << (node_id & 7)
+        typed_count += 1
+    types_index.close()
+    with open(os.path.join(dst_dir, INDEX_YAGO_TYPED_FILENAME), "wb") as fl:
+        fl.write(typed)
+    update_index_stats(dst_dir, INDEX_YAGO_TYPED_FILENAME, {"nodes": len(node_ids),
+                                                           "typed_nodes": typed_count,
+                                                           "size_bytes": len(typed)})
+    logging.info("Stored typed nodes bitset (%d of %d nodes)." % (typed_count, len(node_ids)))
+
+    if os.path.isdir(os.path.join(src_dir, INDEX_YAGO_ANCESTORS_DIRNAME)):
+        src_index = open_backend(os.path.join(src_dir, INDEX_YAGO_ANCESTORS_DIRNAME), "leveldb")
+        dst_index = open_backend(os.path.join(dst_dir, INDEX_YAGO_ANCESTORS_DIRNAME), "leveldb")
+
+        def convert_ancestors():
+            for key, value in src_index.iterate():
+                record = value.split(LDB_ARRAY_DELIM)
+                path = [node_ids[node] for node in record[1:]]
+                yield pack_id(node_ids[key]), encode_varints([int(record[0])] + path)
+
+        logging.info("Converted %d records of %s." % (write_items(dst_index, convert_ancestors()),
+                                                      INDEX_YAGO_ANCESTORS_DIRNAME))
+        src_index.close()
+        dst_index.close()
+
+    if os.path.exists(os.path.join(src_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME)):
+        # Class dict keys are labels, so the filter is the same for both formats.
+        shutil.copyfile(os.path.join(src_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME),
+                        os.path.join(dst_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME))
+        bloom_stats = read_index_stats(src_dir).get(INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME)
+        if bloom_stats is not None:
+            update_index_stats(dst_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME, bloom_stats)
+        logging.info("Copied %s." % INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME)
+
+    version = read_index_stats(src_dir).get(INDEX_VERSION_SECTION)
+    if version is not None:
+        update_index_stats(dst_dir, INDEX_VERSION_SECTION, version)
+
+    for dirname in (INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME, INDEX_YAGO_CLASS_KEYS_DIRNAME):
+        if os.path.isdir(os.path.join(src_dir, dirname)):
+            # Words, lengths and labels do not depend on node names, so records are copied as they are.
+            src_index = open_backend(os.path.join(src_dir, dirname), "leveldb")
+            dst_index = open_backend(os.path.join(dst_dir, dirname), "leveldb")
+            logging.info("Copied %d records of %s." % (write_items(dst_index, src_index.iterate()), dirname))
+            src_index.close()
+            dst_index.close()
+
+
+class IndexUpdater(object):
+    """
+    Applies delta files to the string format indexes in @index_dir. Every delta
+    line is "+" (added triple) or "-" (removed triple) followed by a tab and a
+    Yago TSV line. Only records of the affected keys are rewritten: class dict,
+    class search, taxonomy and types records of the changed triples, posting
+    lengths of the changed words, label keys of the new and removed labels and
+    ancestors of the nodes whose path to the root changed. Labels of the new
+    class dict keys are added to Bloom filter.
+
+    Label triples are applied to the node labels index (node -> its label
+    triples of all languages) first. Class dict and class search records of a
+    node are then derived from its label triples before and after the delta, so
+    a node stays in a class dict record or a word posting as long as any of its
+    remaining label triples supports it (e.g. "City"@eng when "city"@eng is
+    removed, or a German label with the same word).
+    """
+    ADD = "+"
+    REMOVE = "-"
+
+    def __init__(self, index_dir, allowed_rels, allowed_langs):
+        if os.path.exists(os.path.join(index_dir, INDEX_YAGO_NODES_DIRNAME)):
+            raise ValueError("Indexes in node id format can not be updated, update string indexes "
+                             "and convert them again.")
+        self.index_dir = index_dir
+        self.allowed_rels = allowed_rels
+        self.allowed_langs = allowed_langs
+        self.indexes = dict()
+        self.changes = dict()
+
+    def index(self, dirname):
+        if dirname not in self.indexes:
+            self.indexes[dirname] = open_backend(os.path.join(self.index_dir, dirname), "leveldb")
+        return self.indexes[dirname]
+
+    def has_index(self, dirname):
+        return os.path.isdir(os.path.join(self.index_dir, dirname))
+
+    def change(self, dirname, op, key, value):
+        added, removed = self.changes.setdefault(dirname, dict()).setdefault(key, (set(), set()))
+        if op == self.ADD:
+            removed.discard(value)
+            added.add(value)
+        else:
+            added.discard(value)
+            removed.add(value)
+
+    def read_delta(self, file_names):
+        """
+        Yields (operation, subject, relation, object) of the delta lines.
+        """
+        input_fl = fileinput.input(file_names)
+        for line in input_fl:
+            op, line = line.split(INDEX_YAGO_TSV_DELIM, 1)
+            if op != self.ADD and op != self.REMOVE:
+                logging.error("Unknown delta operation %r." % op)
+                continue
+            row = line.split(INDEX_YAGO_TSV_DELIM, 4)
+            yield op, row[1], row[2], row[3]
+        input_fl.close()
+
+    def read(self, file_names):
+        for op, subject, rel, obj in self.read_delta(file_names):
+            if rel in self.allowed_rels:
+                try:
+                    label, lang = extract_label(obj)
+                except ValueError:
+                    logging.error("Unable to extract label from '%r'." % obj)
+                    continue
+                if label is None:
+                    continue
+                self.change(INDEX_YAGO_NODE_LABELS_DIRNAME, op, subject, node_label_row(rel, label, lang))
+            elif rel == INDEX_TAXONOMY_REL or rel == INDEX_TYPE_REL:
+                if len(subject) == 0 or len(obj) == 0:
+                    continue
+                dirname = INDEX_YAGO_TAXONOMY_DIRNAME if rel == INDEX_TAXONOMY_REL else INDEX_YAGO_TYPES_DIRNAME
+                self.change(dirname, op, subject, obj)
+
+    def apply_changes(self, dirname):
+        """
+        Rewrites records of the changed keys of index @dirname. Returns dict:
+        key -> (old values, new values) of the rewritten keys.
+        """
+        changes = self.changes.get(dirname, dict())
+        if len(changes) == 0:
+            return dict()
+        index = self.index(dirname)
+        old_values = index.multi_get(changes.iterkeys())
+        rewritten = dict()
+        for key, (added, removed) in changes.iteritems():
+            old = set(old_values[key].split(LDB_ARRAY_DELIM)) if key in old_values else set()
+            new = (old - removed) | added
+            if new != old:
+                rewritten[key] = (old, new)
+        index.write((key, LDB_ARRAY_DELIM.join(sorted(new))) for key, (_, new) in rewritten.iteritems() if new)
+        index.delete(key for key, (_, new) in rewritten.iteritems() if not new)
+        logging.info("Rewrote %d records of %s." % (len(rewritten), dirname))
+        return rewritten
+
+    def label_words(self, rows):
+        """
+        Returns class dict labels and class search words of node labels index @rows.
+        """
+        labels = set()
+        words = set()
+        for row in rows:
+            _, label, lang = row.split(INDEX_YAGO_TSV_DELIM)
+            label = label.lower()
+            if lang in self.allowed_langs:
+                labels.add(label)
+            words.update(extract_parts(label))
+        return labels, words
+
+    def update_labels(self, node_labels_rewritten):
+        """
+        Adds changes of class dict and class search records of the nodes whose label triples changed.
+        """
+        for node, (old_rows, new_rows) in node_labels_rewritten.iteritems():
+            old_labels, old_words = self.label_words(old_rows)
+            new_labels, new_words = self.label_words(new_rows)
+            for dirname, old, new in ((INDEX_YAGO_CLASS_DICT_DIRNAME, old_labels, new_labels),
+                                      (INDEX_YAGO_CLASS_SEARCH_DIRNAME, old_words, new_words)):
+                for key in old - new:
+                    self.change(dirname, self.REMOVE, key, node)
+                for key in new - old:
+                    self.change(dirname, self.ADD, key, node)
+
+    def update_ancestors(self, taxonomy_rewritten):
+        """
+        Rewrites ancestors of the nodes whose first parent changed and of all their descendants.
+        """
+        changed = [node for node, (old, new) in taxonomy_rewritten.iteritems()
+                   if (min(old) if old else None) != (min(new) if new else None)]
+        if len(changed) == 0 or not self.has_index(INDEX_YAGO_ANCESTORS_DIRNAME):
+            return 0
+        parents = load_first_parents(self.index(INDEX_YAGO_TAXONOMY_DIRNAME))
+        children = collections.defaultdict(list)
+        for child, parent in parents.iteritems():
+            children[parent].append(child)
+        affected = set()
+        stack = changed
+        while len(stack) > 0:
+            node = stack.pop()
+            if node not in affected:
+                affected.add(node)
+                stack.extend(children.get(node, ()))
+        ancestors = self.index(INDEX_YAGO_ANCESTORS_DIRNAME)
+        paths = dict((node, ancestor_path(node, parents)) for node in affected if node in parents)
+        ancestors.write((node, LDB_ARRAY_DELIM.join([str(len(path))] + path)) for node, path in paths.iteritems())
+        ancestors.delete(node for node in affected if node not in parents)
+        logging.info("Rewrote ancestors of %d nodes." % len(affected))
+        return len(affected)
+
+    def update_lengths(self, search_rewritten):
+        if len(search_rewritten) == 0 or not self.has_index(INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME):
+            return
+        lengths = self.index(INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME)
+        lengths.write((word, str(len(new))) for word, (_, new) in search_rewritten.iteritems() if new)
+        lengths.delete(word for word, (_, new) in search_rewritten.iteritems() if not new)
+
+    def update_label_keys(self, class_dict_rewritten):
+        """
+        Adds keys of new labels and removes keys of labels which are no longer in class dict.
+        """
+        if len(class_dict_rewritten) == 0 or not self.has_index(INDEX_YAGO_CLASS_KEYS_DIRNAME):
+            return dict()
+        for label, (old, new) in class_dict_rewritten.iteritems():
+            if " " in label and bool(old) != bool(new):
+                self.change(INDEX_YAGO_CLASS_KEYS_DIRNAME, self.ADD if new else self.REMOVE, label_key(label), label)
+        return self.apply_changes(INDEX_YAGO_CLASS_KEYS_DIRNAME)
+
+    def update_bloom(self, class_dict_rewritten):
+        """
+        Adds new labels to Bloom filter. Removed labels stay in the filter and only cost a lookup.
+        """
+        bloom_path = os.path.join(self.index_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME)
+        new_labels = [label for label, (old, new) in class_dict_rewritten.iteritems() if new and not old]
+        if len(new_labels) == 0 or not os.path.exists(bloom_path):
+            return
+        bloom = BloomFilter.load(bloom_path)
+        for label in new_labels:
+            bloom.add(label)
+        bloom.dump(bloom_path)
+        stats = read_index_stats(self.index_dir).get(INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME, dict())
+        stats.update(bloom.stats())
+        update_index_stats(self.index_dir, INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME, stats)
+        logging.info("Added %d labels to Bloom filter (expected error rate %.5f)." % (len(new_labels),
+                                                                                       bloom.error_rate()))
+
+    def update(self, file_names):
+        """
+        Applies delta @file_names and stamps new index version, which is returned.
+        """
+        self.read(file_names)
+        if INDEX_YAGO_NODE_LABELS_DIRNAME in self.changes and not self.has_index(INDEX_YAGO_NODE_LABELS_DIRNAME):
+            raise ValueError("%s has no %s, so label changes can not be applied. Build it with "
+                             "run_index_node_labels.py." % (self.index_dir, INDEX_YAGO_NODE_LABELS_DIRNAME))
+        node_labels_rewritten = self.apply_changes(INDEX_YAGO_NODE_LABELS_DIRNAME)
+        self.update_labels(node_labels_rewritten)
+        class_dict_rewritten = self.apply_changes(INDEX_YAGO_CLASS_DICT_DIRNAME)
+        search_rewritten = self.apply_changes(INDEX_YAGO_CLASS_SEARCH_DIRNAME)
+        taxonomy_rewritten = self.apply_changes(INDEX_YAGO_TAXONOMY_DIRNAME)
+        types_rewritten = self.apply_changes(INDEX_YAGO_TYPES_DIRNAME)
+        ancestors_rewritten = self.update_ancestors(taxonomy_rewritten)
+        self.update_lengths(search_rewritten)
+        keys_rewritten = self.update_label_keys(class_dict_rewritten)
+        self.update_bloom(class_dict_rewritten)
+
+        for dirname in self.indexes.iterkeys():
+            for backend in ("mmap", "sqlite"):
+                path = index_path(self.index_dir, dirname, backend)
+                if os.path.exists(path):
+                    logging.warning("%s is out of date, compile indexes again." % path)
+
+        return stamp_index_version(self.index_dir,
+                                   deltas=list(file_names),
+                                   rewritten={
+                                       INDEX_YAGO_NODE_LABELS_DIRNAME: len(node_labels_rewritten),
+                                       INDEX_YAGO_CLASS_DICT_DIRNAME: len(class_dict_rewritten),
+                                       INDEX_YAGO_CLASS_SEARCH_DIRNAME: len(search_rewritten),
+                                       INDEX_YAGO_TAXONOMY_DIRNAME: len(taxonomy_rewritten),
+                                       INDEX_YAGO_TYPES_DIRNAME: len(types_rewritten),
+                                       INDEX_YAGO_ANCESTORS_DIRNAME: ancestors_rewritten,
+                                       INDEX_YAGO_CLASS_KEYS_DIRNAME: len(keys_rewritten),
+                                   })
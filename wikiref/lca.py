@@ -0,0 +1,57 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Subtree queries over sets of taxonomy classes.
+"""
+
+
+class LcaEngine(object):
+    """
+    Answers queries over class sets with ancestor paths of @taxonomy (node ->
+    its parents starting from the closest one) instead of building a taxonomy
+    tree for every query. Paths of all nodes of a query are read in one batch
+    (see YagoTaxonomy.ancestors_many()), a single record per node if the
+    ancestors index is available.
+    """
+
+    def __init__(self, taxonomy):
+        self.taxonomy = taxonomy
+        self.queries = 0
+
+    def paths(self, nodes):
+        """
+        Returns dict: node -> tuple of its ancestors for all @nodes.
+        """
+        return self.taxonomy.ancestors_many(set(nodes))
+
+    def subtree_counts(self, classes):
+        """
+        Returns list of (node, count) for @classes and all their ancestors, where
+        count is number of @classes in the node subtree (node itself included).
+        Nodes are listed in the order they are first met: @classes first, then
+        ancestors walking up from each class.
+        """
+        self.queries += 1
+        paths = self.paths(classes)
+        nodes = []
+        counts = dict()
+        for cl in classes:
+            if cl not in counts:
+                nodes.append(cl)
+                counts[cl] = 1
+        for cl in list(nodes):
+            for parent in paths[cl]:
+                if parent not in counts:
+                    nodes.append(parent)
+                    counts[parent] = 0
+                counts[parent] += 1
+        return [(node, counts[node]) for node in nodes]
+
+    def __repr__(self):
+        return "<LcaEngine(taxonomy=%r, queries=%d)>" % (self.taxonomy, self.queries)
@@ -12,10 +12,12 @@ import os
 import lz4
 import random
 import logging
-import leveldb
 import StringIO
 import itertools
 
+from wikiref.storage import open_backend
+
+from wikiref.settings import INDEX_BACKEND
 from wikiref.settings import MERGING_INDEX_TRIPLE_ID_DELIMITER
 from wikiref.settings import MERGING_INDEX_TRIPLE_LINE_DELIMITER
 
@@ -27,9 +29,9 @@ VISITED = set()
 class MergeIndex(object):
     MAX_CACHE_SIZE = 4096 * 256
 
-    def __init__(self, odir):
+    def __init__(self, odir, backend=INDEX_BACKEND):
         db_dir = os.path.join(odir, "merge_index")
-        self.leveldb = leveldb.LevelDB(db_dir)
+        self.backend = open_backend(db_dir, backend)
         self.cache = {}
         self.cache_size = 0
 
@@ -43,10 +45,10 @@ class MergeIndex(object):
             self.dump_cache()
 
     def dump_cache(self):
-        batch = leveldb.WriteBatch()
+        batch = []
         for pattern, triple_id_pairs in self.cache.iteritems():
             try:
-                pattern_triples = self.leveldb.Get(pattern)
+                pattern_triples = self.backend.get(pattern)
                 pattern_triples = lz4.decompress(pattern_triples)
                 pattern_triples = pattern_triples.split(MERGING_INDEX_TRIPLE_LINE_DELIMITER)
             except KeyError:
@@ -59,15 +61,15 @@ class MergeIndex(object):
             for triple_id_pair in triple_id_pairs:
                 pattern_triples.append(MERGING_INDEX_TRIPLE_ID_DELIMITER.join(triple_id_pair))
             pattern_triples_dump = MERGING_INDEX_TRIPLE_LINE_DELIMITER.join(pattern_triples)
-            batch.Put(pattern, lz4.compressHC(pattern_triples_dump))
-        self.leveldb.Write(batch)
+            batch.append((pattern, lz4.compressHC(pattern_triples_dump)))
+        self.backend.write(batch)
         logging.info("Dump %d bins." % len(self.cache))
         self.cache = {}
         self.cache_size = 0
         gc.collect()
 
     def get_bin(self, pattern):
-        pattern_triples = self.leveldb.Get(pattern)
+        pattern_triples = self.backend.get(pattern)
         pattern_triples = lz4.decompress(pattern_triples)
         pattern_triples = pattern_triples.split(MERGING_INDEX_TRIPLE_LINE_DELIMITER)
         triple_id_pairs = [line.split(MERGING_INDEX_TRIPLE_ID_DELIMITER) for line in pattern_triples]
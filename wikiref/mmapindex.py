@@ -0,0 +1,142 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Compiled read-only index format. Index is a single file with sorted keys and
+values addressed through offset tables, so lookups are binary searches over
+memory mapped pages which can be shared by any number of processes.
+
+File layout (all integers are little-endian uint64):
+
+    header:         magic, count, keys_offset, values_offset
+    key table:      count + 1 offsets of keys relative to keys_offset
+    value table:    count + 1 offsets of values relative to values_offset
+    keys:           concatenated keys in sorted order
+    values:         concatenated values in the order of keys
+"""
+
+import os
+import mmap
+import shutil
+import struct
+import logging
+import tempfile
+
+
+MAGIC = "WRIDX001"
+HEADER = struct.Struct("<8sQQQ")
+OFFSET = struct.Struct("<Q")
+OFFSET_PAIR = struct.Struct("<QQ")
+
+
+class MmapIndex(object):
+    """
+    Read-only index compiled by compile_index(). Provides the same Get() and
+    RangeIter() methods as LevelDB.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.keys_offset, self.values_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError("File %r is not a compiled index." % path)
+        self.key_table = HEADER.size
+        self.value_table = self.key_table + OFFSET.size * (self.count + 1)
+
+    def key_at(self, i):
+        start, end = OFFSET_PAIR.unpack_from(self.mm, self.key_table + OFFSET.size * i)
+        return self.mm[self.keys_offset + start:self.keys_offset + end]
+
+    def value_at(self, i):
+        start, end = OFFSET_PAIR.unpack_from(self.mm, self.value_table + OFFSET.size * i)
+        return self.mm[self.values_offset + start:self.values_offset + end]
+
+    def lower_bound(self, key, lo=0):
+        """
+        Returns position of the first key (starting from @lo) which is not less than @key.
+        """
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def Get(self, key):
+        i = self.lower_bound(key)
+        if i < self.count and self.key_at(i) == key:
+            return self.value_at(i)
+        raise KeyError(key)
+
+    def RangeIter(self, key_from=None, key_to=None, include_value=True):
+        i = 0 if key_from is None else self.lower_bound(key_from)
+        while i < self.count:
+            key = self.key_at(i)
+            if key_to is not None and key > key_to:
+                break
+            if include_value:
+                yield key, self.value_at(i)
+            else:
+                yield key
+            i += 1
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return "<MmapIndex(path=%s, count=%d)>" % (self.path, self.count)
+
+
+def compile_index(items, path, tmp_dir=None):
+    """
+    Writes iterable of (key, value) pairs into compiled index file @path.
+    Records are expected to come in sorted key order.
+    """
+    keys_fl = tempfile.TemporaryFile(prefix="wikiref_keys_", dir=tmp_dir)
+    values_fl = tempfile.TemporaryFile(prefix="wikiref_values_", dir=tmp_dir)
+    key_table_fl = tempfile.TemporaryFile(prefix="wikiref_ktable_", dir=tmp_dir)
+    value_table_fl = tempfile.TemporaryFile(prefix="wikiref_vtable_", dir=tmp_dir)
+
+    count = 0
+    keys_size = 0
+    values_size = 0
+    prev_key = None
+    key_table_fl.write(OFFSET.pack(0))
+    value_table_fl.write(OFFSET.pack(0))
+    for key, value in items:
+        if prev_key is not None and key <= prev_key:
+            raise ValueError("Keys are not sorted: %r after %r." % (key, prev_key))
+        prev_key = key
+        keys_fl.write(key)
+        values_fl.write(value)
+        keys_size += len(key)
+        values_size += len(value)
+        key_table_fl.write(OFFSET.pack(keys_size))
+        value_table_fl.write(OFFSET.pack(values_size))
+        count += 1
+
+    keys_offset = HEADER.size + 2 * OFFSET.size * (count + 1)
+    values_offset = keys_offset + keys_size
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fl:
+        fl.write(HEADER.pack(MAGIC, count, keys_offset, values_offset))
+        for part_fl in (key_table_fl, value_table_fl, keys_fl, values_fl):
+            part_fl.seek(0)
+            shutil.copyfileobj(part_fl, fl)
+            part_fl.close()
+    os.rename(tmp_path, path)
+    logging.info("Compiled %d records into %s (%d bytes)." % (count, path, values_offset + values_size))
+    return count
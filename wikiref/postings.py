@@ -0,0 +1,101 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Compact encoding of integer node ids and posting lists stored in the indexes.
+"""
+
+import bisect
+import struct
+
+
+NODE_ID_STRUCT = struct.Struct(">I")
+
+
+def pack_id(node_id):
+    """
+    Encodes node id as 4-byte big-endian string, so that sorted keys keep id order.
+    """
+    return NODE_ID_STRUCT.pack(node_id)
+
+
+def unpack_id(data):
+    return NODE_ID_STRUCT.unpack(data)[0]
+
+
+def encode_varints(numbers):
+    """
+    Encodes list of non-negative integers using 7 bits per byte, the high bit of
+    each byte tells whether the number continues in the next byte.
+    """
+    buf = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            buf.append((number & 0x7F) | 0x80)
+            number >>= 7
+        buf.append(number)
+    return str(buf)
+
+
+def decode_varints(data):
+    numbers = []
+    number = 0
+    shift = 0
+    for byte in bytearray(data):
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = 0
+            shift = 0
+    return numbers
+
+
+def encode_postings(node_ids):
+    """
+    Encodes sorted list of node ids as varint deltas.
+    """
+    deltas = []
+    prev_id = 0
+    for node_id in node_ids:
+        deltas.append(node_id - prev_id)
+        prev_id = node_id
+    return encode_varints(deltas)
+
+
+def decode_postings(data):
+    node_ids = decode_varints(data)
+    for i in xrange(1, len(node_ids)):
+        node_ids[i] += node_ids[i - 1]
+    return node_ids
+
+
+def intersect_sorted(postings_1, postings_2):
+    """
+    Intersects two sorted posting lists. Every item of the shorter list is
+    searched in the longer one by galloping (exponential probes followed by
+    binary search) from the position of the previous match, so the cost
+    depends mostly on the length of the shorter list.
+    """
+    if len(postings_1) > len(postings_2):
+        postings_1, postings_2 = postings_2, postings_1
+    conjunction = []
+    lo = 0
+    size = len(postings_2)
+    for item in postings_1:
+        bound = 1
+        while lo + bound < size and postings_2[lo + bound] < item:
+            bound *= 2
+        lo = bisect.bisect_left(postings_2, item, lo + bound // 2, min(lo + bound + 1, size))
+        if lo >= size:
+            break
+        if postings_2[lo] == item:
+            conjunction.append(item)
+            lo += 1
+    return conjunction
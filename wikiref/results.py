@@ -0,0 +1,128 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Persistent cache of disambiguation results.
+"""
+
+import sqlite3
+import logging
+
+from wikiref.settings import CSV_NODE_NODE_DELIMITER
+from wikiref.settings import CSV_NODE_SCORE_DELIMITER
+from wikiref.settings import RESULT_CACHE_SIZE
+from wikiref.settings import RESULT_CACHE_COMMIT_SIZE
+
+
+def encode_nodes(nodes):
+    return CSV_NODE_NODE_DELIMITER.join([CSV_NODE_SCORE_DELIMITER.join((node, repr(score)))
+                                         for node, score in nodes])
+
+
+def decode_nodes(value):
+    nodes = []
+    for node_score in value.split(CSV_NODE_NODE_DELIMITER):
+        if len(node_score):
+            node, score = node_score.split(CSV_NODE_SCORE_DELIMITER)
+            nodes.append((node, float(score)))
+    return nodes
+
+
+class ResultCache(object):
+    """
+    Stores [(node, score)] results of lemma keys in a sqlite file. Results are
+    keyed by lemma key and index @version, so results computed with other
+    indexes are never returned. Entries are read on demand. When the cache has
+    more than @max_size entries, the least recently used ones are evicted.
+    Changes are committed every @commit_size updates and on close().
+    """
+
+    def __init__(self, path, version, max_size=RESULT_CACHE_SIZE, commit_size=RESULT_CACHE_COMMIT_SIZE):
+        self.path = path
+        self.version = version
+        self.max_size = max_size
+        self.commit_size = commit_size
+        self.connection = sqlite3.connect(path)
+        self.connection.text_factory = str
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                "(version TEXT, key BLOB, value BLOB, used INTEGER, PRIMARY KEY (version, key))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self.clock = self.connection.execute("SELECT MAX(used) FROM results").fetchone()[0] or 0
+        self.used = dict()
+        self.updates = 0
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns cached [(node, score)] of @key or None.
+        """
+        row = self.connection.execute("SELECT value FROM results WHERE version = ? AND key = ?",
+                                      (self.version, buffer(key))).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.clock += 1
+        self.used[key] = self.clock
+        self.updated()
+        return decode_nodes(str(row[0]))
+
+    def put(self, key, nodes):
+        self.clock += 1
+        self.used.pop(key, None)
+        self.connection.execute("INSERT OR REPLACE INTO results (version, key, value, used) VALUES (?, ?, ?, ?)",
+                                (self.version, buffer(key), buffer(encode_nodes(nodes)), self.clock))
+        self.puts += 1
+        self.updated()
+
+    def updated(self):
+        self.updates += 1
+        if self.updates >= self.commit_size:
+            self.commit()
+
+    def commit(self):
+        if len(self.used) > 0:
+            self.connection.executemany("UPDATE results SET used = ? WHERE version = ? AND key = ?",
+                                        ((used, self.version, buffer(key)) for key, used in self.used.iteritems()))
+            self.used = dict()
+        size = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if size > self.max_size:
+            self.connection.execute("DELETE FROM results WHERE rowid IN "
+                                    "(SELECT rowid FROM results ORDER BY used LIMIT ?)", (size - self.max_size,))
+            self.evictions += size - self.max_size
+        self.connection.commit()
+        self.updates = 0
+
+    def import_tsv(self, path):
+        """
+        Imports results from TSV file of <id> <lemma key> <node score;node score;...> lines
+        (the first result of a lemma key is kept). Returns number of imported results.
+        """
+        imported = set()
+        with open(path, "rb") as fl:
+            for line in fl:
+                row = line.rstrip("\n").split("\t")
+                nodes = [node_score.split(" ") for node_score in row[2].split(";") if len(node_score)]
+                if len(nodes) == 0 or row[1] in imported:
+                    continue
+                self.put(row[1], [(node, float(score)) for node, score in nodes])
+                imported.add(row[1])
+        self.commit()
+        logging.info("Imported %d results from %s." % (len(imported), path))
+        return len(imported)
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __repr__(self):
+        return "<ResultCache(path=%s, version=%s, hits=%d, misses=%d, puts=%d, evictions=%d)>" % (
+            self.path, self.version, self.hits, self.misses, self.puts, self.evictions)
@@ -33,6 +33,21 @@ class NodeType(object):
     WIKI_CATEGORY   = 0x04
     YAGO            = 0x05
 
+    @staticmethod
+    def of(node):
+        """
+        Returns type of @node name, using the same prefixes as SemanticNodeSet predicates.
+        """
+        if node.startswith("<wordnet_"):
+            return NodeType.WORDNET
+        if node.startswith("owl:"):
+            return NodeType.OWL
+        if node.startswith("<yago"):
+            return NodeType.YAGO
+        if node.startswith("<wikicategory"):
+            return NodeType.WIKI_CATEGORY
+        return NodeType.WIKI_INSTANCE
+
 
 class ConceptRelation(object):
     RELATED         = 0x01
@@ -63,11 +78,10 @@ class SemanticTerm(object):
         return repr_str.encode("utf-8")
 
 
-class SemanticNodeSet(object):
-
-    def __init__(self, lemmas, nodes):
-        self.lemmas = lemmas
-        self.nodes = [n for n in nodes if n != "owl:Thing"]
+class NodeNameClassifier(object):
+    """
+    Classifies nodes by their names.
+    """
 
     @staticmethod
     def is_instance(node):
@@ -86,7 +100,7 @@ class SemanticNodeSet(object):
         # if node.startswith("<wordnet"):
         #     return True
         # return False
-        return not SemanticNodeSet.is_instance(node)
+        return not NodeNameClassifier.is_instance(node)
 
     @staticmethod
     def is_wclass_or_instance(node):
@@ -98,72 +112,130 @@ class SemanticNodeSet(object):
             return False
         return True
 
+
+class NodeTypeClassifier(object):
+    """
+    Classifies integer node ids by @node_types table, which stores NodeType of
+    every node id in one byte (see run_index_node_ids.py), so node names are not read.
+    """
+
+    def __init__(self, node_types):
+        self.node_types = node_types
+
+    def is_instance(self, node_id):
+        return self.node_types[node_id] == NodeType.WIKI_INSTANCE
+
+    def is_wclass(self, node_id):
+        return self.node_types[node_id] != NodeType.WIKI_INSTANCE
+
+    def is_wclass_or_instance(self, node_id):
+        node_type = self.node_types[node_id]
+        return node_type == NodeType.WIKI_INSTANCE or node_type == NodeType.WORDNET
+
+
+NAME_CLASSIFIER = NodeNameClassifier()
+
+
+class SemanticNodeSet(object):
+    """
+    Nodes found for @lemmas. Nodes are names, or integer ids if @node_dict is
+    given. They are classified by @classifier, which should be NodeTypeClassifier
+    of the node dictionary for ids.
+    """
+
+    def __init__(self, lemmas, nodes, node_dict=None, classifier=NAME_CLASSIFIER):
+        self.lemmas = lemmas
+        self.node_dict = node_dict
+        self.classifier = classifier
+        if node_dict is None:
+            self.nodes = [n for n in nodes if n != "owl:Thing"]
+        else:
+            self.nodes = [n for n in nodes if n != node_dict.thing_id]
+
+    # Name based predicates, nodes of the set are classified by self.classifier.
+    is_instance = staticmethod(NodeNameClassifier.is_instance)
+    is_wclass = staticmethod(NodeNameClassifier.is_wclass)
+    is_wclass_or_instance = staticmethod(NodeNameClassifier.is_wclass_or_instance)
+
+    def names(self):
+        """
+        Returns list of node names, resolving node ids if needed.
+        """
+        if self.node_dict is None:
+            return list(self.nodes)
+        return self.node_dict.get_names(self.nodes)
+
     def __repr__(self):
         return "<SemanticNodeSet(lemmas=[%s], instances=%d, classes=%d, nodes=[%s])>" % (
             " ".join(self.lemmas),
             self.instance_count(),
             self.class_count(),
-            ", ".join(self.nodes),
+            ", ".join(self.names()),
         )
 
     def instances(self):
-        return filter(self.is_instance, self.nodes)
+        return filter(self.classifier.is_instance, self.nodes)
 
     def wclasses(self):
-        return filter(self.is_wclass, self.nodes)
+        return filter(self.classifier.is_wclass, self.nodes)
 
     def pretty(self):
         string = stringio.StringIO()
         string.write("\nSemanticNodeSet:\n\n")
         utf8_lemmas = map(lambda s: s.decode("utf-8"), self.lemmas)
         string.write("lemmas: [%s] \n\n" % " ".join(utf8_lemmas))
-        for node in self.nodes:
+        for node in self.names():
             string.write("\t + node: %s\n" % node)
         string.write("\n")
         return string.getvalue()
 
     def as_wclasses(self):
-        return SemanticNodeSet(self.lemmas, filter(self.is_class, self.nodes))
+        return SemanticNodeSet(self.lemmas, filter(self.is_class, self.nodes), self.node_dict, self.classifier)
 
     def as_instances():
-        return SemanticNodeSet(self.lemmas, filter(self.is_instance, self.nodes))
+        return SemanticNodeSet(self.lemmas, filter(self.classifier.is_instance, self.nodes), self.node_dict,
+                               self.classifier)
 
     def classes_len(self):
         return len(filter(self.is_class, self.nodes))
 
     def generalize(self, types, taxonomy, levels=1):
+        instances = types.filter_typed(filter(self.classifier.is_instance, self.nodes))
+        instance_types = types.get_many(instances)
         instance_nodes = set()
-        for node in self.nodes:
-            if self.is_instance(node):
-                instance_nodes.update(types[node])
-        if levels > 1 or len(filter(self.is_wclass, instance_nodes)) == 0:
+        for node in instances:
+            instance_nodes.update(instance_types[node])
+        if levels > 1 or len(filter(self.classifier.is_wclass, instance_nodes)) == 0:
             if levels == 1:
                 levels += 1
             prev_classes = instance_nodes
 
+            # Level i parents of the instance classes are i'th items of their ancestor paths.
+            ancestors = taxonomy.ancestors_many(instance_nodes)
+            paths = [ancestors[node] for node in instance_nodes]
+            level = 0
+
             while levels > 1 and len(prev_classes) > 0:
-                new_classes = []
-                for node in prev_classes:
-                    parent = taxonomy[node]
-                    if parent is not None:
-                        new_classes.append(parent)
+                new_classes = [path[level] for path in paths if len(path) > level]
+                level += 1
 
                 instance_nodes.update(new_classes)
                 prev_classes = new_classes
 
                 for cl in prev_classes:
-                    if self.is_wclass(cl):
+                    if self.classifier.is_wclass(cl):
                         levels -= 1
                         break
 
         # print list(filter(self.is_wclass, instance_nodes))
-        return SemanticNodeSet(self.lemmas, filter(self.is_wclass, instance_nodes))
+        return SemanticNodeSet(self.lemmas, filter(self.classifier.is_wclass, instance_nodes), self.node_dict,
+                               self.classifier)
 
     def class_count(self):
-        return len(filter(self.is_wclass, self.nodes))
+        return len(filter(self.classifier.is_wclass, self.nodes))
 
     def instance_count(self):
-        return len(filter(self.is_instance, self.nodes))
+        return len(filter(self.classifier.is_instance, self.nodes))
 
     def size(self):
         return  len(self.nodes)
@@ -172,10 +244,7 @@ class SemanticNodeSet(object):
         if len(self.nodes) == 0:
             return True
         if self.class_count() == 0 and self.instance_count() > 0:
-            for instance in filter(self.is_instance, self.nodes):
-                if len(yago_types[instance]):
-                    return False
-            return True
+            return len(yago_types.filter_typed(filter(self.classifier.is_instance, self.nodes))) == 0
         return False
 
     def __len__(self):
@@ -25,11 +25,48 @@ INDEX_YAGO_CLASS_DICT_DIRNAME   = "yago_class_dict.ldb"
 INDEX_YAGO_CLASS_SEARCH_DIRNAME = "yago_class_search.ldb"
 INDEX_YAGO_TAXONOMY_DIRNAME     = "yago_taxonomy.ldb"
 INDEX_YAGO_TYPES_DIRNAME        = "yago_types.ldb"
+INDEX_YAGO_ANCESTORS_DIRNAME    = "yago_ancestors.ldb"
+INDEX_YAGO_NODES_DIRNAME        = "yago_nodes.ldb"
+INDEX_YAGO_CLASS_SEARCH_LENGTHS_DIRNAME = "yago_class_search_lengths.ldb"
+INDEX_YAGO_CLASS_SEARCH_BITMAPS_DIRNAME = "yago_class_search_bitmaps.ldb"
+INDEX_YAGO_CLASS_KEYS_DIRNAME   = "yago_class_keys.ldb"
+INDEX_YAGO_NODE_LABELS_DIRNAME  = "yago_node_labels.ldb"
+INDEX_YAGO_CLASS_DICT_BLOOM_FILENAME = "yago_class_dict.bloom"
+INDEX_YAGO_TYPED_FILENAME       = "yago_typed.bitset"
+INDEX_YAGO_NODE_TYPES_FILENAME  = "yago_node_types.bin"
+INDEX_STATS_FILENAME            = "index_stats.json"
+INDEX_COMPILED_EXT              = ".idx"
+INDEX_SHARDS_FILENAME           = "SHARDS"
+INDEX_SHARD_DIRNAME             = "shard-%03d.ldb"
+INDEX_COMPRESSION_FILENAME      = "COMPRESSION"
+
+INDEX_BACKEND                   = "auto"
+INDEX_BACKEND_EXTS              = {
+    "leveldb":  ".ldb",
+    "mmap":     INDEX_COMPILED_EXT,
+    "sqlite":   ".sqlite",
+}
+
+INDEX_NODE_ID_PREFIX            = "n"
+INDEX_NODE_NAME_PREFIX          = "i"
 
 INDEX_TAXONOMY_REL              = "rdfs:subClassOf"
 INDEX_CLASS_REL                 = "rdfs:label"
 INDEX_TYPE_REL                  = "rdf:type"
 
+INDEX_LOOKUP_CACHE_SIZE         = 1 << 18
+INDEX_BLOOM_ERROR_RATE          = 0.01
+INDEX_COMPRESSION_THRESHOLD     = 1024
+INDEX_LARGE_VALUE_CACHE_SIZE    = 1024
+INDEX_LABEL_TOKENIZER           = "fast"
+INDEX_TOKENIZER_MEMO_SIZE       = 1 << 16
+INDEX_MAX_CACHE_SIZE            = 100000 * 128
+
+RESULT_CACHE_SIZE               = 1 << 22
+RESULT_CACHE_COMMIT_SIZE        = 10000
+
+DISAMBIGUATION_BATCH_SIZE       = 1000
+
 
 MERGING_INDEX_TRIPLE_ID_DELIMITER   = chr(243)
 MERGING_INDEX_TRIPLE_LINE_DELIMITER = chr(242)
@@ -0,0 +1,447 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Key-value storage backends used by the indexes. Every backend provides:
+
+    get(key)            value of @key, raises KeyError if key not found;
+    multi_get(keys)     dict: key -> value for all found @keys;
+    iterate(key_from=None, key_to=None, include_value=True)
+                        (key, value) pairs (or just keys) in sorted key order,
+                        @key_from and @key_to are inclusive;
+    close()             releases the storage.
+
+Writable backends (READ_ONLY is False) also provide:
+
+    write(items)        puts iterable of (key, value) pairs into storage;
+    delete(keys)        removes @keys from storage, missing keys are ignored.
+
+StorageBackend implements multi_get() with get() and an empty close().
+
+LevelDB indexes with INDEX_COMPRESSION_FILENAME store values with a flag byte,
+values above the threshold are compressed with lz4 (see CompressedBackend).
+"""
+
+import os
+import zlib
+import heapq
+import bisect
+import sqlite3
+import leveldb
+
+try:
+    import lz4
+except ImportError:
+    lz4 = None
+
+from wikiref.mmapindex import MmapIndex
+
+from wikiref.settings import INDEX_BACKEND
+from wikiref.settings import INDEX_BACKEND_EXTS
+from wikiref.settings import INDEX_SHARDS_FILENAME
+from wikiref.settings import INDEX_SHARD_DIRNAME
+from wikiref.settings import INDEX_COMPRESSION_FILENAME
+
+
+VALUE_RAW = "\x00"
+VALUE_LZ4 = "\x01"
+
+
+def shard_index(key, shards):
+    """
+    Returns number of the shard which stores @key.
+    """
+    return (zlib.crc32(key) & 0xFFFFFFFF) % shards
+
+
+def pack_value(value, threshold):
+    """
+    Returns @value with the flag byte, compressed if it is at least @threshold
+    bytes long and compression makes it smaller.
+    """
+    if len(value) >= threshold:
+        compressed = lz4.compressHC(value)
+        if len(compressed) + 1 < len(value):
+            return VALUE_LZ4 + compressed
+    return VALUE_RAW + value
+
+
+def unpack_value(value):
+    if value[0] == VALUE_LZ4:
+        return lz4.decompress(buffer(value, 1))
+    return value[1:]
+
+
+def read_compression(path):
+    """
+    Returns (codec, threshold) of the compressed index at @path or None.
+    """
+    compression_path = os.path.join(path, INDEX_COMPRESSION_FILENAME)
+    if not os.path.exists(compression_path):
+        return None
+    with open(compression_path, "rb") as fl:
+        codec, threshold = fl.read().split()
+    return codec, int(threshold)
+
+
+class StorageBackend(object):
+    """
+    Base of the storage backends, see the module docstring for the methods they provide.
+    """
+    READ_ONLY = False
+
+    def multi_get(self, keys):
+        """
+        Returns dict: key -> value for all found @keys, looking them up one by one.
+        """
+        values = dict()
+        for key in sorted(set(keys)):
+            try:
+                values[key] = self.get(key)
+            except KeyError:
+                pass
+        return values
+
+    def close(self):
+        pass
+
+
+class LevelDBBackend(StorageBackend):
+    # Sorted keys which are at most this number of records apart are read by
+    # moving the same iterator forward instead of seeking to each of them.
+    SCAN_DISTANCE = 16
+
+    def __init__(self, path):
+        self.path = path
+        self.ldb = leveldb.LevelDB(path)
+
+    def get(self, key):
+        return self.ldb.Get(key)
+
+    def multi_get(self, keys):
+        values = dict()
+        records = None
+        current = None
+        for key in sorted(set(keys)):
+            if records is not None and current is None:
+                # Iterator is exhausted, so the rest of keys are not in the index.
+                break
+            skipped = 0
+            while current is not None and current[0] < key and skipped < self.SCAN_DISTANCE:
+                current = next(records, None)
+                skipped += 1
+            if current is None or current[0] < key:
+                records = self.ldb.RangeIter(key_from=key)
+                current = next(records, None)
+            if current is not None and current[0] == key:
+                values[key] = current[1]
+        return values
+
+    def iterate(self, key_from=None, key_to=None, include_value=True):
+        return self.ldb.RangeIter(key_from=key_from, key_to=key_to, include_value=include_value)
+
+    def write(self, items):
+        batch = leveldb.WriteBatch()
+        for key, value in items:
+            batch.Put(key, value)
+        self.ldb.Write(batch)
+
+    def delete(self, keys):
+        batch = leveldb.WriteBatch()
+        for key in keys:
+            batch.Delete(key)
+        self.ldb.Write(batch)
+
+    def close(self):
+        # LevelDB releases its lock when the last reference to the handle is dropped.
+        self.ldb = None
+
+    def __repr__(self):
+        return "<LevelDBBackend(path=%s)>" % self.path
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Keeps all records in a dict. If @source backend is given, its records are loaded into memory.
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.data = dict()
+        self.sorted_keys = None
+        if source is not None:
+            self.data.update(source.iterate())
+
+    def get(self, key):
+        return self.data[key]
+
+    def iterate(self, key_from=None, key_to=None, include_value=True):
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self.data.iterkeys())
+        i = 0 if key_from is None else bisect.bisect_left(self.sorted_keys, key_from)
+        while i < len(self.sorted_keys):
+            key = self.sorted_keys[i]
+            if key_to is not None and key > key_to:
+                break
+            yield (key, self.data[key]) if include_value else key
+            i += 1
+
+    def write(self, items):
+        self.data.update(items)
+        self.sorted_keys = None
+
+    def delete(self, keys):
+        for key in keys:
+            self.data.pop(key, None)
+        self.sorted_keys = None
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+
+    def __repr__(self):
+        return "<MemoryBackend(source=%r, size=%d)>" % (self.source, len(self.data))
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Stores records in a single sqlite file.
+    """
+    MAX_VARIABLES = 500
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.text_factory = str
+        self.connection.execute("CREATE TABLE IF NOT EXISTS kv (key BLOB PRIMARY KEY, value BLOB)")
+
+    def get(self, key):
+        row = self.connection.execute("SELECT value FROM kv WHERE key = ?", (buffer(key),)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return str(row[0])
+
+    def multi_get(self, keys):
+        keys = sorted(set(keys))
+        values = dict()
+        for i in xrange(0, len(keys), self.MAX_VARIABLES):
+            chunk = [buffer(key) for key in keys[i:i + self.MAX_VARIABLES]]
+            query = "SELECT key, value FROM kv WHERE key IN (%s)" % ",".join(["?"] * len(chunk))
+            for key, value in self.connection.execute(query, chunk):
+                values[str(key)] = str(value)
+        return values
+
+    def iterate(self, key_from=None, key_to=None, include_value=True):
+        conditions = []
+        params = []
+        if key_from is not None:
+            conditions.append("key >= ?")
+            params.append(buffer(key_from))
+        if key_to is not None:
+            conditions.append("key <= ?")
+            params.append(buffer(key_to))
+        query = "SELECT key, value FROM kv"
+        if len(conditions) > 0:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY key"
+        for key, value in self.connection.execute(query, params):
+            yield (str(key), str(value)) if include_value else str(key)
+
+    def write(self, items):
+        self.connection.executemany("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                                    ((buffer(key), buffer(value)) for key, value in items))
+        self.connection.commit()
+
+    def delete(self, keys):
+        self.connection.executemany("DELETE FROM kv WHERE key = ?", ((buffer(key),) for key in keys))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __repr__(self):
+        return "<SqliteBackend(path=%s)>" % self.path
+
+
+class MmapBackend(StorageBackend):
+    """
+    Read-only compiled index, see wikiref.mmapindex.
+    """
+    READ_ONLY = True
+
+    def __init__(self, path):
+        self.path = path
+        self.index = MmapIndex(path)
+
+    def get(self, key):
+        return self.index.Get(key)
+
+    def multi_get(self, keys):
+        values = dict()
+        lo = 0
+        for key in sorted(set(keys)):
+            lo = self.index.lower_bound(key, lo)
+            if lo >= self.index.count:
+                break
+            if self.index.key_at(lo) == key:
+                values[key] = self.index.value_at(lo)
+        return values
+
+    def iterate(self, key_from=None, key_to=None, include_value=True):
+        return self.index.RangeIter(key_from=key_from, key_to=key_to, include_value=include_value)
+
+    def close(self):
+        self.index.close()
+
+    def __repr__(self):
+        return "<MmapBackend(path=%s, count=%d)>" % (self.path, self.index.count)
+
+
+class ShardedBackend(StorageBackend):
+    """
+    LevelDB index split into shards by key hash (see shard_index()). Directory
+    @path contains INDEX_SHARDS_FILENAME with the number of shards and shard
+    LevelDBs named by INDEX_SHARD_DIRNAME.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_SHARDS_FILENAME), "rb") as fl:
+            shards = int(fl.read())
+        self.shards = [LevelDBBackend(os.path.join(path, INDEX_SHARD_DIRNAME % shard)) for shard in xrange(shards)]
+
+    def get(self, key):
+        return self.shards[shard_index(key, len(self.shards))].get(key)
+
+    def multi_get(self, keys):
+        shard_keys = [[] for _ in self.shards]
+        for key in keys:
+            shard_keys[shard_index(key, len(self.shards))].append(key)
+        values = dict()
+        for shard, keys in zip(self.shards, shard_keys):
+            if len(keys) > 0:
+                values.update(shard.multi_get(keys))
+        return values
+
+    def iterate(self, key_from=None, key_to=None, include_value=True):
+        return heapq.merge(*[shard.iterate(key_from=key_from, key_to=key_to, include_value=include_value)
+                             for shard in self.shards])
+
+    def write(self, items):
+        shard_items = [[] for _ in self.shards]
+        for key, value in items:
+            shard_items[shard_index(key, len(self.shards))].append((key, value))
+        for shard, items in zip(self.shards, shard_items):
+            shard.write(items)
+
+    def delete(self, keys):
+        shard_keys = [[] for _ in self.shards]
+        for key in keys:
+            shard_keys[shard_index(key, len(self.shards))].append(key)
+        for shard, keys in zip(self.shards, shard_keys):
+            shard.delete(keys)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+    def __repr__(self):
+        return "<ShardedBackend(path=%s, shards=%d)>" % (self.path, len(self.shards))
+
+
+class CompressedBackend(StorageBackend):
+    """
+    Wraps @backend which stores values packed with pack_value(). Values are
+    unpacked on read and packed on write.
+    """
+
+    def __init__(self, backend, threshold):
+        if lz4 is None:
+            raise ImportError("lz4 is required to read compressed index %s." % backend.path)
+        self.backend = backend
+        self.path = backend.path
+        self.threshold = threshold
+
+    def get(self, key):
+        return unpack_value(self.backend.get(key))
+
+    def multi_get(self, keys):
+        return dict((key, unpack_value(value)) for key, value in self.backend.multi_get(keys).iteritems())
+
+    def iterate(self, key_from=None, key_to=None, include_value=True):
+        records = self.backend.iterate(key_from=key_from, key_to=key_to, include_value=include_value)
+        if not include_value:
+            return records
+        return ((key, unpack_value(value)) for key, value in records)
+
+    def write(self, items):
+        self.backend.write((key, pack_value(value, self.threshold)) for key, value in items)
+
+    def delete(self, keys):
+        self.backend.delete(keys)
+
+    def close(self):
+        self.backend.close()
+
+    def __repr__(self):
+        return "<CompressedBackend(threshold=%d, backend=%r)>" % (self.threshold, self.backend)
+
+
+BACKENDS = {
+    "leveldb": LevelDBBackend,
+    "sqlite": SqliteBackend,
+    "mmap": MmapBackend,
+}
+
+
+def detect_backend(path):
+    for name, ext in INDEX_BACKEND_EXTS.iteritems():
+        if path.endswith(ext) and os.path.exists(path):
+            return name
+    return "leveldb"
+
+
+def index_path(index_dir, dirname, backend=INDEX_BACKEND):
+    """
+    Returns path to index @dirname (e.g. yago_types.ldb) in @index_dir stored
+    with @backend. For "auto" (and "memory", which loads index from disk) the
+    first existing of compiled, sqlite and LevelDB versions is used.
+    """
+    base_name = os.path.splitext(dirname)[0]
+    if backend in INDEX_BACKEND_EXTS:
+        return os.path.join(index_dir, base_name + INDEX_BACKEND_EXTS[backend])
+    for name in ("mmap", "sqlite"):
+        path = os.path.join(index_dir, base_name + INDEX_BACKEND_EXTS[name])
+        if os.path.exists(path):
+            return path
+    return os.path.join(index_dir, dirname)
+
+
+def open_backend(path, backend=INDEX_BACKEND):
+    """
+    Opens storage at @path. Backend is one of "auto", "leveldb", "sqlite",
+    "mmap" or "memory"; "auto" detects backend by path extension. Sharded
+    LevelDB indexes are detected by INDEX_SHARDS_FILENAME and compressed ones
+    by INDEX_COMPRESSION_FILENAME.
+    """
+    if backend == "memory":
+        return MemoryBackend(open_backend(path))
+    if backend == "auto":
+        backend = detect_backend(path)
+    if backend not in BACKENDS:
+        raise ValueError("Unknown storage backend %r." % backend)
+    if backend != "leveldb":
+        return BACKENDS[backend](path)
+    if os.path.exists(os.path.join(path, INDEX_SHARDS_FILENAME)):
+        storage = ShardedBackend(path)
+    else:
+        storage = LevelDBBackend(path)
+    compression = read_compression(path)
+    if compression is not None:
+        return CompressedBackend(storage, compression[1])
+    return storage
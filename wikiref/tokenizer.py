@@ -0,0 +1,109 @@
+# coding: utf-8
+
+# Copyright (C) USC Information Sciences Institute
+# Author: Vladimir M. Zaytsev <zaytsev@usc.edu>
+# URL: <http://nlg.isi.edu/>
+# For more information, see README.md
+# For license information, see LICENSE
+
+"""
+Tokenizers which split labels into class search words.
+
+FastTokenizer produces the same tokens as NLTK PunktWordTokenizer without
+importing NLTK: labels made of word characters and spaces (most of Yago
+labels) are split on spaces, other labels are matched with the word regex of
+PunktLanguageVars. Use scripts/run_verify_tokenizer.py to check it against
+Punkt on a label set, tests/test_tokenizer.py keeps Punkt output of typical
+labels.
+"""
+
+import re
+
+from wikiref.cache import LookupCache
+
+
+# Word tokenizer regex of nltk.tokenize.punkt.PunktLanguageVars.
+RE_PUNKT_WORD_START = r"[^\(\"\`{\[:;&\#\*@\)}\]\-,]"
+RE_PUNKT_NON_WORD_CHARS = r"(?:[?!)\";}\]\*:@\'\({\[])"
+RE_PUNKT_MULTI_CHAR_PUNCT = r"(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)"
+RE_PUNKT_WORD_TOKENIZE_FMT = r"""(
+    %(MultiChar)s
+    |
+    (?=%(WordStart)s)\S+?
+    (?=
+        \s|
+        $|
+        %(NonWord)s|%(MultiChar)s|
+        ,(?=$|\s|%(NonWord)s|%(MultiChar)s)
+    )
+    |
+    \S
+)"""
+RE_PUNKT_WORD = re.compile(RE_PUNKT_WORD_TOKENIZE_FMT % {
+    "NonWord": RE_PUNKT_NON_WORD_CHARS,
+    "MultiChar": RE_PUNKT_MULTI_CHAR_PUNCT,
+    "WordStart": RE_PUNKT_WORD_START,
+}, re.UNICODE | re.VERBOSE)
+
+# Labels which Punkt splits exactly on spaces.
+RE_SIMPLE_LABEL = re.compile(r"[\w ]*\Z", re.UNICODE)
+RE_SIMPLE_ASCII_LABEL = re.compile(r"[\w ]*\Z")
+
+
+class FastTokenizer(object):
+
+    def tokenize(self, text):
+        if RE_SIMPLE_LABEL.match(text) is not None:
+            return text.split()
+        return RE_PUNKT_WORD.findall(text)
+
+
+class PunktTokenizer(object):
+    """
+    Compatibility tokenizer which uses NLTK PunktWordTokenizer (NLTK < 3.0).
+    """
+
+    def __init__(self):
+        from nltk.tokenize.punkt import PunktWordTokenizer
+        self.tokenizer = PunktWordTokenizer()
+
+    def tokenize(self, text):
+        return self.tokenizer.tokenize(text)
+
+
+TOKENIZERS = {
+    "fast": FastTokenizer,
+    "punkt": PunktTokenizer,
+}
+
+
+class LabelTokenizer(object):
+    """
+    Splits utf-8 labels into lowercased utf-8 parts with @name tokenizer.
+    Results of up to @memo_size recently used labels are memoized.
+    """
+
+    def __init__(self, name="fast", memo_size=0):
+        if name not in TOKENIZERS:
+            raise ValueError("Unknown tokenizer '%s', expected one of: %s." % (name, ", ".join(sorted(TOKENIZERS))))
+        self.name = name
+        self.tokenizer = TOKENIZERS[name]()
+        self.memo = LookupCache(memo_size)
+
+    def tokenize(self, label_str):
+        if self.name == "fast" and RE_SIMPLE_ASCII_LABEL.match(label_str) is not None:
+            return label_str.lower().split()
+        label_str = label_str.decode("utf-8").lower()
+        parts = self.tokenizer.tokenize(label_str)
+        return [p.encode("utf-8") for p in parts if len(p)]
+
+    def extract_parts(self, label_str):
+        parts = self.memo.get(label_str)
+        if parts is not None:
+            return list(parts)
+        parts = self.tokenize(label_str)
+        self.memo.put(label_str, tuple(parts))
+        return parts
+
+    def __repr__(self):
+        return "<LabelTokenizer(name=%s, memo=%r)>" % (self.name, self.memo)
@@ -11,18 +11,33 @@ import leveldb
 import logging
 
 from wikiref.settings import LDB_ARRAY_DELIM
+from wikiref.settings import INDEX_LABEL_TOKENIZER
+from wikiref.settings import INDEX_TOKENIZER_MEMO_SIZE
 
-from nltk.tokenize.punkt import PunktWordTokenizer
+from wikiref.tokenizer import LabelTokenizer
 
 RE_WORDSPLIT = re.compile("\W", re.UNICODE)
 LABEL_LANG_RE = re.compile("\"(.+)\"@(.+)")
-TOKENIZER = PunktWordTokenizer()
+TOKENIZER = LabelTokenizer(INDEX_LABEL_TOKENIZER, memo_size=INDEX_TOKENIZER_MEMO_SIZE)
+
+
+def set_tokenizer(name):
+    """
+    Selects tokenizer used by extract_parts, see wikiref.tokenizer.TOKENIZERS.
+    """
+    global TOKENIZER
+    TOKENIZER = LabelTokenizer(name, memo_size=INDEX_TOKENIZER_MEMO_SIZE)
 
 
 def extract_parts(label_str):
-    label_str = label_str.decode("utf-8").lower()
-    parts = TOKENIZER.tokenize(label_str)
-    return [p.encode("utf-8") for p in parts if len(p)]
+    return TOKENIZER.extract_parts(label_str)
+
+
+def label_key(label):
+    """
+    Returns order-insensitive key of @label: its space separated words in sorted order.
+    """
+    return " ".join(sorted(label.split(" ")))
 
 
 def extract_label(label_str):
@@ -7,25 +7,288 @@
 # For license information, see LICENSE
 
 import pickle
-import leveldb
+import itertools
 
 
+from wikiref.bloom import BloomFilter
+from wikiref.cache import LookupCache
+from wikiref.bitmap import RoaringBitmap
+from wikiref.semadata import NAME_CLASSIFIER
+from wikiref.semadata import NodeTypeClassifier
 from wikiref.semadata import SemanticNodeSet
+from wikiref.util import label_key
+from wikiref.storage import open_backend
+from wikiref.postings import pack_id
+from wikiref.postings import unpack_id
+from wikiref.postings import decode_varints
+from wikiref.postings import decode_postings
+from wikiref.postings import intersect_sorted
 from wikiref.settings import LDB_ARRAY_DELIM
+from wikiref.settings import INDEX_NODE_ID_PREFIX
+from wikiref.settings import INDEX_NODE_NAME_PREFIX
+from wikiref.settings import INDEX_BACKEND
+from wikiref.settings import INDEX_LOOKUP_CACHE_SIZE
+from wikiref.settings import INDEX_COMPRESSION_THRESHOLD
+from wikiref.settings import INDEX_LARGE_VALUE_CACHE_SIZE
 
 
-class YagoClassDict(object):
+class YagoIndex(object):
     """
-    Maps: <yago_label> -> [<yago_node>]
+    Base class for Yago indexes on top of a storage backend (see wikiref.storage). Values are arrays joined with
+    LDB_ARRAY_DELIM, they are split once and kept in the lookup cache as tuples,
+    so callers should not try to modify them.
+
+    If @node_dict is given, index is expected to be in the node id format
+    (see run_index_node_ids.py): values are varint encoded posting lists of
+    node ids, and nodes are returned as integer ids instead of names.
+
+    Decoded values of at least INDEX_COMPRESSION_THRESHOLD bytes are also kept
+    in a separate small cache, so large hot values (which may be stored
+    compressed, see wikiref.storage.CompressedBackend) are not read and decoded
+    again when they are pushed out of the lookup cache by many small ones.
     """
+    NODE_KEYS = False
 
-    def __init__(self, data_root):
+    def __init__(self, data_root, node_dict=None, cache_size=INDEX_LOOKUP_CACHE_SIZE, backend=INDEX_BACKEND):
         self.data_root = data_root
-        self.ldb = leveldb.LevelDB(data_root)
+        self.backend = open_backend(data_root, backend)
+        self.cache = LookupCache(cache_size)
+        self.large_values = LookupCache(INDEX_LARGE_VALUE_CACHE_SIZE if cache_size > 0 else 0)
+        self.node_dict = node_dict
+        self.classifier = node_dict.classifier if node_dict is not None else NAME_CLASSIFIER
+
+    def index_key(self, key):
+        if self.NODE_KEYS and self.node_dict is not None:
+            return pack_id(key)
+        return key
+
+    def decode(self, value):
+        if self.node_dict is not None:
+            return tuple(decode_postings(value))
+        return tuple(value.split(LDB_ARRAY_DELIM))
+
+    def decode_value(self, key, value):
+        decoded = self.decode(value)
+        if len(value) >= INDEX_COMPRESSION_THRESHOLD:
+            self.large_values.put(key, decoded)
+        return decoded
+
+    def load(self, key):
+        value = self.large_values.get(key)
+        if value is not None:
+            return value
+        return self.decode_value(key, self.backend.get(self.index_key(key)))
+
+    def load_many(self, keys):
+        values = dict()
+        index_keys = dict()
+        for key in keys:
+            value = self.large_values.get(key)
+            if value is not None:
+                values[key] = value
+            else:
+                index_keys[self.index_key(key)] = key
+        for index_key, value in self.backend.multi_get(index_keys.iterkeys()).iteritems():
+            key = index_keys[index_key]
+            values[key] = self.decode_value(key, value)
+        return values
+
+    def lookup(self, key):
+        """
+        Returns tuple of values stored for @key. Raises KeyError if key not found.
+        """
+        return self.cache.lookup(key, self.load)
+
+    def lookup_many(self, keys):
+        """
+        Returns dict: key -> values for all found @keys. Keys which are not
+        cached are sorted, deduplicated and read from storage in one batch.
+        """
+        return self.cache.lookup_many(keys, self.load_many)
+
+
+class YagoNodeDict(YagoIndex):
+    """
+    Maps: <node_id> -> <yago_node> and <yago_node> -> <node_id>
+
+    NodeType of every node is loaded from @node_types_path (one byte per id,
+    see run_index_node_ids.py), nodes are classified by it without reading their names.
+    """
+
+    def __init__(self, data_root, node_types_path, cache_size=INDEX_LOOKUP_CACHE_SIZE, backend=INDEX_BACKEND):
+        super(YagoNodeDict, self).__init__(data_root, cache_size=cache_size, backend=backend)
+        self.thing_id = self.get_id("owl:Thing")
+        with open(node_types_path, "rb") as fl:
+            self.node_types = bytearray(fl.read())
+        self.classifier = NodeTypeClassifier(self.node_types)
+
+    def decode(self, value):
+        return value
+
+    def get_name(self, node_id):
+        return self.lookup(INDEX_NODE_NAME_PREFIX + pack_id(node_id))
+
+    def get_names(self, node_ids):
+        keys = [INDEX_NODE_NAME_PREFIX + pack_id(node_id) for node_id in node_ids]
+        names = self.lookup_many(keys)
+        return [names[key] for key in keys]
+
+    def get_id(self, node, default=None):
+        try:
+            return unpack_id(self.lookup(INDEX_NODE_ID_PREFIX + node))
+        except KeyError:
+            return default
+
+    def get_type(self, node_id):
+        return self.node_types[node_id]
+
+    def __getitem__(self, key):
+        return self.get_name(key)
+
+    def __repr__(self):
+        return "<YagoNodeDict(data=%s, nodes=%d)>" % (self.data_root, len(self.node_types))
+
+
+def permutation_order(label, lemmas, start=0, used=()):
+    """
+    Returns tuple of @lemmas indexes in the order in which lemmas joined with
+    spaces give @label (the first one in itertools.permutations order), or
+    None if @label is not a permutation of @lemmas.
+    """
+    if len(used) == len(lemmas):
+        return used if start == len(label) else None
+    if len(used) > 0:
+        if not label.startswith(" ", start):
+            return None
+        start += 1
+    for i, lemma in enumerate(lemmas):
+        if i not in used and label.startswith(lemma, start):
+            order = permutation_order(label, lemmas, start + len(lemma), used + (i,))
+            if order is not None:
+                return order
+    return None
+
+
+class YagoLabelKeys(YagoIndex):
+    """
+    Map: <sorted label words> -> [<yago_label>]
+    """
+
+    def get(self, key, default=None):
+        try:
+            return self.lookup(key)
+        except KeyError:
+            return default
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __repr__(self):
+        return "<YagoLabelKeys(data=%s)>" % self.data_root
+
+
+class YagoClassDict(YagoIndex):
+    """
+    Maps: <yago_label> -> [<yago_node>]
+
+    If @bloom_path is given, labels are first checked against the Bloom filter
+    of all labels (see run_index_bloom.py) and definite misses are answered
+    without reading the index.
+
+    If @keys_root is given, labels which are permutations of several lemmas
+    are found with a single lookup of their sorted words (see
+    run_index_label_keys.py) instead of probing every permutation.
+    """
+
+    def __init__(self, data_root, bloom_path=None, keys_root=None, node_dict=None,
+                 cache_size=INDEX_LOOKUP_CACHE_SIZE, backend=INDEX_BACKEND):
+        super(YagoClassDict, self).__init__(data_root, node_dict=node_dict, cache_size=cache_size, backend=backend)
+        self.bloom = BloomFilter.load(bloom_path) if bloom_path is not None else None
+        self.bloom_misses = 0
+        if keys_root is not None:
+            self.label_keys = YagoLabelKeys(keys_root, cache_size=cache_size, backend=backend)
+        else:
+            self.label_keys = None
+
+    def lookup(self, key):
+        if self.bloom is not None and key not in self.bloom:
+            self.bloom_misses += 1
+            raise KeyError(key)
+        return super(YagoClassDict, self).lookup(key)
+
+    def lookup_many(self, keys):
+        if self.bloom is not None:
+            keys = set(keys)
+            maybe_keys = [key for key in keys if key in self.bloom]
+            self.bloom_misses += len(keys) - len(maybe_keys)
+            keys = maybe_keys
+        return super(YagoClassDict, self).lookup_many(keys)
 
     def get(self, term, default=None):
         try:
-            return SemanticNodeSet(lemmas=[term], nodes=self.ldb.Get(term).split(LDB_ARRAY_DELIM))
+            return SemanticNodeSet(lemmas=[term], nodes=self.lookup(term), node_dict=self.node_dict,
+                                   classifier=self.classifier)
+        except KeyError:
+            return default
+
+    def get_many(self, terms, default=None):
+        """
+        Returns dict: term -> SemanticNodeSet (or @default) for all @terms.
+        """
+        found = self.lookup_many(terms)
+        node_sets = dict()
+        for term in terms:
+            if term in found:
+                node_sets[term] = SemanticNodeSet(lemmas=[term], nodes=found[term], node_dict=self.node_dict,
+                                                  classifier=self.classifier)
+            else:
+                node_sets[term] = default
+        return node_sets
+
+    def permutation_labels(self, lemmas):
+        return self.permutation_labels_many([tuple(lemmas)])[tuple(lemmas)]
+
+    def permutation_labels_many(self, combinations):
+        """
+        Returns dict: combination -> labels which may be space joined permutations
+        of the combination lemmas, in itertools.permutations order. With label
+        keys index only labels of the class dict are returned, otherwise all
+        permutations are.
+        """
+        if self.label_keys is None:
+            return dict((combination, [" ".join(permutation) for permutation in itertools.permutations(combination)])
+                        for combination in combinations)
+        keys = dict((combination, label_key(" ".join(combination))) for combination in combinations)
+        found = self.label_keys.lookup_many(keys.itervalues())
+        labels = dict()
+        for combination, key in keys.iteritems():
+            ordered = []
+            for label in found.get(key, ()):
+                order = permutation_order(label, combination)
+                if order is not None:
+                    ordered.append((order, label))
+            labels[combination] = [label for _, label in sorted(ordered)]
+        return labels
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __repr__(self):
+        return "<YagoDict(data=%s, bloom=%r, bloom_misses=%d, keys=%r)>" % (self.data_root, self.bloom,
+                                                                           self.bloom_misses, self.label_keys)
+
+
+class YagoPostingLengths(YagoIndex):
+    """
+    Map: <word> -> <number of nodes in the word posting list>
+    """
+
+    def decode(self, value):
+        return int(value)
+
+    def get(self, word, default=None):
+        try:
+            return self.lookup(word)
         except KeyError:
             return default
 
@@ -33,17 +296,29 @@ class YagoClassDict(object):
         return self.get(key)
 
     def __repr__(self):
-        return "<YagoDict(data=%s)>" % self.data_root
+        return "<YagoPostingLengths(data=%s)>" % self.data_root
 
 
-class YagoClassSearch(object):
+class YagoClassSearch(YagoIndex):
     """
     Map: <word> -> [<yago_node>]
+
+    Posting lists are sorted. If @lengths_root is given, posting list lengths
+    are read from there, so that postings of rare words are fetched first.
+
+    Searches may share a memo (dict: frozenset(lemmas) -> nodes), then postings
+    of every lemma are fetched once and intersections of lemma subsets are kept
+    there and reused by searches of their supersets (see memo_conjunction()).
     """
 
-    def __init__(self, data_root):
-        self.data_root = data_root
-        self.ldb = leveldb.LevelDB(data_root)
+    def __init__(self, data_root, lengths_root=None, node_dict=None, cache_size=INDEX_LOOKUP_CACHE_SIZE,
+                 backend=INDEX_BACKEND):
+        super(YagoClassSearch, self).__init__(data_root, node_dict=node_dict, cache_size=cache_size,
+                                              backend=backend)
+        if lengths_root is not None:
+            self.lengths = YagoPostingLengths(lengths_root, cache_size=cache_size, backend=backend)
+        else:
+            self.lengths = None
 
     def get(self, lemma_or_lemmas, default=None):
         if isinstance(lemma_or_lemmas, list) or isinstance(lemma_or_lemmas, tuple):
@@ -51,71 +326,294 @@ class YagoClassSearch(object):
         else:
             return self.search([lemma_or_lemmas], default=default)
 
-    def search(self, lemmas, default=None):
-        node_sets = []
+    def selective_order(self, lemmas):
+        """
+        Returns lemmas sorted by their posting lengths or None if some lemma is
+        not in the index. Without lengths index postings are fetched to get lengths.
+        """
+        lemma_lengths = []
         for lemma in lemmas:
-            try:
-                lemma_nodes = self.ldb.Get(lemma).split(LDB_ARRAY_DELIM)
-            except KeyError:
+            if self.lengths is not None:
+                length = self.lengths.get(lemma)
+            else:
+                try:
+                    length = len(self.lookup(lemma))
+                except KeyError:
+                    length = None
+            if length is None:
+                return None
+            lemma_lengths.append((length, lemma))
+        lemma_lengths.sort()
+        return [lemma for _, lemma in lemma_lengths]
+
+    def search(self, lemmas, default=None, memo=None):
+        if memo is not None:
+            self.memo_fetch(lemmas, memo)
+            return self.memo_node_set(lemmas, memo, default)
+        ordered_lemmas = self.selective_order(lemmas)
+        if ordered_lemmas is None:
+            return default
+        try:
+            return self.conjunction(lemmas, (self.lookup(lemma) for lemma in ordered_lemmas), default)
+        except KeyError:
+            return default
+
+    def search_many(self, lemma_lists, default=None, memo=None):
+        """
+        Returns dict: tuple(lemmas) -> SemanticNodeSet (or @default) for all
+        @lemma_lists. Postings of all distinct lemmas are read in one batch.
+        """
+        if memo is not None:
+            self.memo_fetch(itertools.chain.from_iterable(lemma_lists), memo)
+            return dict((tuple(lemmas), self.memo_node_set(lemmas, memo, default)) for lemmas in lemma_lists)
+        postings = self.lookup_many(set(itertools.chain.from_iterable(lemma_lists)))
+        node_sets = dict()
+        for lemmas in lemma_lists:
+            key = tuple(lemmas)
+            if key in node_sets:
+                continue
+            if all(lemma in postings for lemma in lemmas):
+                ordered_lemmas = sorted(lemmas, key=lambda lemma: (len(postings[lemma]), lemma))
+                node_sets[key] = self.conjunction(lemmas, (postings[lemma] for lemma in ordered_lemmas), default)
+            else:
+                node_sets[key] = default
+        return node_sets
+
+    def conjunction(self, lemmas, postings, default=None):
+        """
+        Intersects @postings (ordered from the shortest) and returns SemanticNodeSet or @default if it is empty.
+        """
+        conjunction = None
+        for lemma_nodes in postings:
+            if conjunction is None:
+                conjunction = lemma_nodes
+            else:
+                conjunction = self.intersect(conjunction, lemma_nodes)
+            if len(conjunction) == 0:
                 return default
-            node_sets.append(lemma_nodes)
-        conjunction = set(node_sets[0])
-        for i in xrange(1, len(node_sets)):
-            node_set = node_sets[i]
-            conjunction.intersection_update(node_set)
+        return SemanticNodeSet(lemmas=lemmas, nodes=conjunction, node_dict=self.node_dict, classifier=self.classifier)
+
+    def memo_fetch(self, lemmas, memo):
+        """
+        Reads postings of @lemmas which are not in @memo yet in one batch.
+        Postings of missing lemmas are stored as empty.
+        """
+        missing = set(lemma for lemma in lemmas if frozenset((lemma,)) not in memo)
+        if len(missing) > 0:
+            postings = self.lookup_many(missing)
+            for lemma in missing:
+                memo[frozenset((lemma,))] = postings.get(lemma, ())
+
+    def memo_conjunction(self, lemmas, memo):
+        """
+        Returns intersection of postings of @lemmas (already fetched into @memo).
+        Subset without the lemma with the longest posting list is intersected
+        first (recursively), so all subsets on the way are stored into @memo.
+        """
+        key = frozenset(lemmas)
+        if key in memo:
+            return memo[key]
+        ordered_lemmas = sorted(lemmas, key=lambda lemma: (len(memo[frozenset((lemma,))]), lemma))
+        conjunction = self.memo_conjunction(ordered_lemmas[:-1], memo)
+        if len(conjunction) > 0:
+            conjunction = self.intersect(conjunction, memo[frozenset((ordered_lemmas[-1],))])
+        memo[key] = conjunction
+        return conjunction
+
+    def memo_node_set(self, lemmas, memo, default=None):
+        conjunction = self.memo_conjunction(lemmas, memo)
         if len(conjunction) == 0:
             return default
-        return SemanticNodeSet(lemmas=lemmas, nodes=conjunction)
+        return SemanticNodeSet(lemmas=lemmas, nodes=conjunction, node_dict=self.node_dict, classifier=self.classifier)
+
+    @staticmethod
+    def intersect(postings_1, postings_2):
+        return intersect_sorted(postings_1, postings_2)
 
     def __getitem__(self, key):
         return self.get(key)
 
     def __repr__(self):
-        return "<YagoSearchDict(data=%s)>" % self.data_root
+        return "<YagoSearchDict(data=%s, lengths=%r)>" % (self.data_root, self.lengths)
 
 
-class YagoTaxonomy(object):
+class YagoBitmapSearch(YagoClassSearch):
     """
-    Map: <child_node> -> [<parent_node>]
+    Map: <word> -> RoaringBitmap(<yago_node_id>)
+
+    Class search over node id format index with postings stored as compressed
+    bitmaps (see run_index_node_ids.py --bitmaps). Bitmaps are intersected as
+    they are, node ids are only listed for the resulting SemanticNodeSet.
     """
 
-    def __init__(self, data_root):
-        self.data_root = data_root
-        self.ldb = leveldb.LevelDB(data_root)
+    def decode(self, value):
+        return RoaringBitmap.loads(value)
+
+    @staticmethod
+    def intersect(postings_1, postings_2):
+        return postings_1 & postings_2
+
+    def __repr__(self):
+        return "<YagoBitmapSearch(data=%s, lengths=%r)>" % (self.data_root, self.lengths)
+
+
+class YagoAncestors(YagoIndex):
+    """
+    Map: <node> -> <depth>, [<parent_node>, <grand_parent_node>, ..., <root_node>]
+    """
+    NODE_KEYS = True
+
+    def decode(self, value):
+        if self.node_dict is not None:
+            record = decode_varints(value)
+            return record[0], tuple(record[1:])
+        record = value.split(LDB_ARRAY_DELIM)
+        return int(record[0]), tuple(record[1:])
+
+    def get_path(self, node, default=()):
+        try:
+            return self.lookup(node)[1]
+        except KeyError:
+            return default
+
+    def get_depth(self, node, default=0):
+        try:
+            return self.lookup(node)[0]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key):
+        return self.get_path(key)
+
+    def __repr__(self):
+        return "<YagoAncestorsDict(data=%s)>" % self.data_root
+
+
+class YagoTaxonomy(YagoIndex):
+    """
+    Map: <child_node> -> [<parent_node>]
+    """
+    NODE_KEYS = True
+
+    def __init__(self, data_root, ancestors_root=None, node_dict=None, cache_size=INDEX_LOOKUP_CACHE_SIZE,
+                 backend=INDEX_BACKEND):
+        super(YagoTaxonomy, self).__init__(data_root, node_dict=node_dict, cache_size=cache_size, backend=backend)
+        if ancestors_root is not None:
+            self.ancestors_index = YagoAncestors(ancestors_root, node_dict=node_dict, cache_size=cache_size,
+                                                 backend=backend)
+        else:
+            self.ancestors_index = None
+
+    def ancestors(self, node):
+        """
+        Returns tuple of all @node parents starting from the closest one. Reads
+        a single record if ancestors index is available, otherwise walks the
+        taxonomy up to the root.
+        """
+        if self.ancestors_index is not None:
+            return self.ancestors_index.get_path(node)
+        path = []
+        parent = self.get_parent(node)
+        while parent is not None:
+            path.append(parent)
+            parent = self.get_parent(parent)
+        return tuple(path)
+
+    def ancestors_many(self, nodes):
+        """
+        Returns dict: node -> tuple of its ancestors for all @nodes. Without
+        ancestors index, parents of all nodes are read level by level in batches.
+        """
+        if self.ancestors_index is not None:
+            found = self.ancestors_index.lookup_many(nodes)
+            return dict((node, found[node][1] if node in found else ()) for node in nodes)
+        paths = dict((node, []) for node in nodes)
+        frontier = dict((node, node) for node in paths)
+        while len(frontier) > 0:
+            parents = self.get_many(set(frontier.itervalues()))
+            next_frontier = dict()
+            for node, last in frontier.iteritems():
+                parent = parents[last]
+                if parent is not None:
+                    paths[node].append(parent)
+                    next_frontier[node] = parent
+            frontier = next_frontier
+        return dict((node, tuple(path)) for node, path in paths.iteritems())
 
     def get_parent(self, node, default=None):
         try:
             if isinstance(node, list):
                 node = node
-            value = self.ldb.Get(node).split(LDB_ARRAY_DELIM)[0]
+            value = self.lookup(node)[0]
             return value
         except KeyError:
             return default
 
+    def get_many(self, nodes, default=None):
+        """
+        Returns dict: node -> first parent (or @default) for all @nodes.
+        """
+        found = self.lookup_many(nodes)
+        return dict((node, found[node][0] if node in found else default) for node in nodes)
+
     def __getitem__(self, key):
         return self.get_parent(key)
 
     def __repr__(self):
-        return "<YagoTaxonomyDict(data=%s)>" % self.data_root
+        return "<YagoTaxonomyDict(data=%s, ancestors=%r)>" % (self.data_root, self.ancestors_index)
 
 
-class YagoTypes(object):
+class YagoTypes(YagoIndex):
+    """
+    Map: <instance_node> -> [<type_node>]
 
-    def __init__(self, data_root):
-        self.data_root = data_root
-        self.ldb = leveldb.LevelDB(data_root)
+    If @typed_path is given (node id format only), set of nodes which have types
+    is loaded from this bitset file, so has_types() does not read the index.
+    """
+    NODE_KEYS = True
+
+    def __init__(self, data_root, typed_path=None, node_dict=None, cache_size=INDEX_LOOKUP_CACHE_SIZE,
+                 backend=INDEX_BACKEND):
+        super(YagoTypes, self).__init__(data_root, node_dict=node_dict, cache_size=cache_size, backend=backend)
+        if typed_path is not None:
+            with open(typed_path, "rb") as fl:
+                self.typed = bytearray(fl.read())
+        else:
+            self.typed = None
 
     def get_parent(self, node, default=[]):
         try:
-            return self.ldb.Get(node).split(LDB_ARRAY_DELIM)
+            return self.lookup(node)
         except KeyError:
             return default
 
+    def has_types(self, node):
+        if self.typed is not None:
+            return (node >> 3) < len(self.typed) and self.typed[node >> 3] & (1 << (node & 7)) != 0
+        return len(self.get_parent(node)) > 0
+
+    def filter_typed(self, nodes):
+        """
+        Returns list of @nodes which have types. Without typed bitset types of
+        all nodes are read in one batch.
+        """
+        if self.typed is not None:
+            return filter(self.has_types, nodes)
+        found = self.lookup_many(nodes)
+        return [node for node in nodes if len(found.get(node, ()))]
+
+    def get_many(self, nodes, default=[]):
+        """
+        Returns dict: node -> types (or @default) for all @nodes.
+        """
+        found = self.lookup_many(nodes)
+        return dict((node, found.get(node, default)) for node in nodes)
+
     def __getitem__(self, key):
         return self.get_parent(key)
 
     def __repr__(self):
-        return "<YagoTransitiveDict(data=%s)>" % self.data_root
+        return "<YagoTransitiveDict(data=%s, typed=%s)>" % (self.data_root, self.typed is not None)
 
 
 # class YagoPreferredSearch(object):